@@ -0,0 +1,475 @@
+import abc
+import json
+import math
+import os
+import shlex
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent import futures
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from src.console import out
+
+if TYPE_CHECKING:
+    from src.run import Runner
+
+# Estados de um job submetido a um backend
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+
+def encode_job(runner: "Runner", run_instance: Any) -> Dict[str, Any]:
+    """
+    Um job (RunInstance ou RunBatch) de `runner` em JSON, para ser executado em
+    outro processo ou máquina (veja decode_job).
+    """
+    from src.run import RunBatch
+
+    instances = (
+        run_instance.instances if isinstance(run_instance, RunBatch) else [run_instance]
+    )
+    known_bounds = {}
+    if runner.known_bounds is not None:
+        table = runner.known_bounds.table
+        for inst in instances:
+            for name in (inst.instance_path.name, inst.instance_path.stem):
+                if name in table.index:
+                    known_bounds[name] = table.loc[name].to_dict()
+
+    return {
+        "runner": runner.spec(),
+        "kind": "batch" if isinstance(run_instance, RunBatch) else "instance",
+        "payload": run_instance.model_dump(mode="json"),
+        "known_bounds": known_bounds,
+    }
+
+
+def decode_job(message: Dict[str, Any], raw_logs_dir: Path) -> Tuple["Runner", Any]:
+    """O Runner (que escreve em `raw_logs_dir`) e o job de uma mensagem de encode_job."""
+    import pandas as pd  # type: ignore
+
+    from src.bounds import KnownBounds
+    from src.run import RunBatch, RunInstance, Runner
+
+    known_bounds = None
+    if message["known_bounds"]:
+        known_bounds = KnownBounds(
+            pd.DataFrame.from_dict(message["known_bounds"], orient="index")
+        )
+    runner = Runner.from_spec(message["runner"], raw_logs_dir, known_bounds)
+    if message["kind"] == "batch":
+        return runner, RunBatch(**message["payload"])
+    return runner, RunInstance(**message["payload"])
+
+
+class Backend(abc.ABC):
+    """
+    Onde os jobs de um Runner são executados. O Scheduler continua decidindo
+    quando cada job começa; o backend o executa:
+
+        handle = backend.submit(runner, job, cores)
+        while backend.poll(handle) in (PENDING, RUNNING): ...
+        backend.collect(handle)   # (ou backend.cancel(handle))
+
+    run() faz exatamente isso, bloqueando a thread do Scheduler até o job terminar.
+    Backends não locais (local = False) executam os jobs em outras máquinas, que
+    escrevem (ou devolvem) os logs em logs/raw/<tag>/<build>/<instância>, como
+    uma execução local: a retomada continua funcionando da mesma forma.
+    """
+
+    name = "local"
+    # Se os jobs rodam nesta máquina (com staging, forkserver e cores fixados)
+    local = True
+    poll_interval = 1.0
+
+    @abc.abstractmethod
+    def submit(self, runner: "Runner", run_instance: Any, cores: Optional[List[int]] = None) -> Any:
+        """Começa (ou enfileira) o job; devolve o handle usado por poll/cancel/collect."""
+
+    @abc.abstractmethod
+    def poll(self, handle: Any) -> str:
+        """O estado do job: PENDING, RUNNING, DONE ou FAILED."""
+
+    @abc.abstractmethod
+    def cancel(self, handle: Any) -> None:
+        """Desiste do job (os que já terminaram não são afetados)."""
+
+    def collect(self, handle: Any) -> None:
+        """Conclui um job terminado (ex: grava os arquivos devolvidos, avisa falhas)."""
+
+    def run(self, runner: "Runner", run_instance: Any, cores: Optional[List[int]] = None) -> None:
+        handle = self.submit(runner, run_instance, cores)
+        try:
+            while self.poll(handle) in (PENDING, RUNNING):
+                time.sleep(self.poll_interval)
+        except BaseException:
+            self.cancel(handle)
+            raise
+        self.collect(handle)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "Backend":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+class LocalBackend(Backend):
+    """
+    Os jobs são subprocessos desta máquina (o padrão, --backend local): run()
+    executa cada job na própria thread do Scheduler, que já limita os jobs em
+    andamento; submit() é para quem usa a interface assíncrona.
+    """
+
+    def __init__(self) -> None:
+        self._executor: Optional[futures.ThreadPoolExecutor] = None
+
+    def run(self, runner: "Runner", run_instance: Any, cores: Optional[List[int]] = None) -> None:
+        # O caminho normal: roda o job na própria thread do Scheduler
+        runner._run_local(run_instance, cores)
+
+    def submit(self, runner: "Runner", run_instance: Any, cores: Optional[List[int]] = None) -> Any:
+        if self._executor is None:
+            self._executor = futures.ThreadPoolExecutor()
+        return self._executor.submit(runner._run_local, run_instance, cores)
+
+    def poll(self, handle: Any) -> str:
+        if handle.done():
+            return FAILED if handle.cancelled() or handle.exception() else DONE
+        return RUNNING if handle.running() else PENDING
+
+    def cancel(self, handle: Any) -> None:
+        # Jobs que já começaram terminam pelo tempo limite
+        handle.cancel()
+
+    def collect(self, handle: Any) -> None:
+        if not handle.cancelled():
+            handle.result()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+class _ArrayTask:
+    """Um job submetido ao SlurmBackend: um elemento de um job array."""
+
+    def __init__(self, runner: "Runner", run_instance: Any):
+        self.runner = runner
+        self.run_instance = run_instance
+        self.state = PENDING
+        self.job_id: Optional[str] = None
+        self.index: Optional[int] = None
+        self.array_dir: Optional[Path] = None
+        self.submitted_at = 0.0
+
+    @property
+    def task_id(self) -> str:
+        return f"{self.job_id}_{self.index}"
+
+
+class SlurmBackend(Backend):
+    """
+    Os jobs são elementos de job arrays do Slurm (sbatch/squeue/scancel).
+
+    Os jobs de um mesmo Runner submetidos em uma janela de `submit_delay` segundos
+    vão em um único `sbatch --array`; cada elemento roda `xp exec-job` no nó, que
+    executa o job como uma execução local e escreve os logs direto em
+    logs/raw/<tag>/<build>/<instância>. Por isso, o diretório de trabalho (e o
+    projeto, os executáveis e as instâncias) deve estar em um sistema de arquivos
+    compartilhado com os nós.
+    Os arquivos de cada array (jobs.jsonl, job.sh e a saída do Slurm de cada
+    elemento) ficam em logs/raw/<tag>/<build>/_slurm/.
+    """
+
+    name = "slurm"
+    local = False
+
+    def __init__(
+        self,
+        exec_command: List[str],
+        sbatch_args: Optional[List[str]] = None,
+        poll_interval: float = 10.0,
+        submit_delay: float = 1.0,
+    ):
+        # Comando que executa um elemento: exec_command + [jobs.jsonl, índice]
+        self.exec_command = exec_command
+        self.sbatch_args = list(sbatch_args or [])
+        self.poll_interval = poll_interval
+        self.submit_delay = submit_delay
+
+        self._queued: Dict["Runner", List[_ArrayTask]] = {}
+        self._active: Dict[str, _ArrayTask] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        # Quando o job mais antigo ainda não submetido chegou
+        self._queued_since: Optional[float] = None
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, runner: "Runner", run_instance: Any, cores: Optional[List[int]] = None) -> Any:
+        task = _ArrayTask(runner, run_instance)
+        with self._cond:
+            self._queued.setdefault(runner, []).append(task)
+            if self._queued_since is None:
+                self._queued_since = time.monotonic()
+        return task
+
+    def poll(self, handle: Any) -> str:
+        return handle.state
+
+    def run(self, runner: "Runner", run_instance: Any, cores: Optional[List[int]] = None) -> None:
+        handle = self.submit(runner, run_instance, cores)
+        try:
+            with self._cond:
+                while handle.state in (PENDING, RUNNING):
+                    self._cond.wait()
+        except BaseException:
+            self.cancel(handle)
+            raise
+        self.collect(handle)
+
+    def cancel(self, handle: Any) -> None:
+        with self._cond:
+            if handle.job_id is None:
+                queued = self._queued.get(handle.runner, [])
+                if handle in queued:
+                    queued.remove(handle)
+            else:
+                self._active.pop(handle.task_id, None)
+            was_active = handle.job_id is not None and handle.state in (PENDING, RUNNING)
+            handle.state = FAILED
+            self._cond.notify_all()
+        if was_active:
+            self._scancel([handle.task_id])
+
+    def collect(self, handle: Any) -> None:
+        if handle.state != FAILED or handle.array_dir is None or self._closed:
+            return
+        err = handle.array_dir / f"{handle.index}.err"
+        tail = err.read_text().splitlines()[-5:] if err.exists() else []
+        out.error(
+            f"A tarefa {handle.task_id} do Slurm ({handle.run_instance.name}) falhou"
+            + (":\n" + "\n".join(tail) if tail else ".")
+        )
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            leftover = [t.task_id for t in self._active.values()]
+            # Quem ainda espera por uma tarefa (run()) não fica esperando para sempre
+            for task in [*self._active.values(), *sum(self._queued.values(), [])]:
+                task.state = FAILED
+            self._active.clear()
+            self._queued.clear()
+            self._cond.notify_all()
+        self._thread.join()
+        if leftover:
+            out.warning(f"Cancelando {len(leftover)} tarefas do Slurm não terminadas.")
+            self._scancel(leftover)
+
+    # --- Comandos do Slurm (FakeSlurmBackend os substitui) ---
+
+    def _sbatch(
+        self, script: Path, n_tasks: int, runner: "Runner", array_dir: Path, time_limit: float
+    ) -> str:
+        """Submete `script` como um array de `n_tasks` elementos; devolve o job id."""
+        command = [
+            "sbatch",
+            "--parsable",
+            f"--array=0-{n_tasks - 1}",
+            f"--job-name=xp-{runner.name}",
+            f"--cpus-per-task={runner.threads}",
+            f"--time={math.ceil(time_limit / 60)}",
+            f"--output={array_dir}/%a.out",
+            f"--error={array_dir}/%a.err",
+            *self.sbatch_args,
+            str(script),
+        ]
+        result = subprocess.run(command, capture_output=True, text=True, check=True)
+        # --parsable: "jobid" ou "jobid;cluster"
+        return result.stdout.strip().split(";")[0]
+
+    def _squeue(self, job_ids: List[str]) -> Optional[Dict[str, str]]:
+        """{"<job>_<índice>": estado} dos elementos ainda na fila (None se falhar)."""
+        result = subprocess.run(
+            ["squeue", "-h", "-r", "-j", ",".join(job_ids), "-o", "%i %T"],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            return None
+        states = {}
+        for line in result.stdout.splitlines():
+            parts = line.split()
+            if len(parts) == 2:
+                states[parts[0]] = parts[1]
+        return states
+
+    def _scancel(self, task_ids: List[str]) -> None:
+        subprocess.run(["scancel", *task_ids], capture_output=True)
+
+    # --- Submissão e acompanhamento ---
+
+    def _flush(self) -> None:
+        """Submete os jobs acumulados de cada Runner (com o lock)."""
+        for runner, tasks in list(self._queued.items()):
+            if not tasks:
+                continue
+            self._queued[runner] = []
+            slurm_dir = runner.raw_logs_dir / "_slurm"
+            slurm_dir.mkdir(parents=True, exist_ok=True)
+            array_dir = Path(tempfile.mkdtemp(prefix="array-", dir=slurm_dir))
+
+            with (array_dir / "jobs.jsonl").open("w") as jobs_fd:
+                for task in tasks:
+                    message = encode_job(task.runner, task.run_instance)
+                    message["raw_logs_dir"] = str(runner.raw_logs_dir)
+                    jobs_fd.write(json.dumps(message) + "\n")
+            script = array_dir / "job.sh"
+            script.write_text(
+                "#!/bin/bash\n"
+                f"cd {shlex.quote(os.getcwd())}\n"
+                f"exec {shlex.join(self.exec_command)} "
+                f"{shlex.quote(str(array_dir / 'jobs.jsonl'))} \"$SLURM_ARRAY_TASK_ID\"\n"
+            )
+            script.chmod(0o755)
+
+            # O tempo pedido ao Slurm cobre o job mais longo do array, com folga
+            longest = max(len(getattr(t.run_instance, "instances", [0])) for t in tasks)
+            time_limit = runner.time_limit * longest * 1.05 + 120
+            try:
+                job_id = self._sbatch(script, len(tasks), runner, array_dir, time_limit)
+            except (OSError, subprocess.CalledProcessError) as e:
+                stderr = getattr(e, "stderr", "") or ""
+                out.error(f"sbatch falhou para {runner.name}: {e} {stderr.strip()}")
+                for task in tasks:
+                    task.state = FAILED
+                continue
+
+            now = time.monotonic()
+            for index, task in enumerate(tasks):
+                task.job_id, task.index, task.array_dir = job_id, index, array_dir
+                task.submitted_at = now
+                self._active[task.task_id] = task
+
+    def _refresh(self) -> None:
+        """Atualiza o estado dos elementos submetidos (sem o lock: chama o squeue)."""
+        with self._cond:
+            tasks = list(self._active.values())
+        if not tasks:
+            return
+        states = self._squeue(sorted({t.job_id for t in tasks if t.job_id}))
+        if states is None:
+            return  # squeue falhou; tenta de novo na próxima volta
+
+        now = time.monotonic()
+        with self._cond:
+            for task in tasks:
+                if task.task_id not in self._active:
+                    continue
+                state = states.get(task.task_id)
+                if state is not None:
+                    task.state = RUNNING if state != "PENDING" else PENDING
+                    continue
+                # Fora da fila: terminou se xp exec-job deixou o marcador
+                if (task.array_dir / f"{task.index}.done").exists():
+                    task.state = DONE
+                elif now - task.submitted_at > max(60.0, 3 * self.poll_interval):
+                    task.state = FAILED
+                else:
+                    continue  # pode ainda não ter aparecido no squeue
+                del self._active[task.task_id]
+            self._cond.notify_all()
+
+    def _loop(self) -> None:
+        last_refresh = 0.0
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                # Espera mais jobs chegarem para submetê-los no mesmo array
+                now = time.monotonic()
+                timeout = 1.0
+                if self._queued_since is not None:
+                    if now - self._queued_since >= self.submit_delay:
+                        self._queued_since = None
+                        self._flush()
+                    else:
+                        timeout = self._queued_since + self.submit_delay - now
+                self._cond.wait(timeout=timeout)
+            if time.monotonic() - last_refresh >= self.poll_interval:
+                self._refresh()
+                last_refresh = time.monotonic()
+
+
+class FakeSlurmBackend(SlurmBackend):
+    """
+    SlurmBackend sem Slurm: cada elemento de um "array" é um subprocesso local
+    (com SLURM_ARRAY_JOB_ID/SLURM_ARRAY_TASK_ID), para testar o caminho do
+    cluster (jobs.jsonl, xp exec-job, marcadores, retomada) em uma máquina só.
+    """
+
+    name = "fake-slurm"
+
+    def __init__(self, exec_command: List[str], poll_interval: float = 1.0, **kwargs: Any):
+        self._processes: Dict[str, subprocess.Popen] = {}
+        self._next_id = 1
+        super().__init__(exec_command, poll_interval=poll_interval, **kwargs)
+
+    def _sbatch(
+        self, script: Path, n_tasks: int, runner: "Runner", array_dir: Path, time_limit: float
+    ) -> str:
+        job_id = str(self._next_id)
+        self._next_id += 1
+        for index in range(n_tasks):
+            env = dict(
+                os.environ,
+                SLURM_ARRAY_JOB_ID=job_id,
+                SLURM_ARRAY_TASK_ID=str(index),
+            )
+            with (
+                (array_dir / f"{index}.out").open("w") as stdout_fd,
+                (array_dir / f"{index}.err").open("w") as stderr_fd,
+            ):
+                self._processes[f"{job_id}_{index}"] = subprocess.Popen(
+                    [str(script)], stdout=stdout_fd, stderr=stderr_fd, env=env
+                )
+        return job_id
+
+    def _squeue(self, job_ids: List[str]) -> Optional[Dict[str, str]]:
+        return {
+            task_id: "RUNNING"
+            for task_id, process in list(self._processes.items())
+            if task_id.split("_")[0] in job_ids and process.poll() is None
+        }
+
+    def _scancel(self, task_ids: List[str]) -> None:
+        for task_id in task_ids:
+            process = self._processes.get(task_id)
+            if process is not None and process.poll() is None:
+                process.kill()
+
+
+def run_array_task(jobs_file: Path, index: int) -> None:
+    """
+    O lado do nó de um elemento de job array (`xp exec-job`): executa o job
+    `index` de `jobs_file` como uma execução local, escrevendo os logs no
+    raw_logs_dir original, e deixa o marcador <índice>.done ao terminar.
+    """
+    with jobs_file.open() as jobs_fd:
+        for i, line in enumerate(jobs_fd):
+            if i == index:
+                message = json.loads(line)
+                break
+        else:
+            raise IndexError(f"{jobs_file} não tem o job {index}")
+
+    runner, run_instance = decode_job(message, Path(message["raw_logs_dir"]))
+    runner._run_instance(run_instance)
+    (jobs_file.parent / f"{index}.done").touch()
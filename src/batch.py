@@ -0,0 +1,71 @@
+import re
+from typing import Dict, List, Optional
+
+# Contrato de saída de um batch_template: para cada instância, o executável imprime
+#
+#   @@xp begin <instância>
+#   ... saída da instância ...
+#   @@xp end <instância> <exit_code> <wall_time_seconds>
+#
+# onde <instância> é o caminho recebido na linha de comando, o seu nome ou a sua
+# posição (a partir de 0) na lista de instâncias.
+BEGIN_RE = re.compile(r"^@@xp begin (?P<instance>\S+)\s*$")
+END_RE = re.compile(
+    r"^@@xp end (?P<instance>\S+)\s+(?P<exit_code>-?\d+)\s+(?P<wall_time>[0-9.eE+-]+)\s*$"
+)
+
+
+class InstanceOutput:
+    """Saída e resultado de uma instância dentro de um batch."""
+
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+        self.started = False
+        self.finished = False
+        self.exit_code: Optional[int] = None
+        self.wall_time: Optional[float] = None
+
+
+class BatchSplitter:
+    """
+    Separa a saída de uma execução em batch entre as suas instâncias, seguindo
+    os marcadores `@@xp begin/end`. Linhas fora de qualquer marcador (ex: o banner
+    da licença do solver) ficam em `preamble`.
+    """
+
+    def __init__(self, keys: Dict[str, int]):
+        # {caminho, nome ou posição: posição da instância no batch}
+        self.keys = keys
+        self.outputs: Dict[int, InstanceOutput] = {}
+        self.preamble: List[str] = []
+        self._current: Optional[InstanceOutput] = None
+
+    def _output(self, key: str) -> Optional[InstanceOutput]:
+        instance = self.keys.get(key)
+        if instance is None:
+            return None
+        return self.outputs.setdefault(instance, InstanceOutput())
+
+    def feed(self, line: str) -> None:
+        if line.startswith("@@xp "):
+            begin = BEGIN_RE.match(line)
+            if begin:
+                self._current = self._output(begin.group("instance"))
+                if self._current is not None:
+                    self._current.started = True
+                return
+
+            end = END_RE.match(line)
+            if end:
+                output = self._output(end.group("instance"))
+                if output is not None:
+                    output.started = output.finished = True
+                    output.exit_code = int(end.group("exit_code"))
+                    output.wall_time = float(end.group("wall_time"))
+                self._current = None
+                return
+
+        if self._current is not None:
+            self._current.lines.append(line)
+        else:
+            self.preamble.append(line)
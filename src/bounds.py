@@ -0,0 +1,161 @@
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd  # type: ignore
+from rich.table import Table
+
+try:
+    from src.console import out
+except ImportError:
+    from rich.console import Console
+
+    out = Console()  # type: ignore
+
+
+class KnownBounds:
+    """
+    Limitantes conhecidos (lb, ub e, opcionalmente, o ótimo) de cada instância.
+
+    O arquivo de referência é lido uma única vez e indexado pelo nome da instância,
+    de forma que consultas e a validação dos resultados não precisam varrê-lo de novo.
+    O arquivo deve ser um .csv com as colunas `instance`, `lb` e `ub`
+    (e, opcionalmente, `opt`).
+    """
+
+    def __init__(self, table: pd.DataFrame):
+        self.table = table
+
+    @classmethod
+    def load(cls, path: Path) -> "KnownBounds":
+        path = Path(path).expanduser()
+        try:
+            df = pd.read_csv(path, dtype={"instance": str})
+        except FileNotFoundError:
+            out.error(f"Arquivo de limitantes conhecidos não encontrado: {path}")
+            exit(1)
+
+        missing = {"instance", "lb", "ub"} - set(df.columns)
+        if missing:
+            out.error(f"{path} não possui as colunas {sorted(missing)}")
+            exit(1)
+
+        df = df.drop_duplicates("instance", keep="last").set_index("instance")
+        bounds = df[["lb", "ub"]].apply(pd.to_numeric, errors="coerce")
+        bounds.columns = ["known_lb", "known_ub"]
+        if "opt" in df.columns:
+            bounds["known_opt"] = pd.to_numeric(df["opt"], errors="coerce")
+        else:
+            bounds["known_opt"] = bounds["known_lb"].where(
+                bounds["known_lb"] == bounds["known_ub"]
+            )
+
+        out.info(f"{len(bounds)} limitantes conhecidos carregados de {path}")
+        return cls(bounds)
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __contains__(self, instance: str) -> bool:
+        return instance in self.table.index
+
+    def optimum(self, instance: str) -> Optional[float]:
+        """Retorna o ótimo conhecido da instância, se existir."""
+        if instance not in self.table.index:
+            return None
+        opt = self.table.at[instance, "known_opt"]
+        return None if pd.isna(opt) else float(opt)
+
+    def validate(self, results: pd.DataFrame) -> pd.DataFrame:
+        """
+        Confere, de uma só vez, todas as linhas de `results` contra os limitantes conhecidos.
+        Retorna um DataFrame com uma linha por violação encontrada
+        (lb > known_ub, ub < known_lb ou lb > ub).
+        """
+        inst_col = "instance" if "instance" in results.columns else "instance_name"
+        if inst_col not in results.columns or not {"lb", "ub"} <= set(results.columns):
+            return pd.DataFrame(columns=["instance", "check", "value", "reference"])
+
+        df = pd.DataFrame(
+            {
+                "instance": results[inst_col].astype(str),
+                "lb": pd.to_numeric(results["lb"], errors="coerce"),
+                "ub": pd.to_numeric(results["ub"], errors="coerce"),
+            }
+        ).join(self.table, on="instance")
+
+        checks = [
+            ("lb > known_ub", df["lb"] > df["known_ub"], "lb", "known_ub"),
+            ("ub < known_lb", df["ub"] < df["known_lb"], "ub", "known_lb"),
+            ("lb > ub", df["lb"] > df["ub"], "lb", "ub"),
+        ]
+        violations = [
+            pd.DataFrame(
+                {
+                    "instance": df.loc[mask, "instance"],
+                    "check": name,
+                    "value": df.loc[mask, value],
+                    "reference": df.loc[mask, reference],
+                }
+            )
+            for name, mask, value, reference in checks
+            if mask.any()
+        ]
+
+        unknown = df.loc[df["known_lb"].isna() & df["known_ub"].isna(), "instance"]
+        if len(unknown):
+            out.warning(
+                f"{unknown.nunique()} instâncias sem limitantes conhecidos "
+                f"(ex: {', '.join(unknown.unique()[:5])})"
+            )
+
+        new_optima = df.loc[
+            (df["lb"] == df["ub"]) & (df["known_lb"] < df["known_ub"]), "instance"
+        ]
+        if len(new_optima):
+            out.info(
+                f"{len(new_optima)} instâncias resolvidas sem ótimo conhecido: "
+                f"{', '.join(new_optima.unique()[:5])}"
+            )
+
+        if not violations:
+            return pd.DataFrame(columns=["instance", "check", "value", "reference"])
+        return pd.concat(violations, ignore_index=True)
+
+
+def load_known_bounds(
+    metadata: Optional[str | Path], location: Optional[str | Path] = None
+) -> Optional[KnownBounds]:
+    """
+    Carrega o arquivo de limitantes conhecidos, se houver um.
+    Caminhos relativos são procurados primeiro dentro de `location` (das instâncias).
+    """
+    if not metadata:
+        return None
+
+    path = Path(metadata).expanduser()
+    if not path.is_absolute() and location is not None:
+        candidate = Path(location) / path
+        if candidate.exists():
+            path = candidate
+
+    return KnownBounds.load(path)
+
+
+def report_violations(violations: pd.DataFrame, report_csv: Path) -> None:
+    """Imprime todas as violações em uma única tabela e as salva em report_csv."""
+    if violations.empty:
+        out.success("Todos os limitantes condizem com os valores conhecidos.")
+        report_csv.unlink(missing_ok=True)
+        return
+
+    table = Table(title=f"{len(violations)} violações de limitantes")
+    table.add_column("Instância", style="magenta")
+    table.add_column("Checagem", style="red")
+    table.add_column("Valor", justify="right")
+    table.add_column("Referência", justify="right")
+    for row in violations.itertuples(index=False):
+        table.add_row(row.instance, row.check, f"{row.value:g}", f"{row.reference:g}")
+
+    out.print(table)
+    violations.to_csv(report_csv, index=False)
+    out.error(f"Violações de limitantes escritas em {report_csv}")
@@ -0,0 +1,51 @@
+import json
+import math
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.config import CappingConfig
+
+
+class Capping:
+    """
+    Tempo limite adaptativo ([capping]): depois que algum build resolveu uma
+    instância em t segundos, as execuções seguintes dessa instância (de qualquer
+    build) rodam com limite min(time_limit, k·t + slack). Compartilhado pelos Runners
+    de um experimento; as execuções já registradas em `tag_dir` (ao retomar uma
+    tag) também contam.
+    """
+
+    def __init__(self, config: CappingConfig, tag_dir: Optional[Path] = None):
+        self.config = config
+        self._lock = threading.Lock()
+        # Instância (caminho) -> menor tempo em que foi resolvida
+        self._best: Dict[str, float] = {}
+        if tag_dir is not None and tag_dir.is_dir():
+            for meta_path in tag_dir.glob("*/*/meta.json"):
+                try:
+                    self.observe(json.loads(meta_path.read_text()))
+                except (OSError, ValueError):
+                    continue
+
+    def observe(self, meta: Dict[str, Any]) -> None:
+        """Registra uma execução (o seu meta.json); só as resolvidas contam."""
+        if meta.get("exit_code") != 0 or meta.get("target_reached") is False:
+            return
+        try:
+            key = str(meta["instance_path"])
+            wall_time = float(meta["wall_time_seconds"])
+        except (KeyError, TypeError, ValueError):
+            return
+        with self._lock:
+            if wall_time < self._best.get(key, float("inf")):
+                self._best[key] = wall_time
+
+    def limit(self, instance_path: Path, time_limit: float) -> Optional[float]:
+        """O limite reduzido de uma execução da instância, ou None se não há redução."""
+        with self._lock:
+            best = self._best.get(instance_path.as_posix())
+        if best is None:
+            return None
+        cap = math.ceil(self.config.k * best + self.config.slack)
+        return cap if cap < time_limit else None
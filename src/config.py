@@ -1,9 +1,9 @@
 import sys
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Literal, Optional
 
 import tomllib
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel, ValidationError, model_validator
 
 
 class ProjectConfig(BaseModel):
@@ -14,13 +14,74 @@ class ProjectConfig(BaseModel):
     id: Optional[str] = None
 
 
+class ClassFilter(BaseModel):
+    """Configurações de um [instances.filters.<classe>]"""
+
+    # globs (fnmatch) sobre o nome da instância
+    include: List[str] = ["*"]
+    exclude: List[str] = []
+
+
+class InstanceInfo(BaseModel):
+    """Entrada do manifesto de instâncias"""
+
+    size: int  # em bytes
+    hash: str  # blake2b do conteúdo
+
+
 class InstanceConfig(BaseModel):
     """Configurações das [instances]"""
 
     location: str | Path
     classes: List[str]
+    # .csv com os limitantes conhecidos (colunas instance, lb, ub e, opcionalmente, opt)
+    metadata: Optional[str | Path] = None
+    # {"class_name": ClassFilter}
+    filters: Dict[str, ClassFilter] = {}
+    # diretório local (ex: /dev/shm) onde as instâncias são copiadas e descomprimidas
+    stage: Optional[str | Path] = None
+    stage_budget: int = 4096  # em MB
+    # comando que converte cada instância ({instance_path}) em {prepared_path}
+    prepare_command: Optional[str] = None
     # {"class_name": [list, of, instance, paths]}
     instances: Optional[Dict[str, List[Path]]] = None
+    # {instance_path: InstanceInfo}, preenchido junto com `instances`
+    manifest: Optional[Dict[Path, InstanceInfo]] = None
+    # {instance_path: prepared_path}, preenchido se houver prepare_command
+    prepared: Optional[Dict[Path, Path]] = None
+
+
+class TargetConfig(BaseModel):
+    """Configurações do [build.target] (modo time-to-target)"""
+
+    # regex: o alvo é atingido quando alguma linha da saída casar com ela
+    pattern: Optional[str] = None
+    # o alvo é atingido quando o ub chega ao ótimo conhecido (instances.metadata)
+    optimum: bool = False
+    # o alvo é atingido quando |ub - lb| / |ub| <= gap
+    gap: Optional[float] = None
+
+    @model_validator(mode="after")
+    def check_criterion(self) -> "TargetConfig":
+        if not self.pattern and not self.optimum and self.gap is None:
+            raise ValueError("[build.target] precisa de 'pattern', 'optimum' ou 'gap'")
+        return self
+
+    @property
+    def needs_bounds(self) -> bool:
+        """Se o critério depende do lb/ub extraídos pelas STREAM_RULES do parser."""
+        return self.optimum or self.gap is not None
+
+
+class AdaptiveConfig(BaseModel):
+    """Repetições adaptativas de um build ([build.adaptive])"""
+
+    # repetições de cada instância antes de avaliar o intervalo de confiança
+    min_replicates: int = 3
+    # para quando a meia-largura do intervalo de confiança do tempo médio é no
+    # máximo essa fração da média (ou ao chegar em `replicates`)
+    rel_ci: float = 0.05
+    confidence: float = 0.95
 
 
 class BuildConfig(BaseModel):
@@ -33,6 +94,92 @@ class BuildConfig(BaseModel):
     description: Optional[str] = None
     time_limit: Optional[int] = 10  # em segundos
     git_ref: Optional[str | List[str]] = None
+    target: Optional[TargetConfig] = None
+    # reaproveita o executável de um build idêntico anterior (mesmo commit, diff,
+    # arquivos não rastreados e comando); só o executável é guardado, então é opt-in
+    cache: bool = False
+    # template que roda várias instâncias ({instance_paths}) em uma única invocação
+    batch_template: Optional[str] = None
+    batch_size: int = 100
+    # builds em python: módulos importados uma única vez por um forkserver, que
+    # roda cada instância em um fork do interpretador já aquecido
+    forkserver: Optional[List[str]] = None
+    # recursos nomeados ocupados por cada execução (ex: {gurobi_license = 1})
+    resources: Dict[str, int] = {}
+    # threads (cores físicos de um mesmo nó NUMA) de cada execução
+    threads: int = 1
+    # repetições de cada instância, com sementes {seed} = 0, 1, ... (o máximo, com adaptive)
+    replicates: int = 1
+    adaptive: Optional[AdaptiveConfig] = None
+    # escada de tempos limite (ex: [10, 100]): as execuções começam no menor e só as
+    # não resolvidas sobem para o seguinte, até o time_limit
+    ladder: List[float] = []
+    # prioridade com --deadline: builds de prioridade menor são os primeiros a sair
+    priority: int = 0
+
+    @model_validator(mode="after")
+    def check_adaptive(self) -> "BuildConfig":
+        if self.adaptive is not None and self.replicates <= self.adaptive.min_replicates:
+            raise ValueError(
+                f"O build '{self.name}' tem [build.adaptive], então 'replicates'"
+                f" ({self.replicates}) deve ser maior que min_replicates"
+                f" ({self.adaptive.min_replicates})"
+            )
+        return self
+
+
+class SlurmConfig(BaseModel):
+    """Configurações do backend slurm ([slurm])"""
+
+    # argumentos extras do sbatch (ex: ["--partition=long", "--account=lab"])
+    sbatch_args: List[str] = []
+    # interpretador python nos nós (padrão: o mesmo do `xp run`)
+    python: Optional[str] = None
+    poll_interval: float = 10.0  # segundos entre chamadas ao squeue
+    # jobs submetidos dentro dessa janela (em segundos) vão no mesmo job array
+    submit_delay: float = 1.0
+
+
+class RaceConfig(BaseModel):
+    """Corrida estatística entre os builds ([race])"""
+
+    # instâncias de cada bloco (padrão: o suficiente para ocupar os --jobs)
+    block: Optional[int] = None
+    # o primeiro teste só acontece depois de tantas instâncias
+    first_test: int = 5
+    alpha: float = 0.05
+    # valor comparado, do meta.json ou do res.csv (média das repetições)
+    metric: str = "wall_time_seconds"
+    minimize: bool = True
+    # semente da ordem (embaralhada, a mesma para todos os builds) das instâncias
+    seed: int = 0
+
+
+class CappingConfig(BaseModel):
+    """Tempo limite adaptativo das execuções ([capping])"""
+
+    # uma instância já resolvida em t segundos roda com limite min(time_limit, k·t + slack)
+    k: float = 2.0
+    slack: float = 10.0
+
+
+class DeadlineConfig(BaseModel):
+    """Planejamento com prazo, para --deadline ([deadline])"""
+
+    # o que fazer, nesta ordem, enquanto o experimento previsto não cabe no prazo:
+    # tirar os builds de menor prioridade, amostrar as instâncias de cada classe
+    # ou reduzir os tempos limite
+    strategies: List[Literal["skip", "subsample", "time_limit"]] = [
+        "skip",
+        "subsample",
+        "time_limit",
+    ]
+    # menor fração das instâncias de cada classe mantida por "subsample"
+    min_fraction: float = 0.2
+    # menor fração do time_limit de cada build mantida por "time_limit"
+    min_time_limit: float = 0.1
+    # o plano usa só essa fração do prazo (folga para os erros da previsão)
+    margin: float = 0.9
 
 
 class ExperimentConfig(BaseModel):
@@ -41,6 +188,27 @@ class ExperimentConfig(BaseModel):
     project: ProjectConfig
     instances: InstanceConfig
     build: List[BuildConfig]
+    # capacidade de cada recurso nomeado dos builds (ex: {gurobi_license = 2})
+    resources: Dict[str, int] = {}
+    slurm: SlurmConfig = SlurmConfig()
+    race: Optional[RaceConfig] = None
+    capping: Optional[CappingConfig] = None
+    deadline: DeadlineConfig = DeadlineConfig()
+
+    @model_validator(mode="after")
+    def check_resources(self) -> "ExperimentConfig":
+        for build in self.build:
+            for name, amount in build.resources.items():
+                if name not in self.resources:
+                    raise ValueError(
+                        f"O build '{build.name}' usa o recurso '{name}', que não está em [resources]"
+                    )
+                if amount > self.resources[name]:
+                    raise ValueError(
+                        f"O build '{build.name}' precisa de {amount} '{name}',"
+                        f" mas a capacidade é {self.resources[name]}"
+                    )
+        return self
 
 
 def load_config(config_path: str) -> Optional[ExperimentConfig]:
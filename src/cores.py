@@ -0,0 +1,225 @@
+import fcntl
+import getpass
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SYS_NODE = Path("/sys/devices/system/node")
+SYS_CPU = Path("/sys/devices/system/cpu")
+
+
+def parse_cpulist(text: str) -> List[int]:
+    """'0-3,8,10-11' -> [0, 1, 2, 3, 8, 10, 11]"""
+    cpus: List[int] = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-")
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def physical_cores_by_node() -> Dict[int, List[int]]:
+    """
+    {nó NUMA: [uma cpu lógica por core físico]}, lido de /sys (Linux).
+    Hyperthreads irmãos são descartados: cada job recebe cores físicos inteiros.
+    Devolve {} se a topologia não puder ser lida.
+    """
+    if sys.platform != "linux":
+        return {}
+
+    allowed = os.sched_getaffinity(0)
+    nodes: Dict[int, List[int]] = {}
+    node_dirs = sorted(SYS_NODE.glob("node[0-9]*"), key=lambda p: int(p.name[4:]))
+    try:
+        if node_dirs:
+            for node_dir in node_dirs:
+                nodes[int(node_dir.name[4:])] = parse_cpulist(
+                    (node_dir / "cpulist").read_text()
+                )
+        else:
+            nodes[0] = sorted(allowed)
+
+        seen = set()
+        cores: Dict[int, List[int]] = {}
+        for node, cpus in nodes.items():
+            for cpu in cpus:
+                if cpu not in allowed:
+                    continue
+                topology = SYS_CPU / f"cpu{cpu}" / "topology"
+                core = (
+                    (topology / "physical_package_id").read_text().strip(),
+                    (topology / "core_id").read_text().strip(),
+                )
+                if core in seen:
+                    continue
+                seen.add(core)
+                cores.setdefault(node, []).append(cpu)
+        return cores
+    except (OSError, ValueError):
+        return {}
+
+
+class CoreAllocator:
+    """
+    Reserva de cores físicos para os jobs: um job de `n` threads recebe `n` cores de
+    um mesmo nó NUMA. Entre os nós em que cabe, escolhe o com menos cores livres
+    (best fit), deixando os nós mais vazios para os jobs mais largos.
+    Com `leases` (CoreLeases), só usa cores que nenhum outro processo reservou.
+    """
+
+    def __init__(
+        self,
+        cores_by_node: Dict[int, List[int]],
+        leases: Optional["CoreLeases"] = None,
+    ):
+        self.leases = leases
+        self.free: Dict[int, List[int]] = {
+            node: list(cpus) for node, cpus in cores_by_node.items() if cpus
+        }
+        self._node_of = {cpu: node for node, cpus in self.free.items() for cpu in cpus}
+
+    @property
+    def total(self) -> int:
+        return len(self._node_of)
+
+    @property
+    def widest(self) -> int:
+        """O job mais largo que pode ser alocado (o maior nó)."""
+        return max((len(c) for c in self._capacity().values()), default=0)
+
+    def _capacity(self) -> Dict[int, List[int]]:
+        capacity: Dict[int, List[int]] = {}
+        for cpu, node in self._node_of.items():
+            capacity.setdefault(node, []).append(cpu)
+        return capacity
+
+    def fits(self, n: int) -> bool:
+        return any(len(cpus) >= n for cpus in self.free.values())
+
+    def allocate(self, n: int, job: str = "") -> Optional[List[int]]:
+        """`n` cores de um mesmo nó NUMA, ou None se nenhum nó tiver `n` livres."""
+        candidates = [node for node, cpus in self.free.items() if len(cpus) >= n]
+        for node in sorted(candidates, key=lambda node: len(self.free[node])):
+            if self.leases is None:
+                cores = self.free[node][:n]
+            else:
+                cores = []
+                for cpu in self.free[node]:
+                    if len(cores) == n:
+                        break
+                    if self.leases.acquire(cpu, job):
+                        cores.append(cpu)
+                if len(cores) < n:
+                    # Outros processos usam este nó: tenta o próximo
+                    for cpu in cores:
+                        self.leases.release(cpu)
+                    continue
+            self.free[node] = [cpu for cpu in self.free[node] if cpu not in cores]
+            return cores
+        return None
+
+    def release(self, cores: List[int]) -> None:
+        for cpu in cores:
+            if self.leases is not None:
+                self.leases.release(cpu)
+            self.free[self._node_of[cpu]].append(cpu)
+        for cpus in self.free.values():
+            cpus.sort()
+
+
+LEASE_DIR = Path(os.environ.get("XP_LEASE_DIR", Path(tempfile.gettempdir()) / "xp-cores"))
+
+
+class CoreLeases:
+    """
+    Reserva de cores entre processos: cada core é um arquivo em LEASE_DIR e quem
+    o usa mantém um flock exclusivo nele. Como o kernel solta o flock quando o
+    processo morre (mesmo com kill -9), não sobram reservas de processos mortos.
+    Assim, vários `xp run` (e `xp worker`) na mesma máquina nunca fixam jobs no
+    mesmo core. O arquivo guarda quem o reservou, para o `xp status`.
+    """
+
+    def __init__(self, label: str = "", directory: Path = LEASE_DIR):
+        self.label = label
+        self.directory = Path(directory)
+        self._fds: Dict[int, int] = {}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        try:
+            # Compartilhado por todos os usuários da máquina (como o /tmp)
+            self.directory.chmod(0o1777)
+        except PermissionError:
+            pass
+
+    def _open(self, cpu: int) -> int:
+        path = self.directory / f"core{cpu}.lock"
+        try:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        except PermissionError:
+            return os.open(path, os.O_RDONLY)
+        try:
+            os.fchmod(fd, 0o666)
+        except PermissionError:
+            pass
+        return fd
+
+    def acquire(self, cpu: int, job: str = "") -> bool:
+        """Tenta reservar `cpu` (sem esperar). Devolve se conseguiu."""
+        if cpu in self._fds:
+            return False
+        fd = self._open(cpu)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        info = {
+            "pid": os.getpid(),
+            "user": getpass.getuser(),
+            "label": self.label,
+            "job": job,
+            "since": time.time(),
+        }
+        try:
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, json.dumps(info).encode(), 0)
+        except OSError:
+            pass  # sem permissão de escrita: a reserva vale, só sem a descrição
+        self._fds[cpu] = fd
+        return True
+
+    def release(self, cpu: int) -> None:
+        fd = self._fds.pop(cpu, None)
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    @staticmethod
+    def status(directory: Path = LEASE_DIR) -> Dict[int, Optional[dict]]:
+        """{cpu: descrição da reserva (ou None, se livre)} dos cores já usados pelo xp."""
+        leases: Dict[int, Optional[dict]] = {}
+        for path in sorted(Path(directory).glob("core*.lock")):
+            try:
+                cpu = int(path.stem[4:])
+                fd = os.open(path, os.O_RDONLY)
+            except (ValueError, OSError):
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                leases[cpu] = None
+            except BlockingIOError:
+                try:
+                    leases[cpu] = json.loads(path.read_text() or "{}")
+                except (OSError, ValueError):
+                    leases[cpu] = {}
+            finally:
+                os.close(fd)
+        return leases
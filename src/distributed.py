@@ -0,0 +1,305 @@
+import base64
+import gzip
+import itertools
+import json
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from src.backends import DONE, FAILED, PENDING, RUNNING, Backend, decode_job, encode_job
+from src.console import out
+
+if TYPE_CHECKING:
+    from src.run import Runner
+
+# Protocolo (JSON por linha, uma conexão por slot do worker):
+#   worker -> {"op": "get"}
+#   coordenador -> {"job": {"id": ..., "runner": {...}, "kind": "instance" | "batch",
+#                           "payload": {...}, "known_bounds": {...}}}
+#   worker -> {"op": "done", "id": ..., "files": {caminho relativo: {"data": base64, "gzip": bool}}}
+# Quando o coordenador termina, ele fecha as conexões e os workers saem.
+
+
+def parse_address(address: str) -> Tuple[int, Any]:
+    """'unix:/tmp/xp.sock' ou 'host:porta' (ou só 'porta') -> (família, endereço)."""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:") :]
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def _send(conn: socket.socket, message: dict) -> None:
+    conn.sendall(json.dumps(message).encode() + b"\n")
+
+
+def _keepalive(conn: socket.socket) -> None:
+    """Detecta workers (ou o coordenador) que somem sem fechar a conexão."""
+    if conn.family != socket.AF_INET:
+        return
+    conn.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if sys.platform == "linux":
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 30)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+
+
+# Quantas vezes um job volta para a fila por causa de um worker que caiu
+MAX_REQUEUES = 3
+
+
+class _Job:
+    def __init__(self, job_id: int, runner: "Runner", message: dict):
+        self.id = job_id
+        self.runner = runner
+        self.message = message
+        self.files: Dict[str, dict] = {}
+        self.taken = False
+        self.requeues = 0
+        self.cancelled = False
+        self.done = threading.Event()
+
+
+class Coordinator(Backend):
+    """
+    Backend de `xp run --distributed`: uma fila global de jobs, servida aos `xp worker`.
+
+    Cada job submetido espera algum worker pegá-lo, executá-lo e devolver os
+    arquivos do log (meta.json, res.csv, logs...), gravados em collect(). Se a
+    conexão de um worker cai com um job em andamento, o job volta para o início da
+    fila (até MAX_REQUEUES vezes; depois disso, ele falha). close() faz falhar os
+    jobs que ainda não terminaram, para que ninguém fique esperando por eles.
+    """
+
+    name = "distributed"
+    local = False
+
+    def __init__(self, address: str):
+        family, self.address = parse_address(address)
+        self._server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(self.address)
+        self._server.listen(128)
+
+        self._queue: deque[_Job] = deque()
+        # Jobs submetidos que ainda não terminaram (na fila ou com algum worker)
+        self._unfinished: set = set()
+        self._ids = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.n_connections = 0
+
+        self._acceptor = threading.Thread(target=self._accept, daemon=True)
+        self._acceptor.start()
+        out.info(f"Coordenador esperando workers em {address}")
+
+    def submit(self, runner: "Runner", run_instance: Any, cores: Optional[List[int]] = None) -> Any:
+        job = _Job(next(self._ids), runner, encode_job(runner, run_instance))
+        job.message["id"] = job.id
+        with self._cond:
+            if self._closed:
+                job.cancelled = True
+                job.done.set()
+                return job
+            self._queue.append(job)
+            self._unfinished.add(job)
+            self._cond.notify_all()
+        return job
+
+    def poll(self, handle: Any) -> str:
+        if handle.done.is_set():
+            return FAILED if handle.cancelled else DONE
+        return RUNNING if handle.taken else PENDING
+
+    def run(self, runner: "Runner", run_instance: Any, cores: Optional[List[int]] = None) -> None:
+        job = self.submit(runner, run_instance, cores)
+        job.done.wait()
+        self.collect(job)
+
+    def cancel(self, handle: Any) -> None:
+        # Um job já entregue a um worker termina lá (pelo tempo limite)
+        with self._cond:
+            if handle in self._queue:
+                self._queue.remove(handle)
+                self._finish(handle, cancelled=True)
+
+    def collect(self, handle: Any) -> None:
+        """Grava os arquivos devolvidos pelo worker em runner.raw_logs_dir."""
+        root = handle.runner.raw_logs_dir.resolve()
+        for rel, entry in handle.files.items():
+            path = (root / rel).resolve()
+            if root not in path.parents:
+                out.warning(f"Ignorando o arquivo {rel} devolvido por um worker.")
+                continue
+            data = base64.b64decode(entry["data"])
+            if entry.get("gzip"):
+                data = gzip.decompress(data)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            _keepalive(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: socket.socket) -> None:
+        with self._cond:
+            self.n_connections += 1
+        current: Optional[_Job] = None
+        try:
+            with conn.makefile("rb") as reader:
+                for line in reader:
+                    message = json.loads(line)
+                    if message.get("op") == "get":
+                        with self._cond:
+                            while not self._queue and not self._closed:
+                                self._cond.wait()
+                            if self._closed:
+                                break
+                            current = self._queue.popleft()
+                            current.taken = True
+                        _send(conn, {"job": current.message})
+                    elif message.get("op") == "done" and current is not None:
+                        if message.get("id") == current.id:
+                            current.files = message.get("files", {})
+                            with self._cond:
+                                self._finish(current)
+                            current = None
+        except (OSError, ValueError):
+            pass
+        finally:
+            requeued = False
+            with self._cond:
+                self.n_connections -= 1
+                if current is not None and not current.done.is_set():
+                    # O worker morreu no meio do job: devolve-o para a fila
+                    current.taken = False
+                    if current.requeues < MAX_REQUEUES and not self._closed:
+                        current.requeues += 1
+                        self._queue.appendleft(current)
+                        requeued = True
+                    else:
+                        self._finish(current, cancelled=True)
+                    self._cond.notify_all()
+            if current is not None and requeued:
+                out.warning("Um worker caiu durante um job; o job voltou para a fila.")
+            elif current is not None and not self._closed:
+                out.error(
+                    f"O job {current.id} derrubou {MAX_REQUEUES + 1} workers; desistindo dele."
+                )
+            conn.close()
+
+    def _finish(self, job: _Job, cancelled: bool = False) -> None:
+        """Marca `job` como terminado (com o lock)."""
+        job.cancelled = job.cancelled or cancelled
+        self._unfinished.discard(job)
+        job.done.set()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            # Sem o coordenador, os jobs pendentes não terminam mais: falham agora
+            self._queue.clear()
+            for job in list(self._unfinished):
+                self._finish(job, cancelled=True)
+            self._cond.notify_all()
+        self._server.close()
+        if isinstance(self.address, str):
+            Path(self.address).unlink(missing_ok=True)
+
+
+def _collect_files(root: Path, logs: str) -> Dict[str, dict]:
+    """Arquivos de `root` a devolver: logs (*.log) comprimidos, omitidos ou como estão."""
+    files = {}
+    for path in root.rglob("*"):
+        if not path.is_file():
+            continue
+        data = path.read_bytes()
+        compress = False
+        if path.suffix == ".log":
+            if logs == "none":
+                continue
+            compress = logs == "gzip"
+        if compress:
+            data = gzip.compress(data)
+        files[path.relative_to(root).as_posix()] = {
+            "data": base64.b64encode(data).decode(),
+            "gzip": compress,
+        }
+    return files
+
+
+def run_worker(address: str, n_jobs: int = 1, workdir: Optional[Path] = None, logs: str = "gzip") -> None:
+    """
+    Conecta `n_jobs` slots ao coordenador em `address` e executa os jobs recebidos
+    com a semântica normal do Runner (tempo limite, parser, meta.json), até o
+    coordenador fechar as conexões.
+    """
+    from src.cores import CoreAllocator, CoreLeases, physical_cores_by_node
+
+    family, sock_address = parse_address(address)
+    workdir = Path(tempfile.mkdtemp(prefix="xp-worker-", dir=workdir))
+    cores_by_node = physical_cores_by_node()
+    allocator = (
+        CoreAllocator(cores_by_node, leases=CoreLeases(f"xp worker {address}"))
+        if cores_by_node
+        else None
+    )
+    # Com mais slots que cores, os jobs não são fixados: só reservam os cores livres
+    pin = sum(len(c) for c in cores_by_node.values()) >= n_jobs
+    lock = threading.Lock()
+    out.info(f"Worker com {n_jobs} slots conectando a {address}")
+
+    def slot() -> None:
+        with socket.socket(family, socket.SOCK_STREAM) as conn:
+            conn.connect(sock_address)
+            _keepalive(conn)
+            with conn.makefile("rb") as reader:
+                while True:
+                    _send(conn, {"op": "get"})
+                    line = reader.readline()
+                    if not line:
+                        return
+                    job = json.loads(line)["job"]
+
+                    job_dir = workdir / str(job["id"])
+                    runner, run_instance = decode_job(job, job_dir)
+
+                    # Espera cores livres (outros processos da máquina podem usá-los)
+                    cores = None
+                    while allocator is not None and runner.threads <= allocator.widest:
+                        with lock:
+                            cores = allocator.allocate(runner.threads, run_instance.name)
+                        if cores is not None or not pin:
+                            break
+                        time.sleep(1)
+                    try:
+                        job_dir.mkdir(parents=True)
+                        runner._run_instance(run_instance, cores if pin else None)
+                    finally:
+                        if cores is not None:
+                            with lock:
+                                allocator.release(cores)
+
+                    files = _collect_files(job_dir, logs)
+                    shutil.rmtree(job_dir, ignore_errors=True)
+                    _send(conn, {"op": "done", "id": job["id"], "files": files})
+                    out.print(f"{run_instance.name}: ok")
+
+    threads = [threading.Thread(target=slot) for _ in range(max(n_jobs, 1))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    shutil.rmtree(workdir, ignore_errors=True)
+    out.info("Coordenador encerrou; worker saindo.")
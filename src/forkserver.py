@@ -0,0 +1,290 @@
+"""
+Forkserver para builds em python.
+
+O servidor (este arquivo, executado com o mesmo interpretador do run_template)
+importa uma única vez os módulos pesados do build (numpy, pyomo, ...) e, a cada
+pedido, cria um filho com fork() que roda o script como `__main__`, com a saída
+redirecionada para os logs da instância. Assim, cada instância não paga a
+inicialização do interpretador nem as importações.
+
+Protocolo (socket unix, uma conexão por instância, JSON por linha):
+    cliente -> {"argv": [...], "cwd": "...", "stdout": "...", "stderr": "...",
+                "env": {...}, "cores": [...]}
+    servidor -> {"pid": 123}
+    servidor -> {"exit_code": 0}    (quando o filho termina)
+
+Só usa a biblioteca padrão: o servidor roda no ambiente python do projeto.
+"""
+
+import importlib
+import json
+import os
+import selectors
+import shlex
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import traceback
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+def _run_child(request: dict) -> None:
+    """Executa o script pedido no processo filho (nunca retorna)."""
+    code = 1
+    try:
+        os.setsid()
+        os.chdir(request["cwd"])
+        os.environ.update(request.get("env") or {})
+        if request.get("cores"):
+            os.sched_setaffinity(0, request["cores"])
+        for fd, key, flags in (
+            (1, "stdout", os.O_WRONLY | os.O_CREAT | os.O_TRUNC),
+            (2, "stderr", os.O_WRONLY | os.O_CREAT | os.O_TRUNC),
+        ):
+            target = os.open(request[key], flags, 0o644)
+            os.dup2(target, fd)
+            os.close(target)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.close(devnull)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+        import runpy
+
+        script = request["argv"][0]
+        sys.argv = list(request["argv"])
+        sys.path.insert(0, str(Path(script).resolve().parent))
+        try:
+            runpy.run_path(script, run_name="__main__")
+            code = 0
+        except SystemExit as e:
+            if e.code is None:
+                code = 0
+            elif isinstance(e.code, int):
+                code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def serve(socket_path: str, modules: List[str], paths: List[str]) -> None:
+    """Importa `modules` e atende pedidos em `socket_path` até receber SIGTERM."""
+    sys.path[:0] = paths
+    for module in modules:
+        importlib.import_module(module)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(128)
+    # Sinaliza ao cliente que os módulos já foram importados
+    print("ready", flush=True)
+
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    children: Dict[int, socket.socket] = {}
+    running = True
+
+    def stop(*_: object) -> None:
+        nonlocal running
+        running = False
+
+    signal.signal(signal.SIGTERM, stop)
+
+    while running:
+        for _key, _events in selector.select(timeout=0.05):
+            conn, _ = server.accept()
+            with conn.makefile("r") as reader:
+                request = json.loads(reader.readline())
+            pid = os.fork()
+            if pid == 0:
+                # O filho não herda as conexões dos outros filhos: se as mantivesse
+                # abertas, o cliente de um filho que termina não veria o EOF
+                selector.close()
+                server.close()
+                conn.close()
+                for other in children.values():
+                    other.close()
+                _run_child(request)
+            children[pid] = conn
+            conn.sendall(json.dumps({"pid": pid}).encode() + b"\n")
+
+        # Sem threads (fork + threads não combinam): os filhos são coletados aqui
+        while children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            conn = children.pop(pid, None)
+            if conn is None:
+                continue
+            try:
+                exit_code = os.waitstatus_to_exitcode(status)
+                conn.sendall(json.dumps({"exit_code": exit_code}).encode() + b"\n")
+            except OSError:
+                pass
+            finally:
+                conn.close()
+
+    for pid in children:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    server.close()
+
+
+def split_command(command: str, executable: Path) -> Tuple[List[str], List[str]]:
+    """
+    Separa o comando formatado ("python main.py --file x") em interpretador
+    (["python"]) e argv do script (["main.py", "--file", "x"]).
+    """
+    tokens = shlex.split(command)
+    for i, token in enumerate(tokens):
+        if Path(token) == Path(executable):
+            return tokens[:i] or ["python3"], tokens[i:]
+    raise ValueError(f"{executable} not found in the command '{command}'")
+
+
+class ForkServer:
+    """
+    Cliente: inicia (no primeiro uso, com o interpretador do comando) o servidor de
+    um build e roda instâncias através dele.
+
+        with ForkServer(["numpy", "pyomo.environ"], [project_dir]) as fs:
+            exit_code = fs.run(command, executable, stdout_path, stderr_path, timeout=60)
+    """
+
+    def __init__(self, modules: List[str], paths: List[str]):
+        self.modules = modules
+        self.paths = paths
+        self.process: Optional[subprocess.Popen] = None
+        self._dir = tempfile.mkdtemp(prefix="xp-forkserver-")
+        self.socket_path = os.path.join(self._dir, "socket")
+        self.log_path = os.path.join(self._dir, "stderr.log")
+        self._lock = threading.Lock()
+
+    def _start(self, interpreter: List[str]) -> None:
+        command = interpreter + [
+            str(Path(__file__).resolve()),
+            self.socket_path,
+            json.dumps(self.modules),
+            json.dumps(self.paths),
+        ]
+        with open(self.log_path, "w") as log:
+            self.process = subprocess.Popen(
+                command, stdout=subprocess.PIPE, stderr=log, text=True
+            )
+        # Espera as importações terminarem
+        line = self.process.stdout.readline() if self.process.stdout else ""
+        if line.strip() != "ready":
+            self.process.wait()
+            raise RuntimeError(
+                f"forkserver failed to start:\n{Path(self.log_path).read_text()[-2000:]}"
+            )
+
+    def __enter__(self) -> "ForkServer":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def ensure_started(self, command: str, executable: Path) -> List[str]:
+        """
+        Inicia o servidor com o interpretador de `command`, se ainda não foi iniciado
+        (para que as importações não contem no tempo da instância). Devolve o argv.
+        """
+        interpreter, argv = split_command(command, executable)
+        with self._lock:
+            if self.process is None:
+                self._start(interpreter)
+            elif self.process.poll() is not None:
+                raise RuntimeError(
+                    f"forkserver died:\n{Path(self.log_path).read_text()[-2000:]}"
+                )
+        return argv
+
+    def run(
+        self,
+        command: str,
+        executable: Path,
+        stdout_path: Path,
+        stderr_path: Path,
+        timeout: Optional[float] = None,
+        env: Optional[Dict[str, str]] = None,
+        cores: Optional[List[int]] = None,
+    ) -> int:
+        """
+        Roda o comando (o run_template formatado) em um filho do servidor e devolve
+        o exit code. `env` é acrescentado ao ambiente do filho, que é fixado em `cores`.
+        Levanta subprocess.TimeoutExpired (como subprocess.run) após matar o filho.
+        """
+        argv = self.ensure_started(command, executable)
+        request = {
+            "argv": argv,
+            "cwd": os.getcwd(),
+            "stdout": str(Path(stdout_path).resolve()),
+            "stderr": str(Path(stderr_path).resolve()),
+            "env": env or {},
+            "cores": cores,
+        }
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.connect(self.socket_path)
+            conn.sendall(json.dumps(request).encode() + b"\n")
+            messages = self._messages(conn)
+            pid = next(messages)["pid"]
+
+            conn.settimeout(timeout)
+            try:
+                return int(next(messages)["exit_code"])
+            except socket.timeout:
+                # O filho é líder da sua sessão: mata também os seus subprocessos
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                raise subprocess.TimeoutExpired(argv, timeout or 0)
+            except StopIteration:
+                raise RuntimeError("forkserver closed the connection")
+
+    @staticmethod
+    def _messages(conn: socket.socket) -> Iterator[dict]:
+        buffer = b""
+        while True:
+            while b"\n" not in buffer:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return
+                buffer += chunk
+            line, buffer = buffer.split(b"\n", 1)
+            yield json.loads(line)
+
+    def close(self) -> None:
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1], json.loads(sys.argv[2]), json.loads(sys.argv[3]))
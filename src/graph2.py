@@ -384,20 +384,26 @@ def _(df, histo_time_cutoff, show_not_solved_switch, source_histogram):
     # Find all columns starting with "time_"
     time_cols = [col for col in _df.columns if col.startswith("time_")]
     all_functions = [col.replace("time_", "") for col in time_cols]
-
-    valid_functions = []
-    for func in all_functions:
-        # if the column "time_{func}" is str, transform it to float
-        if _df[f"time_{func}"].dtype == pl.Utf8:
-            _df = _df.with_columns(
-                pl.col(f"time_{func}").str.replace(",", ".").cast(pl.Float64)
-            )
-        # Calculate the average percentage of total time across all instances
-        avg_pct = _df.select((pl.col(f"time_{func}") / pl.col("time")).mean()).item()
-
-        # Keep only functions between 1% (0.01) and 99% (0.99)
-        if avg_pct and 0.01 <= avg_pct <= 0.99:
-            valid_functions.append(func)
+    mo.stop(not all_functions, "No time_* columns to analyze.")
+
+    # if a column "time_{func}" is str, transform it to float (all at once)
+    _df = _df.with_columns(
+        pl.col(c).str.replace(",", ".").cast(pl.Float64)
+        for c in time_cols
+        if _df[c].dtype == pl.Utf8
+    )
+    # Average percentage of total time across all instances, for every function in one pass
+    _avg_pct = _df.select(
+        (pl.col(f"time_{func}") / pl.col("time")).mean().alias(func)
+        for func in all_functions
+    ).row(0, named=True)
+
+    # Keep only functions between 1% (0.01) and 99% (0.99)
+    valid_functions = [
+        func
+        for func in all_functions
+        if _avg_pct[func] and 0.01 <= _avg_pct[func] <= 0.99
+    ]
 
     # ---------------------------------------------------------
     # 3. Calculate Percentages and Prepare Data
@@ -0,0 +1,91 @@
+import json
+import statistics
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Um job de um experimento: (build, classe, caminho da instância)
+JobKey = Tuple[str, str, Path]
+
+
+def load_wall_times(
+    raw_logs_dir: Path, exclude_tag: str = ""
+) -> Dict[Tuple[str, str], float]:
+    """
+    {(build, instância): mediana dos wall times} dos meta.json das execuções
+    anteriores em raw_logs_dir. A tag `exclude_tag` e os seus shards são ignorados:
+    assim, todos os shards de um array job fazem a mesma previsão, mesmo que alguns
+    comecem depois de outros terminarem.
+    """
+    times: Dict[Tuple[str, str], List[float]] = {}
+    if not raw_logs_dir.is_dir():
+        return {}
+    for meta_path in raw_logs_dir.glob("*/*/*/meta.json"):
+        tag = meta_path.parents[2].name
+        if exclude_tag and (
+            tag == exclude_tag or tag.startswith(f"{exclude_tag}-shard")
+        ):
+            continue
+        try:
+            meta = json.loads(meta_path.read_text())
+            wall_time = float(meta["wall_time_seconds"])
+            key = (meta["build_name"], meta["instance_name"])
+        except (OSError, ValueError, KeyError, TypeError):
+            continue
+        times.setdefault(key, []).append(wall_time)
+    return {key: statistics.median(values) for key, values in times.items()}
+
+
+def predict_costs(
+    jobs: Sequence[JobKey],
+    wall_times: Dict[Tuple[str, str], float],
+    sizes: Dict[Path, int],
+    time_limits: Dict[str, float],
+    fallback: Optional[Dict[str, float]] = None,
+) -> Dict[JobKey, float]:
+    """
+    Custo previsto (em segundos) de cada job, do mais para o menos confiável:
+    1. o wall time histórico do mesmo build na mesma instância;
+    2. a mediana dos wall times históricos da instância (com outros builds);
+    3. o tamanho da instância, convertido em segundos pela mediana de
+       segundos/byte das instâncias com histórico (ou só o tamanho, se não há
+       histórico nenhum);
+    4. `fallback[build]`, se dado (ex: o tempo limite, uma previsão pessimista);
+       senão, a mediana dos custos já previstos (ou 1).
+    Nenhum custo passa do tempo limite do build.
+    """
+    by_instance: Dict[str, List[float]] = {}
+    for (_, instance), wall_time in wall_times.items():
+        by_instance.setdefault(instance, []).append(wall_time)
+
+    rates = [
+        statistics.median(by_instance[path.name]) / sizes[path]
+        for path in {path for _, _, path in jobs}
+        if path.name in by_instance and sizes.get(path)
+    ]
+    seconds_per_byte = statistics.median(rates) if rates else None
+
+    costs: Dict[JobKey, Optional[float]] = {}
+    for job in jobs:
+        build, _, path = job
+        cost: Optional[float] = wall_times.get((build, path.name))
+        if cost is None and path.name in by_instance:
+            cost = statistics.median(by_instance[path.name])
+        if cost is None and sizes.get(path):
+            if seconds_per_byte:
+                cost = sizes[path] * seconds_per_byte
+            elif not wall_times:
+                # Sem histórico nenhum, os custos ficam em bytes (só a proporção importa)
+                costs[job] = float(sizes[path])
+                continue
+        if cost is not None and build in time_limits:
+            cost = min(cost, time_limits[build])
+        costs[job] = cost
+
+    known = [c for c in costs.values() if c is not None]
+    default = statistics.median(known) if known else 1.0
+    return {
+        job: cost
+        if cost is not None
+        else (fallback or {}).get(job[0], default)
+        for job, cost in costs.items()
+    }
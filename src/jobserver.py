@@ -0,0 +1,146 @@
+import functools
+import os
+import re
+import select
+import shutil
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+TOKEN = b"+"
+
+
+@functools.lru_cache(maxsize=None)
+def make_version() -> Optional[Tuple[int, int]]:
+    """(major, minor) do GNU make instalado, ou None se não houver um."""
+    try:
+        result = subprocess.run(["make", "--version"], capture_output=True, text=True)
+    except OSError:
+        return None
+    match = re.search(r"GNU Make (\d+)\.(\d+)", result.stdout)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+class JobServer:
+    """
+    Jobserver do GNU make compartilhado por todos os builds.
+
+    O orçamento de `tokens` CPUs vale para todos os builds juntos: cada build ocupa um
+    token enquanto roda (o seu "token implícito", como o make faz) e os seus filhos
+    (`make`, `cmake --build`, `ninja` >= 1.13) pegam os demais da fifo via MAKEFLAGS.
+    O orçamento pode ser reduzido com resize() enquanto os builds rodam: os tokens
+    excedentes são retirados conforme os builds os devolvem.
+
+    Os tokens ficam sempre em uma fifo. Com make >= 4.4 (ou sem make), os builds a
+    recebem pelo caminho (--jobserver-auth=fifo:...); com makes anteriores, que não
+    entendem fifo:, por dois descritores herdados (o protocolo de pipe, R,W), que
+    devem ser passados ao subprocesso com `pass_fds`.
+    """
+
+    def __init__(self, tokens: int):
+        self._dir = Path(tempfile.mkdtemp(prefix="xp-jobserver-"))
+        self.path = self._dir / "fifo"
+        os.mkfifo(self.path)
+        # O_RDWR mantém a fifo aberta (sem bloquear) enquanto o jobserver existir
+        self._fd = os.open(self.path, os.O_RDWR | os.O_NONBLOCK)
+
+        # Makes sem o protocolo fifo herdam um descritor de leitura e um de escrita
+        version = make_version()
+        self.pass_fds: Tuple[int, ...] = ()
+        if version is not None and version < (4, 4):
+            read_fd = os.open(self.path, os.O_RDONLY)
+            write_fd = os.open(self.path, os.O_WRONLY)
+            self.pass_fds = (read_fd, write_fd)
+            # make < 4.2 só conhece o nome antigo da opção
+            option = "--jobserver-auth" if version >= (4, 2) else "--jobserver-fds"
+            self._auth = f"{option}={read_fd},{write_fd}"
+        else:
+            self._auth = f"--jobserver-auth=fifo:{self.path}"
+
+        self.tokens = 0
+        self._excess = 0  # tokens a serem retirados da circulação
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._drainer = threading.Thread(target=self._drain, daemon=True)
+        self._drainer.start()
+        self.resize(tokens)
+
+    def __enter__(self) -> "JobServer":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    @property
+    def env(self) -> Dict[str, str]:
+        """Variáveis de ambiente que conectam um build a este jobserver."""
+        return {
+            "MAKEFLAGS": f"-j{self.tokens} {self._auth}",
+        }
+
+    def resize(self, tokens: int) -> None:
+        """Muda o orçamento total de CPUs dos builds."""
+        tokens = max(tokens, 1)
+        with self._lock:
+            delta = tokens - self.tokens
+            self.tokens = tokens
+            if delta < 0:
+                self._excess -= delta
+                return
+            # Primeiro cancela retiradas pendentes, depois devolve tokens à fifo
+            cancel = min(delta, self._excess)
+            self._excess -= cancel
+            if delta - cancel:
+                os.write(self._fd, TOKEN * (delta - cancel))
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Ocupa um token durante o bloco (o token implícito de um build)."""
+        self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _acquire(self) -> None:
+        while True:
+            select.select([self._fd], [], [], 1.0)
+            with self._lock:
+                try:
+                    os.read(self._fd, 1)
+                    return
+                except BlockingIOError:
+                    continue
+
+    def _release(self) -> None:
+        with self._lock:
+            if self._excess > 0:
+                self._excess -= 1
+            else:
+                os.write(self._fd, TOKEN)
+
+    def _drain(self) -> None:
+        while not self._closed.is_set():
+            if not self._excess:
+                self._closed.wait(0.5)
+                continue
+            select.select([self._fd], [], [], 0.5)
+            with self._lock:
+                if self._excess <= 0:
+                    continue
+                try:
+                    os.read(self._fd, 1)
+                    self._excess -= 1
+                except BlockingIOError:
+                    pass
+
+    def close(self) -> None:
+        self._closed.set()
+        self._drainer.join()
+        os.close(self._fd)
+        for fd in self.pass_fds:
+            os.close(fd)
+        shutil.rmtree(self._dir, ignore_errors=True)
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+from concurrent import futures
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.console import out
+
+MANIFEST_CACHE_DIR = Path("~/.cache/xp/manifests").expanduser()
+
+
+def hash_file(path: Path) -> str:
+    """Hash (blake2b, 128 bits) do conteúdo do arquivo."""
+    digest = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    Índice dos arquivos de um diretório de instâncias, guardado em disco.
+
+    Cada diretório é listado com um único `os.scandir` (só os nomes, sem um stat
+    por arquivo) e a listagem só é refeita quando o mtime do diretório muda. Os
+    hashes de conteúdo são calculados apenas para as instâncias usadas e
+    reaproveitados enquanto o tamanho e o mtime do arquivo (lidos do próprio
+    arquivo, um stat por instância usada) não mudarem.
+    """
+
+    def __init__(self, location: Path):
+        self.location = Path(location).resolve()
+        key = hashlib.sha1(str(self.location).encode()).hexdigest()
+        self.cache_path = MANIFEST_CACHE_DIR / f"{key}.json"
+        # {dir relativo: {"mtime_ns": int, "dirs": [...], "files": [...]}}
+        self.dirs: Dict[str, dict] = {}
+        # {caminho relativo: [size, mtime_ns, hash]}
+        self.hashes: Dict[str, list] = {}
+        self._dirty = False
+
+        try:
+            with self.cache_path.open("r") as f:
+                cached = json.load(f)
+            self.dirs = cached.get("dirs", {})
+            self.hashes = cached.get("hashes", {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def listing(self, rel_dir: str = "") -> Optional[dict]:
+        """Listagem de location/rel_dir, ou None se não for um diretório."""
+        path = self.location / rel_dir
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        cached = self.dirs.get(rel_dir)
+        if cached is not None and cached["mtime_ns"] == mtime_ns:
+            return cached
+
+        if not path.is_dir():
+            return None
+
+        listing: dict = {"mtime_ns": mtime_ns, "dirs": [], "files": []}
+        # O tipo vem do próprio scandir (d_type): nenhum stat por arquivo
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    listing["dirs"].append(entry.name)
+                elif entry.is_file():
+                    listing["files"].append(entry.name)
+
+        self.dirs[rel_dir] = listing
+        self._dirty = True
+        return listing
+
+    def stat(self, path: Path) -> Tuple[int, int]:
+        """
+        (size, mtime_ns) do próprio arquivo. Não vem da listagem em cache: editar
+        uma instância no lugar não muda o mtime do diretório, e o hash ficaria velho.
+        """
+        stat = path.stat()
+        return stat.st_size, stat.st_mtime_ns
+
+    def hash(
+        self, paths: Iterable[Path], n_workers: int = 16
+    ) -> Dict[Path, Tuple[int, str]]:
+        """
+        (tamanho, hash de conteúdo) de cada um de `paths`, calculando em paralelo
+        só os hashes que faltam (um único stat por arquivo).
+        """
+        result: Dict[Path, Tuple[int, str]] = {}
+        missing: List[Tuple[Path, str, int, int]] = []
+        for path in paths:
+            rel = path.relative_to(self.location).as_posix()
+            size, mtime_ns = self.stat(path)
+            cached = self.hashes.get(rel)
+            if cached and cached[0] == size and cached[1] == mtime_ns:
+                result[path] = (size, cached[2])
+            else:
+                missing.append((path, rel, size, mtime_ns))
+
+        if missing:
+            out.info(f"Calculando o hash de {len(missing)} instâncias...")
+            with futures.ThreadPoolExecutor(max_workers=n_workers) as executor:
+                digests = executor.map(lambda m: hash_file(m[0]), missing)
+                for (path, rel, size, mtime_ns), digest in zip(missing, digests):
+                    self.hashes[rel] = [size, mtime_ns, digest]
+                    result[path] = (size, digest)
+            self._dirty = True
+
+        return result
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix(f".{os.getpid()}.tmp")
+        with tmp_path.open("w") as f:
+            json.dump({"dirs": self.dirs, "hashes": self.hashes}, f)
+        tmp_path.replace(self.cache_path)
+        self._dirty = False
@@ -1,6 +1,9 @@
+import json
 import os
+import re
 import subprocess
 from pathlib import Path
+from typing import Optional
 
 import pandas as pd  # type: ignore
 import psutil
@@ -13,6 +16,19 @@ except ImportError:
 
     out = Console()  # type: ignore
 
+try:
+    from src.bounds import KnownBounds, report_violations
+    from src.profiles import export_profiles
+    from src.stats import aggregate_replicates
+except ImportError:
+    KnownBounds = None  # type: ignore
+
+    def export_profiles(raw_logs_dir: Path, output_prefix: Path) -> None:
+        pass
+
+    def aggregate_replicates(results: pd.DataFrame) -> None:
+        return None
+
 
 def get_parser_command(parser_path: Path) -> str:
     # Check if parser_path exists
@@ -65,16 +81,19 @@ def parse_instance(parser_cmd: str, inst_path: Path) -> None:
 def gather_results(
     raw_logs_dir: Path,
     parsed_logs_csv: Path,
+    known_bounds: Optional["KnownBounds"] = None,
 ) -> None:
     """
     Para da instância em raw_logs_dir, lê o res.csv gerado pelo parser e junta em um dataframe.
     Escreve esse dataframe em parsed_logs_csv.
+    Se known_bounds for dado, valida todos os limitantes da tabela agregada de uma vez.
     """
     out.log("Agregando resultados...")
     all_results = []
 
     for inst_dir in raw_logs_dir.iterdir():
-        if not inst_dir.is_dir():
+        # _batches/ guarda a saída completa das execuções em batch
+        if not inst_dir.is_dir() or inst_dir.name.startswith("_"):
             continue
 
         res_csv_path = inst_dir / "res.csv"
@@ -85,6 +104,13 @@ def gather_results(
         try:
             df = pd.read_csv(res_csv_path)
             df["instance_name"] = inst_dir.name
+            # Execuções com limite reduzido ([capping]) são censuradas nesse limite
+            meta_path = inst_dir / "meta.json"
+            if meta_path.exists():
+                meta = json.loads(meta_path.read_text())
+                if "capped" in meta:
+                    df["capped"] = meta["capped"]
+                    df["time_limit"] = meta["time_limit"]
             all_results.append(df)
         except Exception as e:
             out.error(f"Erro ao ler {res_csv_path}: {e}")
@@ -95,6 +121,24 @@ def gather_results(
         final_df.to_csv(parsed_logs_csv, index=False)
         out.info(f"Resultados agregados escritos em {parsed_logs_csv}")
 
+        # Perfis de chamadas (profile.csv), se o parser os gerou
+        export_profiles(raw_logs_dir, parsed_logs_csv.with_suffix(""))
+
+        # Estatísticas por par (build, instância) das repetições ({seed}), se houver
+        replicates = aggregate_replicates(final_df)
+        if replicates is not None:
+            replicates_csv = parsed_logs_csv.with_name(
+                f"{parsed_logs_csv.stem}_replicates.csv"
+            )
+            replicates.to_csv(replicates_csv, index=False)
+            out.info(f"Estatísticas das repetições escritas em {replicates_csv}")
+
+        if known_bounds is not None:
+            report_violations(
+                known_bounds.validate(final_df),
+                parsed_logs_csv.with_name(f"{parsed_logs_csv.stem}_violations.csv"),
+            )
+
         # Create or update the symbolic link to the last results CSV
         try:
             symlink_path = Path.home() / "last_results.csv"
@@ -110,19 +154,137 @@ def gather_results(
         out.warning("Nenhum resultado foi agregado.")
 
 
+def _recorded_time_limit(meta: dict) -> Optional[float]:
+    """
+    Tempo limite com que a execução rodou: o do meta.json (degraus e capping) ou o
+    do comando `timeout` (o do build). None se não houver registro (ex: forkserver).
+    """
+    if meta.get("time_limit") is not None:
+        return float(meta["time_limit"])
+    match = re.search(r"kill-after=\d+\s+(\d+(?:\.\d+)?)s", meta.get("command", ""))
+    return float(match.group(1)) if match else None
+
+
+def gather_results_at(
+    raw_logs_dir: Path,
+    parsed_logs_csv: Path,
+    time_limits: list[float],
+) -> None:
+    """
+    Avalia uma única execução (longa) em cada um dos tempos limite (menores) de
+    time_limits, usando os eventos de lb/ub com tempo (events.csv) de cada instância.
+    Para cada limite t, escreve `{parsed_logs_csv}@{t}s.csv`, como se o experimento
+    tivesse sido executado com tempo limite t: a instância só é resolvida se terminou
+    antes de t, e lb/ub são os últimos valores registrados até t.
+    """
+    metas, events = [], []
+    for inst_dir in raw_logs_dir.iterdir():
+        meta_path = inst_dir / "meta.json"
+        if not inst_dir.is_dir() or not meta_path.exists():
+            continue
+
+        with meta_path.open("r") as f:
+            meta = json.load(f)
+        row = {
+            "instance_name": inst_dir.name,
+            "instance": meta.get("instance_name"),
+            "build_name": meta.get("build_name"),
+            "wall_time_seconds": meta.get("wall_time_seconds"),
+            "exit_code": meta.get("exit_code"),
+            "cap": meta.get("time_limit") if meta.get("capped") else None,
+            "run_limit": _recorded_time_limit(meta),
+        }
+
+        # Bounds finais, para as instâncias que terminaram antes do limite
+        res_csv_path = inst_dir / "res.csv"
+        if res_csv_path.exists():
+            res = pd.read_csv(res_csv_path)
+            for col in ("lb", "ub"):
+                if col in res.columns and len(res):
+                    row[f"final_{col}"] = res[col].iloc[0]
+        metas.append(row)
+
+        events_csv_path = inst_dir / "events.csv"
+        if events_csv_path.exists():
+            df = pd.read_csv(events_csv_path)
+            df["instance_name"] = inst_dir.name
+            events.append(df)
+
+    if not metas:
+        out.warning("Nenhum resultado foi agregado.")
+        return
+
+    base = pd.DataFrame(metas)
+    for col in ("final_lb", "final_ub"):
+        if col not in base.columns:
+            base[col] = None
+    if not events:
+        out.warning(f"Nenhum events.csv em {raw_logs_dir}: lb/ub parciais indisponíveis.")
+    all_events = (
+        pd.concat(events, ignore_index=True).sort_values("time", kind="stable")
+        if events
+        else pd.DataFrame(columns=["time", "lb", "ub", "instance_name"])
+    )
+
+    for time_limit in sorted(time_limits):
+        # Último lb/ub (não nulo) de cada instância até o limite
+        seen = (
+            all_events[all_events["time"] <= time_limit]
+            .groupby("instance_name")[["lb", "ub"]]
+            .last()
+        )
+        df = base.join(seen, on="instance_name")
+
+        finished = (df["exit_code"] == 0) & (df["wall_time_seconds"] <= time_limit)
+        df["lb"] = df["final_lb"].where(finished, df["lb"])
+        df["ub"] = df["final_ub"].where(finished, df["ub"])
+        df["time"] = df["wall_time_seconds"].where(finished)
+        df["exit_code"] = df["exit_code"].where(finished, 124)
+        df["wall_time_seconds"] = df["wall_time_seconds"].clip(upper=time_limit)
+        df["time_limit"] = time_limit
+        # Sem terminar, uma execução com limite reduzido menor que t não diz nada em t
+        df["capped"] = ~finished & (pd.to_numeric(df["cap"]) < time_limit)
+
+        # Acima do limite da própria execução, quem não terminou não diz nada em t
+        run_limit = pd.to_numeric(df["run_limit"])
+        exceeded = ~finished & ~df["capped"] & (run_limit < time_limit)
+        if exceeded.any():
+            out.warning(
+                f"{time_limit:g}s excede o time_limit ({run_limit[exceeded].max():g}s)"
+                f" de {int(exceeded.sum())} execução(ões) que não terminaram: seus"
+                " lb/ub são os do fim da execução, não os que teriam nesse limite."
+            )
+
+        output_csv = parsed_logs_csv.with_name(
+            f"{parsed_logs_csv.stem}@{time_limit:g}s.csv"
+        )
+        df.drop(columns=["final_lb", "final_ub", "cap", "run_limit"]).to_csv(
+            output_csv, index=False
+        )
+        out.info(
+            f"{int(finished.sum())}/{len(df)} resolvidas com {time_limit:g}s: {output_csv}"
+        )
+
+
 def parse_and_gather(
     raw_logs_dir: Path,
     parsed_logs_csv: Path,
     parser_path: Path,
+    known_bounds: Optional["KnownBounds"] = None,
+    time_limits: Optional[list[float]] = None,
 ) -> None:
     """
     Para cada instância em raw_logs_dir, chama o parser e depois agrega os resultados.
+    Se time_limits for dado, também gera as tabelas virtuais para cada limite.
     """
     from concurrent import futures
 
     n_workers = psutil.cpu_count() or 1
     command = get_parser_command(parser_path)
-    inst_dirs = [d for d in raw_logs_dir.iterdir() if d.is_dir()]
+    # _rungs/ e _batches/ não são instâncias: gather_results também os ignora
+    inst_dirs = [
+        d for d in raw_logs_dir.iterdir() if d.is_dir() and not d.name.startswith("_")
+    ]
 
     with futures.ThreadPoolExecutor(max_workers=n_workers) as executor:
         future_to_inst = {
@@ -145,4 +307,12 @@ def parse_and_gather(
     gather_results(
         raw_logs_dir=raw_logs_dir,
         parsed_logs_csv=parsed_logs_csv,
+        known_bounds=known_bounds,
     )
+
+    if time_limits:
+        gather_results_at(
+            raw_logs_dir=raw_logs_dir,
+            parsed_logs_csv=parsed_logs_csv,
+            time_limits=time_limits,
+        )
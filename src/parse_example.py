@@ -197,6 +197,69 @@ def aggregate_all_times(file_path):
     return sorted(results, key=lambda x: x["time"], reverse=True)
 
 
+def build_call_tree(file_path):
+    """
+    Builds a call tree from the same '0.000s: FunctionName' lines, using their
+    indentation as nesting: each level deeper is indented by two more spaces, e.g.
+
+        0.010 s: Pricing
+      0.300 s: ColumnGeneration
+    0.500 s: Root
+
+    Lines are printed when the function returns, so the children of a call come
+    right before it, one level deeper. Lines without indentation give a flat profile.
+    Returns a list of rows (stack, time, self_time, count) where "stack" is the
+    ';'-joined path from the root, as in the collapsed flamegraph format.
+    """
+    pattern = re.compile(r"(^|\S)( *)(\d+\.\d+)\s+s:\s+(\w+)")
+
+    # pending[depth] = calls already closed at that depth, waiting for their parent
+    pending = defaultdict(list)
+    try:
+        with open(file_path, "r") as f:
+            for line in f:
+                match = pattern.search(line)
+                if not match:
+                    continue
+                indent = len(match.group(2)) - (1 if match.group(1) else 0)
+                depth = max(indent, 0) // 2
+                node = {
+                    "name": match.group(4),
+                    "time": float(match.group(3)),
+                    "children": pending.pop(depth + 1, []),
+                }
+                pending[depth].append(node)
+    except FileNotFoundError:
+        return []
+
+    rows = defaultdict(lambda: {"time": 0.0, "self_time": 0.0, "count": 0})
+
+    def collapse(node, prefix):
+        stack = f"{prefix};{node['name']}" if prefix else node["name"]
+        children_time = sum(child["time"] for child in node["children"])
+        rows[stack]["time"] += node["time"]
+        rows[stack]["self_time"] += max(node["time"] - children_time, 0.0)
+        rows[stack]["count"] += 1
+        for child in node["children"]:
+            collapse(child, stack)
+
+    # Calls whose parent never returned (e.g. killed by the time limit) become roots
+    for depth in sorted(pending):
+        for node in pending[depth]:
+            collapse(node, "")
+
+    return [{"stack": stack, **values} for stack, values in rows.items()]
+
+
+def write_profile_csv(tree_rows, output_csv):
+    with open(output_csv, "w", newline="") as f:
+        writer = csv.DictWriter(
+            f, fieldnames=["stack", "time", "self_time", "count"]
+        )
+        writer.writeheader()
+        writer.writerows(tree_rows)
+
+
 def build_csv_row(directory_path, meta, general, times):
     """
     Constructs a flat dictionary representing a single CSV row from aggregated data.
@@ -269,6 +332,7 @@ def parse(directory_path, output_csv):
 
     general = parse_graph_log(log_path)
     times = aggregate_all_times(log_path)
+    tree = build_call_tree(log_path)
     meta = parse_meta_file(meta_path)
 
     # 2. Build CSV Row
@@ -284,55 +348,9 @@ def parse(directory_path, output_csv):
         writer.writeheader()
         writer.writerow(csv_row)
 
-
-def check_instance_bounds(inst_name: str, lb: float | None, ub: float | None):
-    """
-    Placeholder. For now, just assume that there is a
-    `~/rasc/inst/metadata.csv` and it has the best know ub and lb for each instance.
-    """
-    # get the instance line from the metadata.csv
-    known_lb = None
-    known_ub = None
-    with open(Path.home() / "rasc" / "inst" / "metadata.csv", "r") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row["instance"] == inst_name:
-                known_lb = float(row["lb"])
-                known_ub = float(row["ub"])
-    if known_lb is None or known_ub is None:
-        print(f"Missing information about {inst_name}", file=sys.stderr)
-        exit(1)
-
-    if lb is not None and known_ub is not None and lb > known_ub:
-        print(
-            f"{inst_name}: computed lower {lb} >= known upper {known_ub}",
-            file=sys.stderr,
-        )
-        exit(1)
-
-    if ub is not None and known_lb is not None and ub < known_lb:
-        print(
-            f"{inst_name}: computed upper {ub} <= known lower {known_lb}",
-            file=sys.stderr,
-        )
-        exit(1)
-
-    if lb is None or ub is None:
-        return
-
-    if lb > ub:
-        print(
-            f"{inst_name}: computed lower {lb} > computed upper {ub}", file=sys.stderr
-        )
-        exit(1)
-
-    if lb == ub and known_lb != known_ub:
-        print(
-            f"{inst_name}: computed optimal {lb}, but known bounds are {known_lb}-{known_ub}",
-        )
-        return
-
-    print(f"{inst_name}: bounds look good.")
+    # 4. Call tree, gathered by `xp` into per-build speedscope/flamegraph files
+    if tree:
+        write_profile_csv(tree, directory_path / "profile.csv")
 
 
 # --- Main Execution ---
@@ -340,22 +358,10 @@ if __name__ == "__main__":
     file_path = Path(sys.argv[1])
     output_csv = Path(sys.argv[1]) / "res.csv"
 
+    # The bounds in res.csv are checked against the known ones by `xp`,
+    # over the whole gathered table (see `instances.metadata` / `xp parse --bounds`).
     try:
         parse(file_path, output_csv)
 
-        # After parsing, check bounds
-        with open(output_csv, "r") as f:
-            reader = csv.DictReader(f)
-            if (
-                reader.fieldnames
-                and "lb" in reader.fieldnames
-                and "ub" in reader.fieldnames
-            ):
-                for row in reader:
-                    inst_name = row["instance"]
-                    lb = float(row["lb"]) if row["lb"] else None
-                    ub = float(row["ub"]) if row["ub"] else None
-                    check_instance_bounds(inst_name, lb, ub)
-
     except FileNotFoundError:
         print(f"Error: {file_path} not found.", file=sys.stderr)
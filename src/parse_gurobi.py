@@ -19,13 +19,34 @@ from rich.console import Console
 
 out = Console()
 
+FLOAT_PATTERN = r"[+\-]?\d+(?:\.\d+)?(?:[eE][+\-]?\d+)?"
+
+# Rules shared with `xp run --stream`, which applies them line by line while
+# Gurobi runs (the last match of each named group wins).
+STREAM_RULES = {
+    # Progress rows, e.g.
+    # 1135821 99311    6.00000   39   64    7.00000    6.00000  14.3%  33.6 3595s
+    "progress": (
+        r"(?P<ub>" + FLOAT_PATTERN + r")\s+(?P<lb>" + FLOAT_PATTERN + r")\s+"
+        r"(?P<gap_percent>" + FLOAT_PATTERN + r")%\s+\S+\s+(?P<gurobi_time_seconds>\d+)s\s*$"
+    ),
+    "optimal_solution": (
+        r"Best objective (?P<ub>"
+        + FLOAT_PATTERN
+        + r"), best bound (?P<lb>"
+        + FLOAT_PATTERN
+        + r"), gap (?P<gap_percent>"
+        + FLOAT_PATTERN
+        + r")%"
+    ),
+}
+
 
 def parse_gurobi_log(file_path):
     """
     Parses a Gurobi log file and returns a dictionary of statistics.
     """
     data = {}
-    FLOAT_PATTERN = r"[+\-]?\d+(?:\.\d+)?(?:[eE][+\-]?\d+)?"
 
     patterns = {
         "version": r"Gurobi Optimizer version ([^\s]+)",
@@ -44,15 +65,7 @@ def parse_gurobi_log(file_path):
             + FLOAT_PATTERN
             + r") seconds"
         ),
-        "optimal_solution": (
-            r"Best objective ("
-            + FLOAT_PATTERN
-            + r"), best bound ("
-            + FLOAT_PATTERN
-            + r"), gap ("
-            + FLOAT_PATTERN
-            + r")%"
-        ),
+        "optimal_solution": STREAM_RULES["optimal_solution"],
     }
 
     with open(file_path, "r") as f:
@@ -118,6 +131,32 @@ def parse_gurobi_log(file_path):
     return data
 
 
+def parse_gurobi_events(file_path):
+    """
+    Timestamped bound events from the progress rows (the last column is the time),
+    used by `xp parse --time-limits` to evaluate the run at lower time limits.
+    """
+    progress_re = re.compile(STREAM_RULES["progress"])
+
+    events = []
+    try:
+        with open(file_path, "r") as f:
+            for line in f:
+                match = progress_re.search(line)
+                if match:
+                    events.append(
+                        {
+                            "time": float(match.group("gurobi_time_seconds")),
+                            "lb": float(match.group("lb")),
+                            "ub": float(match.group("ub")),
+                        }
+                    )
+    except FileNotFoundError:
+        return []
+
+    return events
+
+
 def parse_meta_file(file_path):
     """
     Parses meta.json file for additional metadata.
@@ -139,6 +178,7 @@ def parse(directory_path, output_csv):
     meta_path = directory_path / "meta.json"
 
     general = parse_gurobi_log(log_path)
+    events = parse_gurobi_events(log_path)
     meta = parse_meta_file(meta_path)
 
     # 2. Combine data
@@ -161,6 +201,13 @@ def parse(directory_path, output_csv):
         writer.writeheader()
         writer.writerow(csv_row)
 
+    # 4. Bound events over time
+    if events:
+        with open(directory_path / "events.csv", "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["time", "lb", "ub"])
+            writer.writeheader()
+            writer.writerows(events)
+
 
 # --- Main Execution ---
 if __name__ == "__main__":
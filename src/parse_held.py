@@ -19,6 +19,20 @@ from rich.console import Console
 
 out = Console()
 
+# Rules shared with `xp run --stream`, which applies them line by line while the
+# solver runs (the last match of each named group wins).
+STREAM_RULES = {
+    "initial_bounds": (
+        r"Finished initial bounds: LB (?P<root_lb>\d+) and UB (?P<root_ub>\d+)"
+        r" in\s+(?P<root_time>[0-9.]+) seconds\."
+    ),
+    "branching": (
+        r"Branching with lb (?P<lb>\d+).*?and ub (?P<ub>\d+) at depth (?P<depth>\d+)"
+        r" \(id = (?P<branch_and_bound_nodes>\d+)"
+    ),
+    "finished": r"Compute coloring finished: LB (?P<lb>\d+) and UB (?P<ub>\d+)",
+}
+
 
 def parse_held_log(file_path: Path) -> dict:
     """
@@ -65,13 +79,9 @@ def parse_held_log(file_path: Path) -> dict:
     }
 
     # Pre-compile regex patterns for performance
-    init_bounds_re = re.compile(
-        r"Finished initial bounds: LB (\d+) and UB (\d+) in\s+([0-9.]+) seconds\."
-    )
-    finished_re = re.compile(r"Compute coloring finished: LB (\d+) and UB (\d+)")
-    branch_re = re.compile(
-        r"Branching with lb (\d+).*?and ub (\d+) at depth (\d+) \(id = (\d+)"
-    )
+    init_bounds_re = re.compile(STREAM_RULES["initial_bounds"])
+    finished_re = re.compile(STREAM_RULES["finished"])
+    branch_re = re.compile(STREAM_RULES["branching"])
 
     last_branch_lb = None
     last_branch_ub = None
@@ -134,6 +144,63 @@ def parse_held_log(file_path: Path) -> dict:
     return data
 
 
+def parse_held_events(file_path: Path) -> list:
+    """
+    Timestamped bound events, used by `xp parse --time-limits` to evaluate the run
+    at lower time limits.
+
+    From the line
+    "Finished initial bounds: LB 10 and UB 14 in  0.000000 seconds."
+    we get the event (time 0.0, lb 10, ub 14).
+
+    From lines such as
+    "Lower bound improved: 10 -> 11 (12.5 seconds)."
+    "Upper bound improved: 13 in 20.1 seconds."
+    we get (time 12.5, lb 11) and (time 20.1, ub 13). Lines without a time are skipped.
+    """
+    init_bounds_re = re.compile(STREAM_RULES["initial_bounds"])
+    improved_re = re.compile(
+        r"(?P<kind>Lower|Upper) bound improved:\s*(?:\d+\s*->\s*)?(?P<value>\d+)"
+        r".*?(?P<time>\d+(?:\.\d+)?)\s*s(?:econds)?\b"
+    )
+
+    events = []
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                m_init = init_bounds_re.search(line)
+                if m_init:
+                    events.append(
+                        {
+                            "time": float(m_init.group("root_time")),
+                            "lb": int(m_init.group("root_lb")),
+                            "ub": int(m_init.group("root_ub")),
+                        }
+                    )
+                    continue
+
+                m_improved = improved_re.search(line)
+                if m_improved:
+                    bound = "lb" if m_improved.group("kind") == "Lower" else "ub"
+                    events.append(
+                        {
+                            "time": float(m_improved.group("time")),
+                            bound: int(m_improved.group("value")),
+                        }
+                    )
+    except FileNotFoundError:
+        return []
+
+    return events
+
+
+def write_events_csv(events: list, output_csv: Path) -> None:
+    with open(output_csv, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["time", "lb", "ub"])
+        writer.writeheader()
+        writer.writerows(events)
+
+
 def parse_meta_file(file_path: Path) -> dict:
     """
     Parses meta.json file for additional metadata.
@@ -155,6 +222,7 @@ def parse(directory_path: Path, output_csv: Path):
     meta_path = directory_path / "meta.json"
 
     general = parse_held_log(log_path)
+    events = parse_held_events(log_path)
     meta = parse_meta_file(meta_path)
 
     # 2. Combine data
@@ -177,6 +245,10 @@ def parse(directory_path: Path, output_csv: Path):
         writer.writeheader()
         writer.writerow(csv_row)
 
+    # 4. Bound events over time
+    if events:
+        write_events_csv(events, directory_path / "events.csv")
+
 
 # --- Main Execution ---
 if __name__ == "__main__":
@@ -0,0 +1,260 @@
+import json
+import re
+import statistics
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from src.config import DeadlineConfig
+from src.console import out
+from src.history import JobKey
+
+if TYPE_CHECKING:
+    from src.run import Runner, Scheduler
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(text: str) -> float:
+    """Segundos de uma duração como "48h", "90m", "1h30m", "2d" ou "3600"."""
+    text = text.strip().lower()
+    if re.fullmatch(r"\d+(\.\d+)?", text):
+        return float(text)
+    if not re.fullmatch(r"(\d+(\.\d+)?[smhd])+", text):
+        raise ValueError(f"Duração inválida: '{text}' (ex: 48h, 90m, 1h30m, 2d).")
+    return sum(
+        float(amount) * _UNITS[unit]
+        for amount, _, unit in re.findall(r"(\d+(\.\d+)?)([smhd])", text)
+    )
+
+
+def format_duration(seconds: float) -> str:
+    """O inverso de parse_duration, arredondado (ex: 5400 -> "1h30m")."""
+    seconds = round(seconds)
+    parts = []
+    for unit in ("d", "h", "m", "s"):
+        amount, seconds = divmod(seconds, _UNITS[unit])
+        if amount:
+            parts.append(f"{amount}{unit}")
+    return "".join(parts) or "0s"
+
+
+class Plan(BaseModel):
+    """O que cabe no prazo: os jobs escolhidos e o tempo limite de cada build."""
+
+    selected: List[JobKey]
+    time_limits: Dict[str, float]
+    # os ajustes feitos, em ordem, para o relatório
+    actions: List[str] = []
+    # trabalho previsto (cores × segundos) e o disponível (workers × prazo × margem)
+    work: float
+    budget: float
+
+    @property
+    def fits(self) -> bool:
+        return self.work <= self.budget
+
+
+def plan_experiment(
+    jobs: Sequence[JobKey],
+    costs: Dict[JobKey, float],
+    builds: Dict[str, Tuple[int, int, float]],
+    n_workers: int,
+    deadline: float,
+    config: DeadlineConfig,
+) -> Plan:
+    """
+    Ajusta o experimento ao prazo. `builds` dá, para cada build, (prioridade,
+    cores × repetições de cada job, time_limit). O trabalho previsto de um job é o
+    seu custo (limitado pelo tempo limite) vezes os cores e repetições do build; o
+    experimento cabe se o total não passa de n_workers × deadline × margin.
+    Enquanto não couber, as estratégias de `config.strategies` são aplicadas em ordem:
+    - skip: tira os builds de menor prioridade (os últimos declarados primeiro),
+      um de cada vez, sempre mantendo ao menos um;
+    - subsample: mantém a mesma fração das instâncias de cada classe (as mesmas para
+      todos os builds), espaçadas ao longo do custo previsto, para que as fáceis e as
+      difíceis continuem representadas;
+    - time_limit: reduz os tempos limite de todos os builds pelo mesmo fator.
+    """
+    budget = n_workers * deadline * config.margin
+    selected = list(jobs)
+    time_limits = {name: limit for name, (_, _, limit) in builds.items()}
+    actions: List[str] = []
+
+    def work(keys: Sequence[JobKey], scale: float = 1.0) -> float:
+        return sum(
+            min(costs[key], time_limits[key[0]] * scale) * builds[key[0]][1]
+            for key in keys
+        )
+
+    for strategy in config.strategies:
+        if work(selected) <= budget:
+            break
+
+        if strategy == "skip":
+            order = list(builds)
+            remaining = sorted(
+                {key[0] for key in selected},
+                key=lambda b: (builds[b][0], -order.index(b)),
+            )
+            while len(remaining) > 1 and work(selected) > budget:
+                dropped = remaining.pop(0)
+                selected = [key for key in selected if key[0] != dropped]
+                actions.append(f"build {dropped} (prioridade {builds[dropped][0]}) fora")
+
+        elif strategy == "subsample":
+            fraction = max(config.min_fraction, min(1.0, budget / work(selected)))
+            by_class: Dict[str, Dict[Path, float]] = {}
+            for key in selected:
+                paths = by_class.setdefault(key[1], {})
+                paths[key[2]] = paths.get(key[2], 0.0) + costs[key]
+            kept = set()
+            for inst_class, paths in by_class.items():
+                ordered = sorted(paths, key=lambda p: (paths[p], str(p)))
+                n = max(1, round(fraction * len(ordered)))
+                # n instâncias igualmente espaçadas na ordem de custo (estratificada)
+                step = len(ordered) / n
+                kept |= {
+                    (inst_class, ordered[int(i * step + step / 2)]) for i in range(n)
+                }
+            selected = [key for key in selected if (key[1], key[2]) in kept]
+            actions.append(f"{fraction:.0%} das instâncias de cada classe")
+
+        elif strategy == "time_limit":
+            # O maior fator (a partir de min_time_limit) com que o experimento cabe
+            low, high = config.min_time_limit, 1.0
+            for _ in range(30):
+                mid = (low + high) / 2
+                low, high = (mid, high) if work(selected, mid) <= budget else (low, mid)
+            time_limits = {name: limit * low for name, limit in time_limits.items()}
+            actions.append(f"tempos limite reduzidos a {low:.0%}")
+
+    return Plan(
+        selected=selected,
+        time_limits=time_limits,
+        actions=actions,
+        work=work(selected),
+        budget=budget,
+    )
+
+
+class DeadlineMonitor:
+    """
+    Acompanha o prazo durante a execução. A cada job que termina, corrige as
+    previsões pela razão entre os tempos reais e os previstos até ali e, se o que
+    falta não cabe mais no prazo, tira da fila os pares (build, classe) que ainda
+    não começaram, dos de menor prioridade para os de maior. Pares já começados
+    não são interrompidos; os seus jobs rodam com o tempo limite reduzido ao que
+    resta do prazo e, depois do prazo, nenhum job novo começa.
+    """
+
+    def __init__(
+        self,
+        scheduler: "Scheduler",
+        deadline: float,
+        costs: Dict[JobKey, float],
+        priorities: Dict[str, int],
+    ):
+        self.scheduler = scheduler
+        self.deadline_at = time.time() + deadline
+        self.costs = costs
+        self.priorities = priorities
+
+        self._lock = threading.Lock()
+        self._runners: List["Runner"] = []
+        # Custo previsto dos jobs de cada Runner que ainda não terminaram
+        self._remaining: Dict["Runner", Dict[str, float]] = {}
+        # Runners com algum job já começado: a sua classe não é mais interrompida
+        self._started: set = set()
+        self._stopped: set = set()
+        self._predicted = 0.0
+        self._actual = 0.0
+        self._expired = False
+        self.dropped: List[str] = []
+
+    def track(self, runner: "Runner") -> None:
+        """Passa a acompanhar os jobs de `runner`."""
+        default = statistics.median(self.costs.values()) if self.costs else 1.0
+        with self._lock:
+            self._runners.append(runner)
+            self._remaining[runner] = {
+                inst.name: self.costs.get(
+                    (runner.name, runner.class_name or "", inst.instance_path), default
+                )
+                for inst in runner.list_of_instances
+            }
+
+    def time_left(self) -> float:
+        return self.deadline_at - time.time()
+
+    def job_done(self, runner: "Runner", run_instance: Any) -> bool:
+        """
+        Registra o fim de um job de `runner` e refaz a previsão. Devolve se os jobs
+        de `runner` continuam (False se o par foi tirado da fila).
+        """
+        instances = getattr(run_instance, "instances", [run_instance])
+        with self._lock:
+            for inst in instances:
+                predicted = self._remaining.get(runner, {}).pop(inst.name, None)
+                try:
+                    meta_path = runner.raw_logs_dir / inst.name / "meta.json"
+                    meta = json.loads(meta_path.read_text())
+                    actual = float(meta["wall_time_seconds"])
+                except (OSError, ValueError, KeyError, TypeError):
+                    continue
+                # Execuções com limite reduzido não dizem quanto o job levaria
+                if predicted is not None and not meta.get("capped"):
+                    self._predicted += predicted
+                    self._actual += actual
+            victims = self._replan()
+        for victim in victims:
+            self.scheduler.drop(victim)
+            # Sem os jobs que saíram da fila, a corrida da classe segue sem o build
+            if victim.race is not None:
+                for next_runner, jobs in victim.race.withdraw(victim):
+                    self.scheduler.submit(next_runner, jobs)
+        return runner not in self._stopped
+
+    def job_started(self, runner: "Runner") -> None:
+        """Registra que um job de `runner` começou."""
+        with self._lock:
+            self._started.add(runner)
+
+    def _replan(self) -> List["Runner"]:
+        """Os Runners a tirar da fila agora (com o lock)."""
+        active = [r for r in self._runners if r not in self._stopped]
+        if self.time_left() <= 0:
+            if not self._expired:
+                self._expired = True
+                out.warning("Prazo esgotado: nenhum job novo vai começar.")
+            self._stopped |= set(active)
+            return active
+
+        ratio = self._actual / self._predicted if self._predicted > 0 else 1.0
+        n_workers = self.scheduler.n_workers
+
+        def left(runners: List["Runner"]) -> float:
+            return sum(
+                sum(self._remaining[r].values()) * ratio * r.threads for r in runners
+            ) / n_workers
+
+        victims = []
+        # Os que ainda não começaram, dos de menor prioridade (e declarados por último)
+        untouched = sorted(
+            (r for r in active if r not in self._started),
+            key=lambda r: (self.priorities.get(r.name, 0), -self._runners.index(r)),
+        )
+        while untouched and left(active) > self.time_left():
+            victim = untouched.pop(0)
+            active.remove(victim)
+            victims.append(victim)
+            self._stopped.add(victim)
+            self.dropped.append(f"{victim.name} × {victim.class_name}")
+            out.warning(
+                f"Prazo: {victim.name} × {victim.class_name} fora da fila (previsão"
+                f" corrigida pelos tempos reais: {ratio:.2f}× o previsto)."
+            )
+        return victims
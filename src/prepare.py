@@ -0,0 +1,84 @@
+import hashlib
+import shutil
+import subprocess
+import tempfile
+from concurrent import futures
+from pathlib import Path
+from typing import Dict
+
+from src.config import InstanceConfig
+from src.console import out
+
+PREPARED_CACHE_DIR = Path("~/.cache/xp/prepared").expanduser()
+
+
+def get_prepared_path(content_hash: str, prepare_command: str) -> Path:
+    """
+    Caminho (no cache) da instância preparada: depende apenas do conteúdo da
+    instância e do prepare_command (nem do nome da instância), de forma que é o
+    mesmo entre experimentos e entre instâncias idênticas.
+    """
+    key = hashlib.sha256(f"{content_hash}\0{prepare_command}".encode()).hexdigest()
+    return PREPARED_CACHE_DIR / key / "prepared"
+
+
+def prepare_instance(instance_path: Path, prepared_path: Path, prepare_command: str) -> None:
+    """Roda o prepare_command em um diretório temporário e o move (atomicamente) para o cache."""
+    prepared_path.parent.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(dir=prepared_path.parent.parent))
+    command = prepare_command.format(
+        instance_path=instance_path, prepared_path=tmp_dir / prepared_path.name
+    )
+    try:
+        result = subprocess.run(command, shell=True, capture_output=True, text=True)
+        if result.returncode != 0 or not (tmp_dir / prepared_path.name).exists():
+            raise RuntimeError(
+                f"'{command}' falhou (código {result.returncode}):\n{result.stderr[-2000:]}"
+            )
+        try:
+            tmp_dir.rename(prepared_path.parent)
+        except OSError:
+            # O diretório já existe: outro processo preparou a mesma instância ao
+            # mesmo tempo, ou ele é de uma versão anterior do cache, sem o arquivo
+            if not prepared_path.exists():
+                (tmp_dir / prepared_path.name).replace(prepared_path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def prepare_instances(conf: InstanceConfig, n_jobs: int = 1) -> None:
+    """
+    Prepara (uma vez por conteúdo) todas as instâncias usadas com o prepare_command,
+    até n_jobs ao mesmo tempo, e preenche conf.prepared com {instance_path: prepared_path}.
+    Resultados de experimentos anteriores (mesmo conteúdo e mesmo comando) são reaproveitados.
+    """
+    if not conf.prepare_command or not conf.manifest:
+        return
+
+    conf.prepared = {}
+    # Instâncias com o mesmo conteúdo são preparadas uma única vez
+    to_prepare: Dict[Path, Path] = {}
+    for instance_path, info in conf.manifest.items():
+        prepared_path = get_prepared_path(info.hash, conf.prepare_command)
+        conf.prepared[instance_path] = prepared_path
+        if not prepared_path.exists():
+            to_prepare.setdefault(prepared_path, instance_path)
+
+    cached = len(conf.manifest) - len(to_prepare)
+    out.info(f"Preparando {len(to_prepare)} instâncias ({cached} em cache)...")
+
+    with futures.ThreadPoolExecutor(max_workers=max(n_jobs, 1)) as executor:
+        future_to_instance = {
+            executor.submit(
+                prepare_instance, instance_path, prepared_path, conf.prepare_command
+            ): instance_path
+            for prepared_path, instance_path in to_prepare.items()
+        }
+        for future in futures.as_completed(future_to_instance):
+            try:
+                future.result()
+            except Exception as e:
+                out.error(
+                    f"Erro ao preparar a instância {future_to_instance[future].name}: {e}"
+                )
+                exit(1)
@@ -0,0 +1,97 @@
+import json
+from pathlib import Path
+
+import pandas as pd  # type: ignore
+
+try:
+    from src.console import out
+except ImportError:
+    from rich.console import Console
+
+    out = Console()  # type: ignore
+
+
+def gather_profiles(raw_logs_dir: Path) -> pd.DataFrame:
+    """
+    Lê os profile.csv (stack, time, self_time, count) gerados pelo parser em cada
+    instância de raw_logs_dir e os agrega por pilha de chamadas.
+    """
+    profiles = []
+    for inst_dir in raw_logs_dir.iterdir():
+        profile_csv = inst_dir / "profile.csv"
+        if not profile_csv.exists():
+            continue
+        try:
+            profiles.append(pd.read_csv(profile_csv))
+        except Exception as e:
+            out.error(f"Erro ao ler {profile_csv}: {e}")
+
+    if not profiles:
+        return pd.DataFrame(columns=["stack", "time", "self_time", "count", "instances"])
+
+    df = pd.concat(profiles, ignore_index=True)
+    return (
+        df.groupby("stack", sort=True)
+        .agg(
+            time=("time", "sum"),
+            self_time=("self_time", "sum"),
+            count=("count", "sum"),
+            instances=("stack", "size"),
+        )
+        .reset_index()
+    )
+
+
+def write_folded(profile: pd.DataFrame, output: Path) -> None:
+    """Formato 'collapsed' do flamegraph.pl: `a;b;c <self time em μs>` por linha."""
+    weights = (profile["self_time"] * 1e6).round().astype("int64")
+    lines = profile["stack"] + " " + weights.astype(str)
+    output.write_text("\n".join(lines[weights > 0]) + "\n")
+
+
+def write_speedscope(profile: pd.DataFrame, name: str, output: Path) -> None:
+    """Exporta o perfil agregado no formato 'sampled' do https://speedscope.app."""
+    stacks = profile["stack"].str.split(";")
+    frames = sorted({frame for stack in stacks for frame in stack})
+    frame_index = {frame: i for i, frame in enumerate(frames)}
+
+    speedscope = {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": [{"name": frame} for frame in frames]},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": float(profile["self_time"].sum()),
+                "samples": [[frame_index[f] for f in stack] for stack in stacks],
+                "weights": profile["self_time"].astype(float).tolist(),
+            }
+        ],
+        "name": name,
+        "exporter": "xp",
+    }
+    with output.open("w") as f:
+        json.dump(speedscope, f)
+
+
+def export_profiles(raw_logs_dir: Path, output_prefix: Path) -> None:
+    """
+    Agrega os perfis de todas as instâncias de raw_logs_dir e escreve
+    `{output_prefix}.speedscope.json`, `{output_prefix}.folded` e `{output_prefix}_profile.csv`.
+    """
+    profile = gather_profiles(raw_logs_dir)
+    if profile.empty:
+        return
+
+    name = output_prefix.name
+    profile.to_csv(output_prefix.with_name(f"{name}_profile.csv"), index=False)
+    write_folded(profile, output_prefix.with_name(f"{name}.folded"))
+    write_speedscope(
+        profile, name, output_prefix.with_name(f"{name}.speedscope.json")
+    )
+    out.info(
+        f"Perfil de {profile['instances'].max()} instâncias escrito em "
+        f"{output_prefix.with_name(f'{name}.speedscope.json')}"
+    )
@@ -0,0 +1,310 @@
+import json
+import math
+import random
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import pandas as pd  # type: ignore
+from rich import box
+from rich.table import Table
+
+from src.config import RaceConfig
+from src.console import out
+from src.stats import friedman
+
+if TYPE_CHECKING:
+    from src.run import Runner, Scheduler
+
+# Códigos de saída de uma execução interrompida pelo tempo limite (timeout,
+# timeout --preserve-status com SIGTERM, e com o SIGKILL do --kill-after)
+TIMEOUT_CODES = (124, 143, 137)
+# Métricas que medem o tempo: uma execução no limite vale o limite
+TIME_METRICS = ("wall_time_seconds", "time", "time_to_target")
+
+
+class Race:
+    """
+    Corrida estatística (F-race) entre os builds de uma classe de instâncias.
+
+    As instâncias são embaralhadas uma única vez (a mesma ordem para todos os
+    builds) e divididas em blocos. Os builds ainda na corrida recebem um bloco de
+    cada vez (com um bloco de antecedência, para não deixar workers ociosos); quando
+    todos os jobs de um bloco terminam, o teste de Friedman compara os builds em
+    todas as instâncias até ali e, se houver diferença, o pós-teste de Conover
+    elimina os builds piores que o melhor. Os eliminados não recebem mais jobs.
+    Cada teste, com a evidência das eliminações, é gravado em `record_path`.
+
+    Os Runners de uma corrida não enfileiram as suas instâncias: eles se registram
+    (register()) e a corrida começa quando todos os builds esperados chegaram.
+    """
+
+    def __init__(
+        self,
+        class_name: str,
+        builds: List[str],
+        config: RaceConfig,
+        scheduler: "Scheduler",
+        record_path: Path,
+    ):
+        self.class_name = class_name
+        self.builds = builds
+        self.config = config
+        self.scheduler = scheduler
+        self.record_path = record_path
+
+        self.runners: Dict[str, "Runner"] = {}
+        self.survivors: List[str] = []
+        self.eliminated: Dict[str, Dict[str, Any]] = {}
+        # Builds que saíram sem ser eliminados (ex: pelo prazo de --deadline)
+        self.withdrawn: List[str] = []
+        self.tests: List[Dict[str, Any]] = []
+        self.blocks: List[List[Path]] = []
+        self.started = False
+
+        self._lock = threading.Lock()
+        # Jobs ainda não terminados de cada bloco submetido
+        self._outstanding: Dict[int, int] = {}
+        # (build, job) -> bloco do job
+        self._block_of: Dict[Tuple[str, str], int] = {}
+        self._next_block = 0
+        self._evaluated = -1
+
+    def register(self, runner: "Runner") -> None:
+        with self._lock:
+            self.runners[runner.name] = runner
+            ready = set(self.builds) <= set(self.runners)
+        if ready:
+            self.start()
+
+    def start(self) -> None:
+        """Começa a corrida com os builds registrados (só na primeira chamada)."""
+        with self._lock:
+            if self.started or not self.runners:
+                return
+            self.started = True
+            self.survivors = [b for b in self.builds if b in self.runners]
+
+            paths: List[Path] = []
+            for name in self.survivors:
+                for inst in self.runners[name].list_of_instances:
+                    if inst.instance_path not in paths:
+                        paths.append(inst.instance_path)
+            random.Random(self.config.seed).shuffle(paths)
+            size = self.config.block or math.ceil(
+                self.scheduler.n_workers / len(self.survivors)
+            )
+            self.blocks = [paths[i : i + size] for i in range(0, len(paths), size)]
+
+            self._write_record()
+            submissions = self._submit_block() + self._submit_block()
+        self._apply(submissions)
+
+    def job_done(self, runner: "Runner", run_instance: Any) -> List[Tuple["Runner", list]]:
+        """Chamado pelo Scheduler ao fim de cada job; devolve os próximos jobs."""
+        with self._lock:
+            block = self._block_of.pop((runner.name, run_instance.name), None)
+            if block is None:
+                return []
+            self._outstanding[block] -= 1
+            return self._advance()
+
+    def withdraw(self, runner: "Runner") -> List[Tuple["Runner", list]]:
+        """
+        Tira `runner` da corrida sem eliminá-lo (ex: fora do prazo, ver src/plan.py):
+        os seus jobs deixam de contar nos blocos, que seguem com os outros builds.
+        Devolve os próximos jobs, como job_done().
+        """
+        with self._lock:
+            if runner.name in self.survivors:
+                self.survivors.remove(runner.name)
+                self.withdrawn.append(runner.name)
+            for key in [key for key in self._block_of if key[0] == runner.name]:
+                self._outstanding[self._block_of.pop(key)] -= 1
+            submissions = self._advance()
+            self._write_record()
+        return submissions
+
+    def _apply(self, submissions: List[Tuple["Runner", list]]) -> None:
+        for runner, jobs in submissions:
+            self.scheduler.submit(runner, jobs)
+
+    def _submit_block(self) -> List[Tuple["Runner", list]]:
+        """Os jobs do próximo bloco para os builds ainda na corrida (com o lock)."""
+        block = self._next_block
+        if block >= len(self.blocks):
+            return []
+        self._next_block += 1
+        paths = self.blocks[block]
+        self._outstanding[block] = 0
+
+        submissions = []
+        for name in self.survivors:
+            runner = self.runners[name]
+            instances = [
+                inst
+                for path in paths
+                for inst in runner.list_of_instances
+                if inst.instance_path == path
+            ]
+            jobs: list = runner._batches(instances) if runner.batch_template else instances
+            for job in jobs:
+                self._block_of[(name, job.name)] = block
+            self._outstanding[block] += len(jobs)
+            if jobs:
+                submissions.append((runner, jobs))
+        return submissions
+
+    def _advance(self) -> List[Tuple["Runner", list]]:
+        """Avalia os blocos que terminaram, em ordem, e submete os seguintes."""
+        submissions = []
+        while (
+            self._evaluated + 1 < self._next_block
+            and self._outstanding[self._evaluated + 1] <= 0
+        ):
+            self._evaluated += 1
+            self._evaluate(self._evaluated)
+            submissions += self._submit_block()
+        return submissions
+
+    def _score(self, runner: "Runner", path: Path) -> float:
+        """
+        O valor de `runner` na instância (a média das suas repetições). Execuções
+        que falharam (ou sem o valor) contam como as piores possíveis. Execuções que
+        chegaram ao tempo limite (exit 124, ou 143/137 do --preserve-status, ou o
+        wall time no limite) não falharam: valem o seu valor e, em métricas de tempo,
+        o próprio limite.
+        """
+        values = []
+        for inst in runner.list_of_instances:
+            if inst.instance_path != path:
+                continue
+            log_dir = runner.raw_logs_dir / inst.name
+            try:
+                meta = json.loads((log_dir / "meta.json").read_text())
+            except (OSError, ValueError):
+                return math.inf
+            limit = float(meta.get("time_limit") or runner.time_limit)
+            timed_out = meta.get("exit_code") in TIMEOUT_CODES or (
+                float(meta.get("wall_time_seconds") or 0) >= limit
+            )
+            if meta.get("exit_code") != 0 and not timed_out:
+                return math.inf
+            value = meta.get(self.config.metric)
+            if timed_out and self.config.metric in TIME_METRICS:
+                value = limit
+            if value is None and (log_dir / "res.csv").exists():
+                try:
+                    res = pd.read_csv(log_dir / "res.csv")
+                    value = res[self.config.metric].iloc[0]
+                except (OSError, ValueError, KeyError, IndexError):
+                    value = None
+            if value is None or pd.isna(value):
+                return math.inf
+            values.append(float(value) if self.config.minimize else -float(value))
+        return sum(values) / len(values) if values else math.inf
+
+    def _evaluate(self, block: int) -> None:
+        """Testa os builds ainda na corrida nas instâncias dos blocos até `block`."""
+        paths = [path for b in self.blocks[: block + 1] for path in b]
+        if len(paths) < self.config.first_test or len(self.survivors) < 2:
+            return
+
+        scores = [[self._score(self.runners[b], path) for b in self.survivors] for path in paths]
+        statistic, p_value, rank_sums, critical = friedman(scores, self.config.alpha)
+        best = min(range(len(self.survivors)), key=lambda j: rank_sums[j])
+
+        eliminated = []
+        if p_value < self.config.alpha:
+            for j, name in enumerate(self.survivors):
+                if rank_sums[j] - rank_sums[best] > critical:
+                    eliminated.append(name)
+                    self.eliminated[name] = {
+                        "after_instances": len(paths),
+                        "p_value": p_value,
+                        "rank_sum": rank_sums[j],
+                        "best": self.survivors[best],
+                        "best_rank_sum": rank_sums[best],
+                        "critical_difference": critical,
+                    }
+
+        self.tests.append(
+            {
+                "after_instances": len(paths),
+                "builds": list(self.survivors),
+                "statistic": statistic,
+                "p_value": p_value,
+                "mean_ranks": {
+                    name: rank_sums[j] / len(paths) for j, name in enumerate(self.survivors)
+                },
+                "critical_difference": critical if math.isfinite(critical) else None,
+                "eliminated": eliminated,
+            }
+        )
+
+        if eliminated:
+            out.info(
+                f"Corrida {self.class_name}: {', '.join(eliminated)} eliminado(s) após"
+                f" {len(paths)} instâncias (p = {p_value:.3g}); o melhor é"
+                f" {self.survivors[best]}."
+            )
+            self.survivors = [b for b in self.survivors if b not in eliminated]
+            for name in eliminated:
+                # Os jobs do bloco seguinte que ainda não começaram não rodam mais
+                for job in self.scheduler.drop(self.runners[name]):
+                    dropped = self._block_of.pop((name, job.name), None)
+                    if dropped is not None:
+                        self._outstanding[dropped] -= 1
+        self._write_record()
+
+    def _write_record(self) -> None:
+        record = {
+            "class": self.class_name,
+            "metric": self.config.metric,
+            "minimize": self.config.minimize,
+            "alpha": self.config.alpha,
+            "order": [[path.name for path in block] for block in self.blocks],
+            "survivors": self.survivors,
+            "eliminated": self.eliminated,
+            "withdrawn": self.withdrawn,
+            "tests": self.tests,
+        }
+        self.record_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.record_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(record, indent=4))
+        tmp.replace(self.record_path)
+
+    def report(self) -> None:
+        """Tabela dos builds: posto médio no último teste, instâncias executadas e situação."""
+        last = self.tests[-1]["mean_ranks"] if self.tests else {}
+        table = Table(title=f"Corrida: {self.class_name}", box=box.SIMPLE)
+        table.add_column("Build", style="magenta")
+        table.add_column("Posto médio", justify="right")
+        table.add_column("Instâncias", justify="right", style="green")
+        table.add_column("Situação")
+
+        for name in self.builds:
+            runner: Optional["Runner"] = self.runners.get(name)
+            if runner is None:
+                continue
+            run = sum(
+                (runner.raw_logs_dir / inst.name / "meta.json").exists()
+                for inst in runner.list_of_instances
+            )
+            if name in self.eliminated:
+                info = self.eliminated[name]
+                status = (
+                    f"[red]eliminado[/red] após {info['after_instances']}"
+                    f" (p = {info['p_value']:.3g})"
+                )
+                rank = info["rank_sum"] / info["after_instances"]
+            elif name in self.withdrawn:
+                status = "[yellow]fora do prazo[/yellow]"
+                rank = last.get(name)
+            else:
+                status = "[green]na corrida[/green]"
+                rank = last.get(name)
+            table.add_row(
+                name, f"{rank:.2f}" if rank is not None else "-", str(run), status
+            )
+        out.print(table)
@@ -44,12 +44,18 @@ O script agora formatará corretamente o comando como
 
 # TODO gracefully handle KeyboardInterrupt to stop all running instances
 
-import itertools  # Added for cyclic core assignment
+import csv
 import json
+import math
+import os
+import shlex
+import shutil
+import signal
 import subprocess
 import sys  # Added for platform checks
 import threading
 import time
+from collections import deque
 from concurrent import futures
 from pathlib import Path
 from typing import Any, Dict, Optional
@@ -76,19 +82,44 @@ try:
     from src.parse import gather_results, parse_instance
 except ImportError:
 
-    def gather_results(raw_logs_dir: Path, parsed_logs_csv: Path) -> None:
+    def gather_results(
+        raw_logs_dir: Path, parsed_logs_csv: Path, known_bounds: Any = None
+    ) -> None:
         pass
 
     def parse_instance(parser_cmd: str, inst_path: Path) -> None:
         pass
 
 
+try:
+    from src.stream import StreamParser, Target, tee_process
+except ImportError:
+    StreamParser = None  # type: ignore
+    Target = None  # type: ignore
+
+try:
+    from src.cores import CoreAllocator, CoreLeases, physical_cores_by_node
+except ImportError:
+    CoreAllocator = None  # type: ignore
+    CoreLeases = None  # type: ignore
+
+    def physical_cores_by_node() -> Dict[int, list[int]]:
+        return {}
+
+
+try:
+    from src.batch import BatchSplitter
+except ImportError:
+    BatchSplitter = None  # type: ignore
+
+
 class RunInstance(BaseModel):
     """
     Represents a single instance to be run by the Runner.
     {
         "executable": "path/to/executable",
         "instance_path": "path/to/instance",
+        "prepared_path": "path/to/prepared/instance",  # optional
         "params": {
             "param1": "value1",
             "param2": "value2"
@@ -98,7 +129,12 @@ class RunInstance(BaseModel):
 
     executable: Path
     instance_path: Path
+    prepared_path: Optional[Path] = None
     params: Dict[str, Any] = Field(default_factory=dict)
+    # Overrides the Runner's time_limit for this job (a rung of its ladder, or capped)
+    time_limit: Optional[float] = None
+    # Whether time_limit was capped by the best time on the instance (src/capping.py)
+    capped: bool = False
 
     @property
     def name(self) -> str:
@@ -110,51 +146,93 @@ class RunInstance(BaseModel):
         return n
 
 
-class Runner:
-    name: str
-    raw_logs_dir: Path
-    time_limit: int = 3600  # seconds
-    list_of_instances: list[RunInstance]
-    n_workers: int = 1
-    run_template: str = "{executable} {instance_path}"
-    class_name: Optional[str] = None
-    parser_cmd: Optional[str] = None
+class RunBatch(BaseModel):
+    """
+    Several RunInstances run by a single invocation of the Runner's batch_template
+    (see src/batch.py for the output contract that splits the results back).
+    """
 
-    def __init__(
-        self,
-        name: str,
-        raw_logs_dir: Path,
-        list_of_instances: list[RunInstance],
-        time_limit: int = 3600,
-        n_workers: int = 1,
-        run_template: str = "",
-        class_name: Optional[str] = None,
-        parser_cmd: Optional[str] = None,
-    ):
-        self.name = name
-        self.n_workers = n_workers
-        self.time_limit = time_limit
-        self.class_name = class_name
-        self.parser_cmd = parser_cmd
+    instances: list[RunInstance]
 
-        # TODO check if raw_logs_dir exists, if not, warn and create
-        self.raw_logs_dir = raw_logs_dir
+    @property
+    def name(self) -> str:
+        return f"{self.instances[0].name}+{len(self.instances) - 1}"
 
-        if run_template:
-            self.run_template = run_template
-            # TODO check if run_template has ">" and warn user they don't need to handle redirection
+    def __len__(self) -> int:
+        return len(self.instances)
 
-        # TODO check if a RunInstance can fulfill the run_template
-        self.list_of_instances = list_of_instances
 
-        # Initialize physical_core_ids based on the operating system
-        self.physical_core_ids: list[int] = []
-        if sys.platform == "linux":
-            num_physical_cores = psutil.cpu_count(logical=False)
-            if num_physical_cores:
-                self.physical_core_ids = list(range(num_physical_cores))
+class Scheduler:
+    """
+    A single pool of `n_workers` slots shared by the jobs of every Runner submitted
+    to it, so the instances of one build run while other builds are still compiling.
+    Slots can be held back with reserve()/release() (e.g. for the builds themselves).
+    A job of a Runner with `resources` (e.g. {"gurobi_license": 1}) only starts when
+    those are free as well; meanwhile, the next jobs that fit take the free slots.
+    Resources without a declared capacity are unlimited.
+    A job of a Runner with `threads` takes that many slots, pinned to as many
+    physical cores of one NUMA node. Among the jobs that fit, the widest go first.
+    A wide job that waits for slots holds a reservation: the oldest such job keeps
+    narrower jobs from taking the slots it needs, so the free slots accumulate
+    until it starts instead of being taken one by one by narrow jobs.
+    Cores are leased machine-wide (src.cores.CoreLeases, tagged with `label`), so
+    concurrent `xp run`s on one node never pin jobs to the same core: a job whose
+    cores are all taken by other processes waits for them. With more workers than
+    physical cores, jobs are not pinned (nor wait for cores), but still lease the
+    free cores they can get, so other `xp run`s keep away from them.
+    With pin=False (e.g. when the jobs run on other machines) no cores are reserved.
+
+        with Scheduler(n_workers) as scheduler:
+            Runner(..., scheduler=scheduler)  # queues its instances
+            ...
+        # leaving the block waits for every queued job
+    """
+
+    def __init__(
+        self,
+        n_workers: int = 1,
+        resources: Optional[Dict[str, int]] = None,
+        pin: bool = True,
+        label: str = "",
+    ):
+        self.n_workers = max(n_workers, 1)
+        self._free = self.n_workers
+        # Named resources (e.g. license tokens): capacity left of each one
+        self.resources = dict(resources or {})
+        self._free_resources = dict(self.resources)
+        # Pending jobs of each runner, in submission order
+        self._pending: dict["Runner", deque[Any]] = {}
+        self._running = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._runners: list["Runner"] = []
+        # Since when the next job of each runner waits for slots (not resources)
+        self._waiting_since: dict["Runner", float] = {}
+
+        # Physical cores (per NUMA node) the jobs are pinned to
+        self.cores: Optional[CoreAllocator] = None
+        # Whether jobs are pinned to (and wait for) their cores, or only lease them
+        self.pin = False
+        if not pin:
+            pass
+        elif sys.platform == "linux":
+            cores_by_node = physical_cores_by_node()
+            n_cores = sum(len(cpus) for cpus in cores_by_node.values())
+            if n_cores:
+                # Any free core of the machine: the slots bound how many are used
+                self.cores = CoreAllocator(
+                    cores_by_node, leases=CoreLeases(label or f"xp pid {os.getpid()}")
+                )
+                self.pin = n_cores >= self.n_workers
+            if self.pin:
                 out.info(
-                    f"Detected {num_physical_cores} physical CPU cores for task pinning."
+                    f"Detected {n_cores} physical CPU cores on {len(cores_by_node)}"
+                    f" NUMA node(s) for task pinning."
+                )
+            elif n_cores:
+                out.warning(
+                    f"{self.n_workers} workers but only {n_cores} physical CPU cores."
+                    " Task pinning will not be used (cores are still leased)."
                 )
             else:
                 out.warning(
@@ -165,15 +243,225 @@ class Runner:
                 f"Task pinning is only supported on Linux. Current OS: {sys.platform}"
             )
 
-        # ---
-        self._print_info()
-        self._run_all_instances()
-        # TODO melhorar esse nome
-        if self.parser_cmd:
-            gather_results(
-                raw_logs_dir=self.raw_logs_dir,
-                parsed_logs_csv=self.raw_logs_dir.parent / f"{self.name}_results.csv",
+        self.progress = Progress(
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            "{task.completed}|{task.total}",
+            TimeElapsedColumn(),
+            TimeRemainingColumn(),
+            TextColumn("{task.fields[live]}", style="dim"),
+            console=out,
+        )
+
+    def __enter__(self) -> "Scheduler":
+        self.progress.start()
+        self._task = self.progress.add_task("Running", total=0, live="")
+        self._executor = futures.ThreadPoolExecutor(max_workers=self.n_workers)
+
+        self._stop_monitor = threading.Event()
+        self._monitor_thread = threading.Thread(
+            target=self._monitor_memory, args=(self._stop_monitor,), daemon=True
+        )
+        self._monitor_thread.start()
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        try:
+            if exc_type is None:
+                self.wait()
+        finally:
+            with self._cond:
+                self._closed = True
+                self._pending.clear()
+                self._cond.notify_all()
+            self._dispatcher.join()
+            self._executor.shutdown(wait=True)
+            self._stop_monitor.set()
+            self._monitor_thread.join()
+            self.progress.stop()
+
+    @property
+    def max_threads(self) -> int:
+        """The widest job that can ever start (all slots, or the largest NUMA node)."""
+        if self.cores is not None and self.pin:
+            return min(self.n_workers, self.cores.widest)
+        return self.n_workers
+
+    def submit(self, runner: "Runner", run_instances: list[Any]) -> None:
+        """Queues the instances of `runner`; they start as soon as slots are free."""
+        if runner.threads > self.max_threads:
+            out.warning(
+                f"{runner.name}: {runner.threads} threads do not fit in"
+                f" {self.max_threads} cores; using {self.max_threads}."
             )
+            runner.threads = self.max_threads
+        with self._cond:
+            self._pending.setdefault(runner, deque()).extend(run_instances)
+            if runner not in self._runners:
+                self._runners.append(runner)
+            self._cond.notify_all()
+        size = sum(self._size(inst) for inst in run_instances)
+        self.progress.update(self._task, total=self._total + size)
+
+    @staticmethod
+    def _size(job: Any) -> int:
+        """How many instances a queued job runs (a RunBatch runs several)."""
+        return len(job) if isinstance(job, RunBatch) else 1
+
+    @property
+    def _total(self) -> int:
+        return int(self.progress.tasks[self._task].total or 0)
+
+    def reserve(self, n: int) -> int:
+        """Holds back `n` slots (at most all of them) from the jobs. Returns how many."""
+        n = min(n, self.n_workers)
+        with self._cond:
+            while self._free < n:
+                self._cond.wait()
+            self._free -= n
+        return n
+
+    def release(self, n: int) -> None:
+        """Gives back `n` slots taken by reserve()."""
+        with self._cond:
+            self._free += n
+            self._cond.notify_all()
+
+    def drop(self, runner: "Runner") -> list[Any]:
+        """Takes the queued (not started) jobs of `runner` off the queue and returns them."""
+        with self._cond:
+            dropped = list(self._pending.pop(runner, ()))
+            self._waiting_since.pop(runner, None)
+        if dropped:
+            size = sum(self._size(job) for job in dropped)
+            self.progress.update(self._task, total=self._total - size)
+        return dropped
+
+    def wait(self) -> None:
+        """Blocks until every queued job has finished."""
+        with self._cond:
+            while any(self._pending.values()) or self._running:
+                self._cond.wait()
+
+    def _fits(self, runner: "Runner") -> bool:
+        if runner.threads > self._free:
+            return False
+        if self.pin and self.cores is not None and not self.cores.fits(runner.threads):
+            return False
+        return all(
+            self._free_resources.get(name, amount) >= amount
+            for name, amount in runner.resources.items()
+        )
+
+    def _acquire(self, runner: "Runner", sign: int) -> None:
+        """Takes (sign=+1) or gives back (sign=-1) the slots and resources of a job."""
+        self._free -= sign * runner.threads
+        self._running += sign
+        for name, amount in runner.resources.items():
+            if name in self._free_resources:
+                self._free_resources[name] -= sign * amount
+
+    def _next_job(self) -> Optional[tuple["Runner", Any, Optional[list[int]]]]:
+        """
+        Takes the next job of the widest runner whose job fits now, with its cores
+        (with the lock held). Ties go to the runner submitted first.
+        """
+        if self._free <= 0:
+            return None
+        fitting = [r for r, queue in self._pending.items() if queue and self._fits(r)]
+        reserved = self._reservation(fitting)
+        for runner in sorted(fitting, key=lambda r: -r.threads):
+            if (
+                reserved is not None
+                and runner.threads < reserved.threads
+                and self._free - runner.threads < reserved.threads
+            ):
+                continue  # would take slots the reserved wide job is waiting for
+            queue = self._pending[runner]
+            cores = None
+            if self.cores is not None:
+                cores = self.cores.allocate(
+                    runner.threads, f"{runner.name}: {queue[0].name}"
+                )
+                if cores is None and self.pin:
+                    continue  # taken by another process
+            self._waiting_since.pop(runner, None)
+            return runner, queue.popleft(), cores
+        return None
+
+    def _reservation(self, fitting: list["Runner"]) -> Optional["Runner"]:
+        """
+        The runner whose next job has waited longest for slots while its resources
+        were free (with the lock held); narrower jobs must leave room for it.
+        Jobs waiting for resources or for cores leased by other processes do not
+        reserve anything, since the jobs of this Scheduler do not free those.
+        """
+        now = time.monotonic()
+        for runner, queue in self._pending.items():
+            blocked = (
+                queue
+                and runner not in fitting
+                and runner.threads > self._free
+                and all(
+                    self._free_resources.get(name, amount) >= amount
+                    for name, amount in runner.resources.items()
+                )
+            )
+            if blocked:
+                self._waiting_since.setdefault(runner, now)
+            else:
+                self._waiting_since.pop(runner, None)
+        if not self._waiting_since:
+            return None
+        return min(self._waiting_since, key=lambda r: self._waiting_since[r])
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed and (job := self._next_job()) is None:
+                    self._cond.wait(timeout=1.0)
+                    self.progress.update(self._task, live=self._live_status())
+                if self._closed:
+                    return
+                runner, run_instance, cores = job
+                self._acquire(runner, +1)
+
+            self._executor.submit(self._execute, runner, run_instance, cores)
+
+    def _execute(
+        self, runner: "Runner", run_instance: Any, cores: Optional[list[int]]
+    ) -> None:
+        try:
+            runner._run_instance(run_instance, cores if self.pin else None)
+        except Exception as e:
+            out.error(f"Error running {run_instance.name}: {e}")
+        finally:
+            # Queued before this job counts as finished, so wait() keeps waiting
+            try:
+                more = runner._job_done(run_instance)
+            except Exception as e:
+                out.error(f"Error scheduling the jobs after {run_instance.name}: {e}")
+                more = []
+            for next_runner, jobs in more:
+                self.submit(next_runner, jobs)
+            with self._cond:
+                self._acquire(runner, -1)
+                if cores is not None and self.cores is not None:
+                    self.cores.release(cores)
+                self._cond.notify_all()
+            self.progress.update(self._task, advance=self._size(run_instance))
+
+    def _live_status(self) -> str:
+        resources = [
+            f"{name} {capacity - self._free_resources[name]}/{capacity}"
+            for name, capacity in self.resources.items()
+        ]
+        return "  ".join(
+            resources
+            + [status for runner in self._runners if (status := runner._live_status())]
+        )
 
     def _monitor_memory(self, stop_event: threading.Event) -> None:
         while not stop_event.is_set():
@@ -208,50 +496,456 @@ class Runner:
 
             stop_event.wait(10)
 
-    def _run_all_instances(self) -> None:
-        stop_monitor = threading.Event()
-        monitor_thread = threading.Thread(
-            target=self._monitor_memory, args=(stop_monitor,), daemon=True
+
+class Runner:
+    name: str
+    raw_logs_dir: Path
+    time_limit: int = 3600  # seconds
+    list_of_instances: list[RunInstance]
+    n_workers: int = 1
+    run_template: str = "{executable} {instance_path}"
+    class_name: Optional[str] = None
+    parser_cmd: Optional[str] = None
+    known_bounds: Any = None
+    stream_rules: Optional[Dict[str, str]] = None
+    stream_post_parse: bool = False
+    target: Any = None
+    stager: Any = None
+    batch_template: str = ""
+    batch_size: int = 1
+    forkserver: Any = None
+    resources: Dict[str, int] = {}
+    threads: int = 1
+    backend: Any = None
+    adaptive: Any = None
+    race: Any = None
+    capping: Any = None
+    ladder: list[float] = []
+    deadline: Any = None
+
+    def __init__(
+        self,
+        name: str,
+        raw_logs_dir: Path,
+        list_of_instances: list[RunInstance],
+        time_limit: int = 3600,
+        n_workers: int = 1,
+        run_template: str = "",
+        class_name: Optional[str] = None,
+        parser_cmd: Optional[str] = None,
+        known_bounds: Any = None,
+        stream_rules: Optional[Dict[str, str]] = None,
+        stream_post_parse: bool = False,
+        target: Any = None,
+        scheduler: Optional[Scheduler] = None,
+        stager: Any = None,
+        batch_template: str = "",
+        batch_size: int = 1,
+        forkserver: Any = None,
+        resources: Optional[Dict[str, int]] = None,
+        threads: int = 1,
+        backend: Any = None,
+        adaptive: Any = None,
+        race: Any = None,
+        capping: Any = None,
+        ladder: Optional[list[float]] = None,
+        deadline: Any = None,
+    ):
+        """
+        Without a `scheduler`, runs every instance with its own pool of `n_workers`
+        and gathers the results before returning.
+        With one, only queues the instances on it: call gather() once it is done.
+        With a `stager` (src.stage.Stager), {instance_path} is the instance's local,
+        decompressed copy instead of the original file.
+        With a `batch_template`, up to `batch_size` instances are run by each
+        invocation of it (see src/batch.py).
+        With a `forkserver` (src.forkserver.ForkServer), each instance of a python
+        build is a fork of a pre-warmed interpreter instead of a new process.
+        `resources` are the named resources (see Scheduler) each job holds while running.
+        Each job of a multi-threaded build gets `threads` cores ({threads} in the
+        run_template, and OMP_NUM_THREADS).
+        With a `backend` (src.backends.Backend, e.g. Slurm or the `xp worker`s of
+        src.distributed.Coordinator), each job is run through it instead of as a
+        local subprocess, keeping the same log layout.
+        With `adaptive` (src.config.AdaptiveConfig), the replicates ({seed} params)
+        of each instance are queued only while the confidence interval of its
+        wall time is too wide (see src/stats.py).
+        With a `race` (src.race.Race), the instances are queued by the race, block
+        by block, until this build is eliminated or the race ends.
+        With `capping` (src.capping.Capping), an instance already solved by some
+        build runs with a shorter time limit, recorded in its meta.json.
+        With a `ladder` of shorter time limits, every instance runs at the first
+        one and only the unsolved ones are queued again at the next (up to
+        time_limit); the logs of the previous rungs go to _rungs/[limit]s/.
+        With a `deadline` (src.plan.DeadlineMonitor), no job runs past it: each job's
+        time limit is capped to the time left, and the monitor may take the whole
+        build × class off the queue if it no longer fits.
+        """
+        self.name = name
+        self.n_workers = scheduler.n_workers if scheduler else n_workers
+        self.time_limit = time_limit
+        self.class_name = class_name
+        self.parser_cmd = parser_cmd
+        self.known_bounds = known_bounds
+        self.stream_rules = stream_rules if StreamParser is not None else None
+        self.stream_post_parse = stream_post_parse
+        self.target = target
+        self.stager = stager
+        self.batch_template = batch_template if BatchSplitter is not None else ""
+        self.batch_size = max(batch_size, 1)
+        self.forkserver = forkserver
+        self.resources = dict(resources or {})
+        self.threads = max(threads, 1)
+        self.backend = backend
+        if self.backend is not None and not self.backend.local and (
+            self.stager or self.forkserver
+        ):
+            out.warning(f"{name}: staging and forkserver are local only; not used.")
+            self.stager = self.forkserver = None
+        if (self.batch_template or self.forkserver) and self.target:
+            out.warning(
+                f"{name}: [build.target] is not supported with batch_template/forkserver."
+            )
+        self.adaptive = adaptive
+        if self.adaptive is not None and self.batch_template:
+            out.warning(
+                f"{name}: adaptive replicates are not supported with batch_template."
+            )
+            self.adaptive = None
+        self.capping = capping
+        self.deadline = deadline
+        self.ladder = sorted(t for t in set(ladder or []) if 0 < t < time_limit)
+        if self.ladder and self.batch_template:
+            out.warning(f"{name}: a time-limit ladder is not supported with batch_template.")
+            self.ladder = []
+        self.race = race if scheduler is not None else None
+        if self.race is not None and self.adaptive is not None:
+            out.warning(f"{name}: adaptive replicates are not supported in a race.")
+            self.adaptive = None
+        # Live parsers of the instances currently running, for the progress display
+        self._live: Dict[str, Any] = {}
+
+        # TODO check if raw_logs_dir exists, if not, warn and create
+        self.raw_logs_dir = raw_logs_dir
+
+        if run_template:
+            self.run_template = run_template
+            # TODO check if run_template has ">" and warn user they don't need to handle redirection
+
+        # TODO check if a RunInstance can fulfill the run_template
+        self.list_of_instances = list_of_instances
+        if self.ladder:
+            self.list_of_instances = [
+                inst.model_copy(update={"time_limit": self.ladder[0]})
+                for inst in list_of_instances
+            ]
+
+        # ---
+        self._print_info()
+        jobs = self._batches() if self.batch_template else self.list_of_instances
+        if self.adaptive is not None:
+            jobs = self._first_replicates()
+        if self.deadline is not None:
+            self.deadline.track(self)
+        if self.race is not None:
+            self.race.register(self)
+            return
+        if scheduler is not None:
+            scheduler.submit(self, jobs)
+            return
+
+        with Scheduler(self.n_workers) as own_scheduler:
+            own_scheduler.submit(self, jobs)
+        self.gather()
+
+    def spec(self) -> Dict[str, Any]:
+        """What a worker needs to run this Runner's jobs (see from_spec)."""
+        return {
+            "name": self.name,
+            "time_limit": self.time_limit,
+            "run_template": self.run_template,
+            "class_name": self.class_name,
+            "parser_cmd": self.parser_cmd,
+            "stream_rules": self.stream_rules,
+            "stream_post_parse": self.stream_post_parse,
+            "target": self.target.model_dump() if self.target is not None else None,
+            "batch_template": self.batch_template,
+            "batch_size": self.batch_size,
+            "threads": self.threads,
+        }
+
+    @classmethod
+    def from_spec(
+        cls, spec: Dict[str, Any], raw_logs_dir: Path, known_bounds: Any = None
+    ) -> "Runner":
+        """
+        A Runner rebuilt from spec() that does not queue or run anything by itself:
+        `xp worker` calls its _run_instance() for each job it receives.
+        """
+        from src.config import TargetConfig
+
+        runner = cls.__new__(cls)
+        runner.__dict__.update(spec)
+        if spec.get("target") is not None:
+            runner.target = TargetConfig(**spec["target"])
+        runner.raw_logs_dir = raw_logs_dir
+        runner.known_bounds = known_bounds
+        runner.list_of_instances = []
+        runner._live = {}
+        return runner
+
+    def gather(self) -> None:
+        # TODO melhorar esse nome
+        if self.parser_cmd or self.stream_rules:
+            gather_results(
+                raw_logs_dir=self.raw_logs_dir,
+                parsed_logs_csv=self.raw_logs_dir.parent / f"{self.name}_results.csv",
+                known_bounds=self.known_bounds,
+            )
+
+    def _live_status(self, max_shown: int = 3) -> str:
+        """Current incumbent/bound of (some of) the running instances."""
+        shown = []
+        for name, parser in list(self._live.items())[:max_shown]:
+            values = parser.snapshot()
+            if "lb" in values or "ub" in values:
+                shown.append(f"{name}: [{values.get('lb', '?')}, {values.get('ub', '?')}]")
+            elif values:
+                shown.append(f"{name}: {values}")
+        return "  ".join(shown)
+
+    @staticmethod
+    def _pair(run_instance: RunInstance) -> tuple:
+        """The (executable, instance, params) a replicate belongs to: all but the seed."""
+        params = tuple(
+            sorted((k, str(v)) for k, v in run_instance.params.items() if k != "seed")
         )
-        monitor_thread.start()
+        return run_instance.executable, run_instance.instance_path, params
+
+    def _first_replicates(self) -> list[RunInstance]:
+        """
+        The first `min_replicates` replicates of every pair; the others are held
+        back and queued by _next_replicates() only while they are needed.
+        """
+        self._replicate_lock = threading.Lock()
+        self._reserve: Dict[tuple, deque[RunInstance]] = {}
+        self._scheduled: Dict[tuple, list[RunInstance]] = {}
+        self._in_flight: Dict[tuple, int] = {}
+        first = []
+        for inst in self.list_of_instances:
+            pair = self._pair(inst)
+            scheduled = self._scheduled.setdefault(pair, [])
+            if len(scheduled) < self.adaptive.min_replicates:
+                scheduled.append(inst)
+                self._in_flight[pair] = self._in_flight.get(pair, 0) + 1
+                first.append(inst)
+            else:
+                self._reserve.setdefault(pair, deque()).append(inst)
+        return first
+
+    def _job_done(self, run_instance: Any) -> list[tuple["Runner", list[Any]]]:
+        """
+        Called by the Scheduler after each job: the jobs to queue next, as
+        (runner, jobs) pairs (the job itself at the next rung of the ladder, the
+        next block of a race, or the next replicate).
+        """
+        if self.deadline is not None and not self.deadline.job_done(self, run_instance):
+            # Fora do prazo: a corrida da classe, se houver, segue sem este build
+            return self.race.withdraw(self) if self.race is not None else []
+        rung = self._next_rung(run_instance)
+        if rung:
+            # Not done yet: the same job continues at the next rung
+            return [(self, rung)]
+        if self.race is not None:
+            return self.race.job_done(self, run_instance)
+        more = self._next_replicates(run_instance)
+        return [(self, more)] if more else []
+
+    def _rung(self, run_instance: RunInstance) -> Optional[float]:
+        """
+        The time limit of the last run of `run_instance` if it was an unsolved,
+        uncapped run below the build's time_limit (so it goes up the ladder).
+        A run is only solved if it exited with 0 before its limit (many solvers
+        stop at their own --time and exit 0) and, when it wrote a res.csv with
+        lb and ub, with lb == ub.
+        """
+        log_dir = self.raw_logs_dir / run_instance.name
+        try:
+            meta = json.loads((log_dir / "meta.json").read_text())
+        except (OSError, ValueError):
+            return None
+        limit = meta.get("time_limit") or self.time_limit
+        if meta.get("capped") or limit >= self.time_limit:
+            return None
+        solved = (
+            meta.get("exit_code") == 0
+            and meta.get("target_reached") is not False
+            and float(meta.get("wall_time_seconds") or 0) < limit
+            and self._proved(log_dir / "res.csv")
+        )
+        return None if solved else limit
 
+    @staticmethod
+    def _proved(res_path: Path) -> bool:
+        """False if res_path has lb and ub columns that differ (or are not numbers)."""
         try:
-            with Progress(
-                TextColumn("[progress.description]{task.description}"),
-                BarColumn(),
-                "{task.completed}|{task.total}",
-                TimeElapsedColumn(),
-                TimeRemainingColumn(),
-                console=out,
-            ) as progress:
-                total_tasks = len(self.list_of_instances)
-                task = progress.add_task("Running", total=total_tasks)
-
-                # Prepare core_id assignment if physical cores are available
-                core_id_iterator = None
-                if self.physical_core_ids:
-                    core_id_iterator = itertools.cycle(self.physical_core_ids)
-
-                with futures.ThreadPoolExecutor(max_workers=self.n_workers) as executor:
-                    future_to_instance = {}
-                    for run_instance in self.list_of_instances:
-                        current_core_id = (
-                            next(core_id_iterator) if core_id_iterator else None
-                        )
-                        future = executor.submit(
-                            self._run_instance, run_instance, current_core_id
-                        )
-                        future_to_instance[future] = run_instance
+            with res_path.open() as f:
+                row = next(csv.DictReader(f), None)
+        except OSError:
+            return True
+        if row is None or "lb" not in row or "ub" not in row:
+            return True
+        try:
+            return float(row["lb"]) == float(row["ub"])
+        except (TypeError, ValueError):
+            return False
+
+    def _next_rung(self, run_instance: Any) -> list[RunInstance]:
+        """The job again at the next rung of the ladder, if it was not solved."""
+        if not self.ladder or isinstance(run_instance, RunBatch):
+            return []
+        limit = self._rung(run_instance)
+        if limit is None:
+            return []
+        higher = [t for t in self.ladder if t > limit]
+        # The last rung is the build's own time_limit
+        return [
+            run_instance.model_copy(
+                update={"time_limit": higher[0] if higher else None, "capped": False}
+            )
+        ]
 
-                    for _ in futures.as_completed(future_to_instance):
-                        progress.update(task, advance=1)
-        finally:
-            stop_monitor.set()
-            monitor_thread.join()
+    def _shelve_rung(self, run_instance: RunInstance) -> None:
+        """Moves the logs of a lower rung of `run_instance` to _rungs/[limit]s/."""
+        limit = self._rung(run_instance)
+        if limit is None or limit >= self._time_limit(run_instance):
+            return
+        shelf = self.raw_logs_dir / "_rungs" / f"{limit:g}s" / run_instance.name
+        shelf.parent.mkdir(parents=True, exist_ok=True)
+        shutil.rmtree(shelf, ignore_errors=True)
+        shutil.move(self.raw_logs_dir / run_instance.name, shelf)
+
+    def _next_replicates(self, run_instance: Any) -> list[RunInstance]:
+        """
+        With adaptive replicates, the next replicate of the job's pair if its wall
+        time is not known precisely enough.
+        """
+        if self.adaptive is None or isinstance(run_instance, RunBatch):
+            return []
+        from src.stats import needs_more
+
+        pair = self._pair(run_instance)
+        with self._replicate_lock:
+            self._in_flight[pair] -= 1
+            if not self._reserve.get(pair):
+                return []
+            # Wait for the first replicates before judging the interval
+            done = len(self._scheduled[pair]) - self._in_flight[pair]
+            if self._in_flight[pair] and done < self.adaptive.min_replicates:
+                return []
+            samples = []
+            for inst in self._scheduled[pair]:
+                meta_path = self.raw_logs_dir / inst.name / "meta.json"
+                try:
+                    meta = json.loads(meta_path.read_text())
+                    samples.append(float(meta["wall_time_seconds"]))
+                except (OSError, ValueError, KeyError, TypeError):
+                    continue
+            total = len(self._scheduled[pair]) + len(self._reserve[pair])
+            if not needs_more(
+                samples,
+                self.adaptive.min_replicates,
+                total,
+                self.adaptive.rel_ci,
+                self.adaptive.confidence,
+            ):
+                return []
+            inst = self._reserve[pair].popleft()
+            self._scheduled[pair].append(inst)
+            self._in_flight[pair] += 1
+            return [inst]
+
+    def _batches(self, instances: Optional[list[RunInstance]] = None) -> list[RunBatch]:
+        """
+        Groups the instances (all of them by default) not run yet into batches of
+        up to batch_size.
+        """
+        pending = [
+            inst
+            for inst in (self.list_of_instances if instances is None else instances)
+            if not (self.raw_logs_dir / inst.name).exists()
+        ]
+        return [
+            RunBatch(instances=pending[i : i + self.batch_size])
+            for i in range(0, len(pending), self.batch_size)
+        ]
 
     def _run_instance(
-        self, run_instance: RunInstance, core_id: Optional[int] = None
+        self, run_instance: RunInstance | RunBatch, cores: Optional[list[int]] = None
     ) -> None:
+        if self.ladder and isinstance(run_instance, RunInstance):
+            self._shelve_rung(run_instance)
+        if self.capping is not None and isinstance(run_instance, RunInstance):
+            cap = self.capping.limit(
+                run_instance.instance_path, self._time_limit(run_instance)
+            )
+            if cap is not None:
+                run_instance = run_instance.model_copy(
+                    update={"time_limit": cap, "capped": True}
+                )
+        if self.deadline is not None:
+            self.deadline.job_started(self)
+        if self.deadline is not None and isinstance(run_instance, RunInstance):
+            left = int(self.deadline.time_left())
+            if left <= 0:
+                return
+            if left < self._time_limit(run_instance):
+                run_instance = run_instance.model_copy(
+                    update={"time_limit": left, "capped": True}
+                )
+
+        if self.backend is None:
+            self._run_local(run_instance, cores)
+        elif (
+            self.backend.local
+            or isinstance(run_instance, RunBatch)
+            or not (self.raw_logs_dir / run_instance.name).exists()
+        ):
+            self.backend.run(self, run_instance, cores)
+
+        if self.capping is not None:
+            instances = (
+                run_instance.instances
+                if isinstance(run_instance, RunBatch)
+                else [run_instance]
+            )
+            for inst in instances:
+                try:
+                    meta_path = self.raw_logs_dir / inst.name / "meta.json"
+                    self.capping.observe(json.loads(meta_path.read_text()))
+                except (OSError, ValueError):
+                    continue
+
+    def _time_limit(self, run_instance: RunInstance) -> float:
+        """The time limit of a job: its own, if set, or the build's."""
+        if run_instance.time_limit is not None:
+            return run_instance.time_limit
+        return self.time_limit
+
+    def _limit_meta(self, run_instance: RunInstance, meta: Dict[str, Any]) -> None:
+        """Records in `meta` the time limit of a job that does not use the build's."""
+        if run_instance.time_limit is not None:
+            meta["time_limit"] = run_instance.time_limit
+            meta["capped"] = run_instance.capped
+
+    def _run_local(
+        self, run_instance: RunInstance | RunBatch, cores: Optional[list[int]] = None
+    ) -> None:
+        """Runs a job on this machine, skipping instances that already have logs."""
+        if isinstance(run_instance, RunBatch):
+            self._run_batch(run_instance, cores)
+            return
+
         inst_path = run_instance.instance_path
         log_dir = self.raw_logs_dir / f"{run_instance.name}/"
 
@@ -263,10 +957,37 @@ class Runner:
 
         log_dir.mkdir(parents=True, exist_ok=True)
 
+        if self.stager is None:
+            self._execute_instance(run_instance, log_dir, inst_path, cores)
+            return
+
+        try:
+            staged_path = self.stager.acquire(inst_path)
+        except Exception as e:
+            out.error(f"Error staging {inst_path.name}: {e}")
+            return
+        try:
+            self._execute_instance(run_instance, log_dir, staged_path, cores)
+        finally:
+            self.stager.release(inst_path)
+
+    def _execute_instance(
+        self,
+        run_instance: RunInstance,
+        log_dir: Path,
+        staged_path: Path,
+        cores: Optional[list[int]] = None,
+    ) -> None:
+        inst_path = run_instance.instance_path
+
         format_params = {
             "executable": run_instance.executable,
-            "instance_path": run_instance.instance_path,
+            "instance_path": staged_path,
+            "threads": self.threads,
+            "time_limit": self._time_limit(run_instance),
         }
+        if run_instance.prepared_path is not None:
+            format_params["prepared_path"] = run_instance.prepared_path
         format_params.update(run_instance.params)
 
         # Dica: Use .safe_substitute() se quiser evitar erros de chaves faltando,
@@ -277,11 +998,12 @@ class Runner:
             out.error(f"Failed to format command. Missing key: {e}")
             return
 
-        # Prepend taskset command if core_id is provided and physical cores are detected
-        # if core_id is not None and self.physical_core_ids:
-        #     command = f"taskset -c {core_id} {command}"
+        if self.forkserver is not None:
+            self._execute_forked(run_instance, log_dir, staged_path, command, cores)
+            return
 
-        command = f"timeout --preserve-status --kill-after={int(self.time_limit * 0.01)} {self.time_limit}s {command}"
+        time_limit = self._time_limit(run_instance)
+        command = f"{self._pin(cores)}timeout --preserve-status --kill-after={int(time_limit * 0.01)} {math.ceil(time_limit)}s {command}"
 
         # Inicializamos variáveis de resultado
         exit_code = None
@@ -290,29 +1012,49 @@ class Runner:
         # Marcamos o tempo inicial para calcular a duração manualmente
         start_time = time.perf_counter()
 
+        target = self._instance_target(inst_path)
+        stream_parser = (
+            StreamParser(self.stream_rules or {})
+            if self.stream_rules or target
+            else None
+        )
+        time_to_target: Optional[float] = None
+
         try:
             with (
                 (log_dir / "stdout.log").open("w") as stdout_fd,
                 (log_dir / "stderr.log").open("w") as stderr_fd,
             ):
-                result = subprocess.run(
-                    command,
-                    shell=True,
-                    timeout=int(self.time_limit),
-                    stdout=stdout_fd,
-                    stderr=stderr_fd,
-                    text=True,
-                )
+                if stream_parser is None:
+                    result = subprocess.run(
+                        command,
+                        shell=True,
+                        timeout=time_limit,
+                        stdout=stdout_fd,
+                        stderr=stderr_fd,
+                        text=True,
+                        env=self._env(),
+                    )
+                    exit_code = result.returncode
+                else:
+                    exit_code, time_to_target = self._run_streaming(
+                        command,
+                        stdout_fd,
+                        stderr_fd,
+                        stream_parser,
+                        run_instance.name,
+                        target,
+                        time_limit,
+                    )
 
                 # SE SUCESSO (o processo terminou, mesmo com erro interno):
-                exit_code = result.returncode
                 wall_time = time.perf_counter() - start_time
 
         except subprocess.TimeoutExpired:
             # SE TIMEOUT:
             # out.warning(f"Instance {run_instance.name} timed out.")
             exit_code = 124  # Código padrão de timeout (ou use -1 se preferir)
-            wall_time = self.time_limit  # O tempo foi o limite estipulado
+            wall_time = time_limit  # O tempo foi o limite estipulado
 
         except Exception as e:
             out.error(f"Error running {run_instance.name}: {e}")
@@ -328,6 +1070,14 @@ class Runner:
                 "wall_time_seconds": wall_time,  # Agora usamos a variável local
                 "exit_code": exit_code,  # Agora usamos a variável local
             }
+            if staged_path != inst_path:
+                meta["staged_path"] = staged_path.as_posix()
+            if "seed" in run_instance.params:
+                meta["seed"] = run_instance.params["seed"]
+            self._limit_meta(run_instance, meta)
+            if target:
+                meta["target_reached"] = time_to_target is not None
+                meta["time_to_target"] = time_to_target
 
             meta_path = log_dir / "meta.json"
             with meta_path.open("w") as meta_fd:
@@ -337,19 +1087,442 @@ class Runner:
             out.error(f"Error writing {inst_path.name}/meta.json: {e}")
             return
 
-        if self.parser_cmd:
+        if self.stream_rules:
+            # The values were already extracted while the process ran
+            self._write_streamed_results(
+                log_dir, meta, stream_parser.snapshot(), stream_parser.events
+            )
+        elif self.parser_cmd:
             try:
                 parse_instance(self.parser_cmd, log_dir)
             except Exception as e:
                 out.error(f"Error parsing instance {inst_path.name}: {e}")
 
+    def _execute_forked(
+        self,
+        run_instance: RunInstance,
+        log_dir: Path,
+        staged_path: Path,
+        command: str,
+        cores: Optional[list[int]] = None,
+    ) -> None:
+        """Runs `command` as a fork of the build's forkserver, with the same accounting."""
+        inst_path = run_instance.instance_path
+        try:
+            self.forkserver.ensure_started(command, run_instance.executable)
+        except Exception as e:
+            out.error(f"Error running {run_instance.name}: {e}")
+            return
+
+        start_time = time.perf_counter()
+        try:
+            exit_code = self.forkserver.run(
+                command,
+                run_instance.executable,
+                log_dir / "stdout.log",
+                log_dir / "stderr.log",
+                timeout=self._time_limit(run_instance),
+                env=self._env(base={}),
+                cores=cores,
+            )
+            wall_time = time.perf_counter() - start_time
+        except subprocess.TimeoutExpired:
+            exit_code = 124
+            wall_time = self._time_limit(run_instance)
+        except Exception as e:
+            out.error(f"Error running {run_instance.name}: {e}")
+            return
+
+        meta = {
+            "build_name": self.name,
+            "instance_name": inst_path.name,
+            "instance_path": inst_path.as_posix(),
+            "command": command,
+            "wall_time_seconds": wall_time,
+            "exit_code": exit_code,
+            "forkserver": True,
+        }
+        if staged_path != inst_path:
+            meta["staged_path"] = staged_path.as_posix()
+        if "seed" in run_instance.params:
+            meta["seed"] = run_instance.params["seed"]
+        self._limit_meta(run_instance, meta)
+        try:
+            with (log_dir / "meta.json").open("w") as meta_fd:
+                json.dump(meta, meta_fd, indent=4)
+        except Exception as e:
+            out.error(f"Error writing {inst_path.name}/meta.json: {e}")
+            return
+
+        self._parse_log_dir(log_dir, meta)
+
+    def _env(self, base: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Environment of a job: OMP_NUM_THREADS set to the build's threads."""
+        env = dict(os.environ if base is None else base)
+        env["OMP_NUM_THREADS"] = str(self.threads)
+        return env
+
+    @staticmethod
+    def _pin(cores: Optional[list[int]]) -> str:
+        """taskset prefix pinning a command to `cores` (empty without cores)."""
+        if not cores:
+            return ""
+        return f"taskset -c {','.join(map(str, cores))} "
+
+    def _parse_log_dir(
+        self, log_dir: Path, meta: Dict[str, Any], lines: Optional[list[str]] = None
+    ) -> None:
+        """
+        Extracts the results of a run whose output was not streamed: through the
+        STREAM_RULES (over `lines`, or stdout.log) or the parser command.
+        """
+        if self.stream_rules:
+            if lines is None:
+                with (log_dir / "stdout.log").open("r") as stdout_fd:
+                    lines = stdout_fd.readlines()
+            stream_parser = StreamParser(self.stream_rules)
+            for line in lines:
+                stream_parser.feed(line)
+            # Feed times are not solver times, so no events.csv
+            self._write_streamed_results(log_dir, meta, stream_parser.snapshot(), [])
+        elif self.parser_cmd:
+            try:
+                parse_instance(self.parser_cmd, log_dir)
+            except Exception as e:
+                out.error(f"Error parsing instance {meta['instance_name']}: {e}")
+
+    def _run_batch(self, batch: RunBatch, cores: Optional[list[int]] = None) -> None:
+        """
+        Runs every instance of `batch` with one invocation of the batch_template,
+        then splits its output (by the @@xp begin/end markers) into the usual
+        per-instance stdout.log/stderr.log/meta.json. Instances the executable
+        never started are left without logs, so a later run picks them up.
+        The markers on stdout decide which instances ran and their exit code and
+        wall time; stderr is split by the markers printed on stderr, so unless
+        the executable prints them there too, every per-instance stderr.log is
+        empty (the whole stderr is still in the batch's own stderr.log).
+        The batch's complete output is kept in raw_logs_dir/_batches/.
+        """
+        instances = batch.instances
+        first = instances[0]
+
+        staged: Dict[Path, Path] = {}
+        try:
+            for inst in instances if self.stager is not None else []:
+                staged[inst.instance_path] = self.stager.acquire(inst.instance_path)
+        except Exception as e:
+            out.error(f"Error staging {batch.name}: {e}")
+            for inst_path in staged:
+                self.stager.release(inst_path)
+            return
+
+        try:
+            paths = [staged.get(i.instance_path, i.instance_path) for i in instances]
+            # Marker key (position, name or path) -> position in the batch
+            keys: Dict[str, int] = {}
+            for pos, (inst, path) in enumerate(zip(instances, paths)):
+                names = (str(pos), inst.instance_path.name, str(inst.instance_path))
+                for key in (*names, str(path)):
+                    keys.setdefault(key, pos)
+
+            format_params: Dict[str, Any] = {
+                "executable": first.executable,
+                "instance_paths": " ".join(shlex.quote(str(p)) for p in paths),
+                "time_limit": self.time_limit,
+                "threads": self.threads,
+            }
+            if all(i.prepared_path is not None for i in instances):
+                format_params["prepared_paths"] = " ".join(
+                    shlex.quote(str(i.prepared_path)) for i in instances
+                )
+            format_params.update(first.params)
+            try:
+                command = self.batch_template.format(**format_params)
+            except KeyError as e:
+                out.error(f"Failed to format batch command. Missing key: {e}")
+                return
+
+            # The executable enforces the per-instance limit; this one bounds the batch
+            batch_limit = self.time_limit * len(instances)
+            command = f"{self._pin(cores)}timeout --preserve-status --kill-after={int(batch_limit * 0.01)} {math.ceil(batch_limit)}s {command}"
+
+            batch_dir = self.raw_logs_dir / "_batches" / batch.name
+            batch_dir.mkdir(parents=True, exist_ok=True)
+            stdout_split, stderr_split = BatchSplitter(keys), BatchSplitter(keys)
+            timed_out = False
+
+            with (
+                (batch_dir / "stdout.log").open("w") as stdout_fd,
+                (batch_dir / "stderr.log").open("w") as stderr_fd,
+            ):
+                process = subprocess.Popen(
+                    command,
+                    shell=True,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    bufsize=1,
+                    env=self._env(),
+                )
+
+                def pump(source: Any, sink: Any, splitter: Any) -> None:
+                    for line in source:
+                        sink.write(line)
+                        splitter.feed(line)
+                    source.close()
+
+                readers = [
+                    threading.Thread(
+                        target=pump,
+                        args=(process.stdout, stdout_fd, stdout_split),
+                        daemon=True,
+                    ),
+                    threading.Thread(
+                        target=pump,
+                        args=(process.stderr, stderr_fd, stderr_split),
+                        daemon=True,
+                    ),
+                ]
+                for reader in readers:
+                    reader.start()
+                try:
+                    process.wait(timeout=batch_limit)
+                except subprocess.TimeoutExpired:
+                    timed_out = True
+                    try:
+                        children = psutil.Process(process.pid).children(recursive=True)
+                    except psutil.NoSuchProcess:
+                        children = []
+                    for proc in children:
+                        try:
+                            proc.kill()
+                        except psutil.NoSuchProcess:
+                            pass  # already gone
+                    process.kill()
+                    process.wait()
+                for reader in readers:
+                    reader.join()
+        except Exception as e:
+            out.error(f"Error running {batch.name}: {e}")
+            return
+        finally:
+            for inst_path in staged:
+                self.stager.release(inst_path)
+
+        not_started = 0
+        for pos, (inst, path) in enumerate(zip(instances, paths)):
+            output = stdout_split.outputs.get(pos)
+            if output is None or not output.started:
+                not_started += 1
+                continue
+            errors = stderr_split.outputs.get(pos)
+            log_dir = self.raw_logs_dir / inst.name
+            log_dir.mkdir(parents=True, exist_ok=True)
+
+            if output.finished:
+                exit_code, wall_time = output.exit_code, output.wall_time
+            else:
+                # The batch died (or timed out) while running this instance
+                exit_code = 124 if timed_out else (process.returncode or 1)
+                wall_time = None
+
+            try:
+                (log_dir / "stdout.log").write_text("".join(output.lines))
+                (log_dir / "stderr.log").write_text(
+                    "".join(errors.lines) if errors else ""
+                )
+                meta = {
+                    "build_name": self.name,
+                    "instance_name": inst.instance_path.name,
+                    "instance_path": inst.instance_path.as_posix(),
+                    "command": command,
+                    "wall_time_seconds": wall_time,
+                    "exit_code": exit_code,
+                    "batch": batch.name,
+                }
+                if path != inst.instance_path:
+                    meta["staged_path"] = path.as_posix()
+                if "seed" in inst.params:
+                    meta["seed"] = inst.params["seed"]
+                with (log_dir / "meta.json").open("w") as meta_fd:
+                    json.dump(meta, meta_fd, indent=4)
+            except Exception as e:
+                out.error(f"Error writing {inst.instance_path.name}/meta.json: {e}")
+                continue
+
+            self._parse_log_dir(log_dir, meta, output.lines)
+
+        if not_started:
+            out.warning(
+                f"{batch.name}: {not_started} instances were not started"
+                " and will run again next time."
+            )
+
+    def _run_streaming(
+        self,
+        command: str,
+        stdout_fd: Any,
+        stderr_fd: Any,
+        stream_parser: Any,
+        name: str,
+        target: Any = None,
+        time_limit: Optional[float] = None,
+    ) -> tuple[int, Optional[float]]:
+        """
+        Runs the command teeing its output through `stream_parser`, so the
+        results are ready as soon as the process exits.
+        If `target` is reached, the process tree gets a SIGTERM (so the solver
+        can finish gracefully) and the time it took is returned alongside the exit code.
+        Raises subprocess.TimeoutExpired like subprocess.run does.
+        """
+        start_time = time.perf_counter()
+        time_to_target: list[float] = []
+
+        process = subprocess.Popen(
+            command,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            env=self._env(),
+        )
+
+        def signal_group(sig: int) -> None:
+            # `timeout` puts itself in its own process group, so signal the whole tree
+            try:
+                root = psutil.Process(process.pid)
+                tree = [root] + root.children(recursive=True)
+            except psutil.NoSuchProcess:
+                return
+            for proc in tree:
+                try:
+                    proc.send_signal(sig)
+                except psutil.NoSuchProcess:
+                    pass
+
+        def on_target() -> None:
+            time_to_target.append(time.perf_counter() - start_time)
+            signal_group(signal.SIGTERM)
+
+        self._live[name] = stream_parser
+        try:
+            readers = tee_process(
+                process, stdout_fd, stderr_fd, stream_parser, target, on_target
+            )
+            try:
+                process.wait(timeout=time_limit or self.time_limit)
+            except subprocess.TimeoutExpired:
+                signal_group(signal.SIGKILL)
+                process.wait()
+                raise
+            finally:
+                for reader in readers:
+                    reader.join()
+        finally:
+            del self._live[name]
+        return process.returncode, (time_to_target[0] if time_to_target else None)
+
+    def _instance_target(self, inst_path: Path) -> Any:
+        """The time-to-target criterion of this build for one instance, if any."""
+        if self.target is None or Target is None:
+            return None
+
+        optimum = None
+        if self.target.optimum and self.known_bounds is not None:
+            optimum = self.known_bounds.optimum(inst_path.name)
+            if optimum is None:
+                optimum = self.known_bounds.optimum(inst_path.stem)
+
+        target = Target(self.target.pattern, optimum, self.target.gap)
+        return target or None
+
+    def _write_streamed_results(
+        self,
+        log_dir: Path,
+        meta: Dict[str, Any],
+        values: Dict[str, Any],
+        events: list[Dict[str, Any]],
+    ) -> None:
+        """
+        Writes res.csv like the parsers do (instance, time, parsed values, meta),
+        and events.csv with the time of every lb/ub change, from the streamed
+        values alone. Only if the parser opted in (STREAM_POST_PARSE, when its
+        STREAM_RULES do not cover everything it extracts) does the parser command
+        also run on the log dir, with the streamed values merged into its row
+        (they win for their own columns; the parser's time and other columns stay).
+        """
+        row: Dict[str, Any] = {"instance": meta["instance_name"]}
+        if meta.get("target_reached"):
+            row["time"] = meta["time_to_target"]
+        elif meta["exit_code"] == 0:
+            row["time"] = meta["wall_time_seconds"]
+        row.update(meta)
+
+        if self.parser_cmd and self.stream_post_parse:
+            try:
+                parse_instance(self.parser_cmd, log_dir)
+                with (log_dir / "res.csv").open("r", newline="") as res_fd:
+                    parsed = next(csv.DictReader(res_fd), None) or {}
+                row = {**row, **parsed}
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                out.error(f"Error parsing instance {meta['instance_name']}: {e}")
+        row.update(values)
+        try:
+            with (log_dir / "res.csv").open("w", newline="") as res_fd:
+                writer = csv.DictWriter(res_fd, fieldnames=list(row.keys()))
+                writer.writeheader()
+                writer.writerow(row)
+            if events:
+                with (log_dir / "events.csv").open("w", newline="") as events_fd:
+                    writer = csv.DictWriter(events_fd, fieldnames=["time", "lb", "ub"])
+                    writer.writeheader()
+                    writer.writerows(events)
+        except Exception as e:
+            out.error(f"Error writing {log_dir.name}/res.csv: {e}")
+
     def _print_info(self) -> None:
+        parser = f"\n{'Parser':<15}: {self.parser_cmd}" if self.parser_cmd else ""
+        streaming = (
+            f"\n{'Streaming':<15}: {len(self.stream_rules)} rules"
+            if self.stream_rules
+            else ""
+        )
+        target = f"\n{'Target':<15}: {self.target}" if self.target else ""
+        staging = (
+            f"\n{'Staging':<15}: {self.stager.directory}" if self.stager else ""
+        )
+        batching = (
+            f"\n{'Batch Size':<15}: {self.batch_size}" if self.batch_template else ""
+        )
+        replicates = (
+            f"\n{'Replicates':<15}: adaptive (min {self.adaptive.min_replicates},"
+            f" ±{self.adaptive.rel_ci:.0%} at {self.adaptive.confidence:.0%})"
+            if self.adaptive is not None
+            else ""
+        )
+        threading_info = (
+            f"\n{'Threads':<15}: {self.threads}" if self.threads > 1 else ""
+        )
+        backend = (
+            f"\n{'Backend':<15}: {self.backend.name}"
+            if self.backend is not None and not self.backend.local
+            else ""
+        )
+        forking = (
+            f"\n{'Forkserver':<15}: {', '.join(self.forkserver.modules) or '-'}"
+            if self.forkserver
+            else ""
+        )
+        time_limits = " → ".join(f"{t:g}s" for t in [*self.ladder, self.time_limit])
         info_panel = Panel(
             f"{'Workers':<15}: {self.n_workers}\n"
-            f"{'Time Limit':<15}: {self.time_limit}s\n"
+            f"{'Time Limit':<15}: {time_limits}\n"
             f"{'Raw Logs':<15}: {self.raw_logs_dir}\n"
             f"{'# of Instances':<15}: {len(self.list_of_instances)}"
-            f"{'' if not self.parser_cmd else f'\nParser':<16}: {self.parser_cmd}",
+            f"{parser}{streaming}{target}{staging}{batching}{forking}{threading_info}{replicates}{backend}",
             title=f"Running {self.name} × {self.class_name}",
             title_align="left",
             subtitle="Sit back and wait...",
@@ -0,0 +1,138 @@
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from src.console import out
+from src.history import JobKey
+
+
+def parse_shard(shard: str) -> Tuple[int, int]:
+    """'2/8' -> (2, 8); os shards são numerados de 1 a N (como um array job)."""
+    try:
+        index, count = (int(part) for part in shard.split("/"))
+    except ValueError:
+        raise ValueError(f"--shard deve ter a forma i/N, não '{shard}'")
+    if not 1 <= index <= count:
+        raise ValueError(f"--shard {shard}: i deve estar entre 1 e N")
+    return index, count
+
+
+def shard_tag(tag: str, index: int, count: int) -> str:
+    """Tag dos logs de um shard, que `xp merge <tag>` junta de volta em `tag`."""
+    return f"{tag}-shard{index}of{count}"
+
+
+def shard_jobs(costs: Dict[JobKey, float], index: int, count: int) -> List[JobKey]:
+    """
+    Os jobs do shard `index` (de 1 a `count`): longest processing time first, ou
+    seja, do job mais caro ao mais barato, cada um vai para o shard com a menor
+    carga prevista. Empates são desfeitos pela ordem dos jobs e dos shards, então
+    a partição só depende de `costs`.
+    """
+    loads = [0.0] * count
+    assignment: List[List[JobKey]] = [[] for _ in range(count)]
+    for job in sorted(costs, key=lambda j: (-costs[j], j[0], j[1], str(j[2]))):
+        shard = min(range(count), key=lambda s: (loads[s], s))
+        loads[shard] += costs[job]
+        assignment[shard].append(job)
+    return assignment[index - 1]
+
+
+def frozen_costs(path: Path, costs: Dict[JobKey, float]) -> Dict[JobKey, float]:
+    """
+    Os custos gravados em `path` pelo primeiro shard que chegou ali; se o arquivo
+    ainda não existe, grava `costs` (atomicamente: só um shard ganha a corrida).
+    Assim todos os shards particionam os mesmos custos, mesmo que o histórico em
+    logs/raw mude entre o início de um e de outro.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    jobs = sorted(costs, key=lambda j: (j[0], j[1], str(j[2])))
+    tmp.write_text(json.dumps([[b, c, str(p), costs[(b, c, p)]] for b, c, p in jobs]))
+    try:
+        os.link(tmp, path)
+    except FileExistsError:
+        pass
+    finally:
+        tmp.unlink()
+
+    frozen = {(b, c, Path(p)): cost for b, c, p, cost in json.loads(path.read_text())}
+    if set(frozen) != set(costs):
+        raise ValueError(
+            f"{path} foi gravado para outro conjunto de jobs; apague-o para recalcular"
+            " (todos os shards precisam ser executados de novo)."
+        )
+    return frozen
+
+
+def _move_entries(source: Path, target: Path) -> int:
+    """
+    Move o conteúdo de `source` para `target`, sem sobrescrever nada. Diretórios
+    internos (que começam com "_", como _batches/) são juntados. Devolve quantas
+    entradas ficaram para trás por já existirem no destino.
+    """
+    target.mkdir(parents=True, exist_ok=True)
+    conflicts = 0
+    for entry in sorted(source.iterdir()):
+        dest = target / entry.name
+        if entry.is_dir() and entry.name.startswith("_"):
+            conflicts += _move_entries(entry, dest)
+        elif dest.exists():
+            conflicts += 1
+        else:
+            entry.rename(dest)
+    return conflicts
+
+
+def merge_shards(raw_logs_dir: Path, tag: str) -> List[Path]:
+    """
+    Junta os logs dos shards de `tag` (raw_logs_dir/<tag>-shard<i>of<N>/) em
+    raw_logs_dir/<tag>/, como se fossem uma única execução, e apaga os diretórios
+    dos shards. Instâncias que já existem no destino (ex: de um merge anterior)
+    não são sobrescritas e ficam no shard. Devolve os diretórios de build de <tag>.
+    """
+    pattern = re.compile(rf"{re.escape(tag)}-shard(\d+)of(\d+)")
+    shards: Dict[int, Path] = {}
+    counts = set()
+    for path in raw_logs_dir.iterdir():
+        match = pattern.fullmatch(path.name)
+        if match and path.is_dir():
+            shards[int(match.group(1))] = path
+            counts.add(int(match.group(2)))
+
+    if not shards:
+        raise ValueError(f"nenhum shard de '{tag}' em {raw_logs_dir}")
+    if len(counts) > 1:
+        raise ValueError(f"shards de '{tag}' com números de shards diferentes: {counts}")
+    missing = sorted(set(range(1, counts.pop() + 1)) - set(shards))
+    if missing:
+        out.warning(f"Shards faltando: {', '.join(map(str, missing))}.")
+
+    target = raw_logs_dir / tag
+    target.mkdir(parents=True, exist_ok=True)
+    for index in sorted(shards):
+        conflicts = 0
+        for entry in sorted(shards[index].iterdir()):
+            if entry.is_dir():
+                conflicts += _move_entries(entry, target / entry.name)
+                continue
+            # Arquivos da tag (ex: race_<classe>.json): um por shard, com o seu sufixo
+            dest = target / entry.name
+            if dest.exists():
+                dest = target / f"{entry.stem}-{shards[index].name[len(tag) + 1:]}{entry.suffix}"
+            if dest.exists():
+                conflicts += 1
+            else:
+                entry.rename(dest)
+        if conflicts:
+            out.warning(
+                f"{shards[index]}: {conflicts} instâncias já existiam em {target};"
+                " mantidas no shard."
+            )
+        else:
+            shutil.rmtree(shards[index])
+
+    return sorted(p for p in target.iterdir() if p.is_dir())
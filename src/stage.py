@@ -0,0 +1,160 @@
+import bz2
+import gzip
+import hashlib
+import lzma
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import IO, Callable, Dict, Optional
+
+from src.config import InstanceInfo
+from src.console import out
+
+# Formatos comprimidos descomprimidos ao copiar para o staging
+DECOMPRESSORS: Dict[str, Callable[[Path], IO[bytes]]] = {
+    ".gz": lambda path: gzip.open(path, "rb"),
+    ".xz": lambda path: lzma.open(path, "rb"),
+    ".lzma": lambda path: lzma.open(path, "rb"),
+    ".bz2": lambda path: bz2.open(path, "rb"),
+}
+
+
+class _Staged:
+    def __init__(self, path: Path):
+        self.path = path
+        self.size = 0
+        self.refs = 0
+        self.ready = threading.Event()
+        self.error: Optional[Exception] = None
+
+
+class Stager:
+    """
+    Cópia local (ex: em /dev/shm) das instâncias em uso, descomprimidas.
+
+    Cada instância é copiada uma única vez, na primeira vez em que algum job (de
+    qualquer build) a usa, e fica disponível enquanto houver jobs com uma referência
+    a ela (acquire/release). Instâncias sem referências continuam no staging para os
+    próximos builds e são removidas (da menos recentemente usada para a mais) quando
+    o total passa de `budget` bytes.
+
+        with Stager("/dev/shm", budget) as stager:
+            staged = stager.acquire(instance_path)
+            ...
+            stager.release(instance_path)
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        budget: int,
+        manifest: Optional[Dict[Path, InstanceInfo]] = None,
+    ):
+        directory = Path(directory).expanduser()
+        directory.mkdir(parents=True, exist_ok=True)
+        self.directory = Path(tempfile.mkdtemp(prefix="xp-stage-", dir=directory))
+        self.budget = budget
+        self.manifest = manifest or {}
+        self.used = 0
+        self._warned = False
+        # Da menos para a mais recentemente usada
+        self._entries: "OrderedDict[str, _Staged]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "Stager":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def _key(self, instance_path: Path) -> str:
+        # Mesmo conteúdo, mesma cópia (o hash vem do manifesto das instâncias)
+        info = self.manifest.get(instance_path)
+        if info is not None:
+            return info.hash
+        return hashlib.sha1(str(instance_path.resolve()).encode()).hexdigest()
+
+    def acquire(self, instance_path: Path) -> Path:
+        """Caminho da cópia local de `instance_path`, copiando-a se necessário."""
+        key = self._key(instance_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                name = instance_path.name
+                if instance_path.suffix in DECOMPRESSORS:
+                    name = instance_path.stem
+                entry = _Staged(self.directory / key / name)
+                self._entries[key] = entry
+                owner = True
+            else:
+                owner = False
+            entry.refs += 1
+            self._entries.move_to_end(key)
+
+        if owner:
+            try:
+                self._copy(instance_path, entry.path)
+                entry.size = entry.path.stat().st_size
+                with self._lock:
+                    self.used += entry.size
+                    self._evict()
+            except Exception as e:
+                entry.error = e
+            finally:
+                entry.ready.set()
+        else:
+            entry.ready.wait()
+
+        if entry.error is not None:
+            self.release(instance_path)
+            raise entry.error
+        return entry.path
+
+    def release(self, instance_path: Path) -> None:
+        """Devolve a referência obtida com acquire()."""
+        key = self._key(instance_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.refs -= 1
+            if entry.error is not None and entry.refs <= 0:
+                del self._entries[key]
+                return
+            self._evict()
+
+    def _evict(self) -> None:
+        """Remove cópias sem referências até caber no orçamento (com o lock)."""
+        for key in list(self._entries):
+            if self.used <= self.budget:
+                return
+            entry = self._entries[key]
+            if entry.refs > 0 or not entry.ready.is_set():
+                continue
+            del self._entries[key]
+            self.used -= entry.size
+            shutil.rmtree(entry.path.parent, ignore_errors=True)
+
+        if self.used > self.budget and not self._warned:
+            self._warned = True
+            out.warning(
+                f"Staging acima do orçamento ({self.used / 2**20:.0f} MB em uso):"
+                " todas as cópias estão sendo usadas."
+            )
+
+    @staticmethod
+    def _copy(source: Path, destination: Path) -> None:
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = destination.with_name(destination.name + ".tmp")
+        opener = DECOMPRESSORS.get(source.suffix)
+        if opener is None:
+            shutil.copyfile(source, tmp_path)
+        else:
+            with opener(source) as src, tmp_path.open("wb") as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+        tmp_path.replace(destination)
+
+    def close(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
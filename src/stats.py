@@ -0,0 +1,182 @@
+import math
+import re
+import statistics
+from typing import List, Optional, Sequence, Tuple
+
+import pandas as pd  # type: ignore
+
+# Sufixo do diretório de uma repetição ({seed}): "<executável>_<instância>_seed_<n>"
+SEED_SUFFIX_RE = re.compile(r"_seed_\d+$")
+
+
+def t_quantile(confidence: float, dof: int) -> float:
+    """
+    Quantil bicaudal da t de Student (ex: 0.95, 4 -> ~2.776), pela expansão de
+    Cornish-Fisher em torno da normal (sem depender do scipy). O erro é menor que
+    1% a partir de 3 graus de liberdade.
+    """
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    if dof <= 0:
+        return math.inf
+    if dof == 1:
+        return math.tan(math.pi * confidence / 2)
+    if dof == 2:
+        alpha = 1 - confidence
+        return math.sqrt(2 / (alpha * (2 - alpha)) - 2)
+    g1 = (z**3 + z) / 4
+    g2 = (5 * z**5 + 16 * z**3 + 3 * z) / 96
+    g3 = (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / 384
+    return z + g1 / dof + g2 / dof**2 + g3 / dof**3
+
+
+def mean_ci(samples: Sequence[float], confidence: float = 0.95) -> Tuple[float, float]:
+    """(média, meia-largura do intervalo de confiança da média)."""
+    n = len(samples)
+    mean = statistics.fmean(samples)
+    if n < 2:
+        return mean, math.inf
+    return mean, t_quantile(confidence, n - 1) * statistics.stdev(samples) / math.sqrt(n)
+
+
+def needs_more(
+    samples: Sequence[float],
+    min_replicates: int,
+    max_replicates: int,
+    rel_ci: float,
+    confidence: float = 0.95,
+) -> bool:
+    """
+    Regra de parada sequencial das repetições de um par (instância, build):
+    continua até ter `min_replicates` amostras e, depois, enquanto o intervalo de
+    confiança da média for mais largo que `rel_ci` vezes a média, até `max_replicates`.
+    """
+    n = len(samples)
+    if n >= max_replicates:
+        return False
+    if n < max(min_replicates, 2):
+        return True
+    mean, half_width = mean_ci(samples, confidence)
+    return half_width > rel_ci * abs(mean)
+
+
+def aggregate_replicates(
+    results: pd.DataFrame, confidence: float = 0.95
+) -> Optional[pd.DataFrame]:
+    """
+    Uma linha por par (build, instância) das repetições em `results` (uma linha por
+    execução, com instance_name = diretório da execução): o número de repetições e,
+    para cada coluna numérica, a média e o desvio padrão; para os tempos, também a
+    meia-largura do intervalo de confiança. None se não há repetições.
+    """
+    if "instance_name" not in results:
+        return None
+    pairs = results["instance_name"].astype(str).str.replace(
+        SEED_SUFFIX_RE, "", regex=True
+    )
+    if (pairs == results["instance_name"].astype(str)).all():
+        return None
+
+    keys: List[str] = ["build_name"] if "build_name" in results else []
+    numeric = [
+        col
+        for col in results.select_dtypes("number").columns
+        if col not in ("seed", "exit_code")
+    ]
+    grouped = results.assign(pair=pairs).groupby(keys + ["pair"], sort=True)
+
+    rows = []
+    for key, group in grouped:
+        key = key if isinstance(key, tuple) else (key,)
+        row = dict(zip(keys + ["pair"], key))
+        row["replicates"] = len(group)
+        if "exit_code" in group:
+            row["failed"] = int((group["exit_code"] != 0).sum())
+        for col in numeric:
+            values = group[col].dropna().tolist()
+            if not values:
+                continue
+            mean, half_width = mean_ci(values, confidence)
+            row[f"{col}_mean"] = mean
+            row[f"{col}_std"] = statistics.stdev(values) if len(values) > 1 else 0.0
+            if col in ("time", "wall_time_seconds"):
+                row[f"{col}_ci"] = half_width
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def chi2_sf(x: float, dof: int) -> float:
+    """P(X > x) para X ~ qui-quadrado com `dof` graus de liberdade."""
+    if x <= 0:
+        return 1.0
+    a, y = dof / 2, x / 2
+    log_prefix = a * math.log(y) - y - math.lgamma(a)
+    if y < a + 1:
+        # Série da gama incompleta inferior
+        term = total = 1 / a
+        n = 0
+        while abs(term) > abs(total) * 1e-12 and n < 1000:
+            n += 1
+            term *= y / (a + n)
+            total += term
+        return max(0.0, 1 - total * math.exp(log_prefix))
+    # Fração contínua (Lentz) da gama incompleta superior
+    tiny = 1e-300
+    b = y + 1 - a
+    c, d = 1 / tiny, 1 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-12:
+            break
+    return min(1.0, h * math.exp(log_prefix))
+
+
+def _ranks(values: Sequence[float]) -> List[float]:
+    """Postos (1 = menor), com a média dos postos nos empates."""
+    order = sorted(range(len(values)), key=lambda i: values[i])
+    ranks = [0.0] * len(values)
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        for pos in range(i, j + 1):
+            ranks[order[pos]] = (i + j) / 2 + 1
+        i = j + 1
+    return ranks
+
+
+def friedman(
+    scores: Sequence[Sequence[float]], alpha: float = 0.05
+) -> Tuple[float, float, List[float], float]:
+    """
+    Teste de Friedman (com correção para empates) e o pós-teste de Conover, como
+    no F-race. `scores[i][j]` é o valor (menor é melhor) do candidato j na
+    instância i. Devolve (estatística, p-valor, soma dos postos de cada candidato,
+    diferença crítica): candidatos cuja soma dos postos passa a do melhor por mais
+    que a diferença crítica são piores que ele ao nível `alpha` (se p < alpha).
+    """
+    n, k = len(scores), len(scores[0])
+    ranks = [_ranks(row) for row in scores]
+    rank_sums = [sum(row[j] for row in ranks) for j in range(k)]
+    a1 = sum(r * r for row in ranks for r in row)
+    c1 = n * k * (k + 1) ** 2 / 4
+    if n < 2 or k < 2 or a1 <= c1:
+        # Uma só instância, um só candidato ou tudo empatado: nenhuma evidência
+        return 0.0, 1.0, rank_sums, math.inf
+
+    statistic = (k - 1) * sum((r - n * (k + 1) / 2) ** 2 for r in rank_sums) / (a1 - c1)
+    p_value = chi2_sf(statistic, k - 1)
+    dof = (n - 1) * (k - 1)
+    critical = t_quantile(1 - alpha, dof) * math.sqrt(
+        2 * (n * a1 - sum(r * r for r in rank_sums)) / dof
+    )
+    return statistic, p_value, rank_sums, critical
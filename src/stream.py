@@ -0,0 +1,176 @@
+import importlib.util
+import re
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Optional, Tuple
+
+try:
+    from src.console import out
+except ImportError:
+    from rich.console import Console
+
+    out = Console()  # type: ignore
+
+
+def load_stream_rules(parser_path: Path) -> Tuple[Optional[Dict[str, str]], bool]:
+    """
+    Importa o script do parser e devolve o seu `STREAM_RULES`, se definido, e o
+    seu `STREAM_POST_PARSE` (padrão False).
+
+    `STREAM_RULES` é um dicionário {nome: regex} cujos grupos nomeados são os
+    valores extraídos (ex: `(?P<lb>\\d+)`). O parser usa essas mesmas regras na
+    análise pós-execução, de forma que ambos os modos extraem os mesmos dados.
+    Um parser cujas regras não cobrem tudo o que ele extrai declara
+    `STREAM_POST_PARSE = True`: com --stream, ele ainda roda sobre os logs ao
+    fim de cada execução (relendo o stdout.log) e completa o res.csv.
+    """
+    parser_path = Path(parser_path).expanduser().resolve()
+    spec = importlib.util.spec_from_file_location("xp_parser", parser_path)
+    if spec is None or spec.loader is None:
+        out.error(f"Não foi possível importar o parser {parser_path}")
+        exit(1)
+
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except Exception as e:
+        out.error(f"Erro ao importar o parser {parser_path}: {e}")
+        exit(1)
+
+    rules = getattr(module, "STREAM_RULES", None)
+    if not rules:
+        out.warning(f"{parser_path.name} não define STREAM_RULES.")
+        return None, False
+    return dict(rules), bool(getattr(module, "STREAM_POST_PARSE", False))
+
+
+def _convert(value: str) -> Any:
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+class StreamParser:
+    """
+    Parser incremental: recebe as linhas da saída do processo conforme são
+    produzidas e mantém o último valor de cada grupo nomeado das regras.
+    Cada mudança de lb/ub é registrada em `events` com o instante em que ocorreu.
+    """
+
+    def __init__(self, rules: Dict[str, str]):
+        self.rules = {name: re.compile(pattern) for name, pattern in rules.items()}
+        self.values: Dict[str, Any] = {}
+        self.events: list[Dict[str, Any]] = []
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def feed(self, line: str) -> bool:
+        """Processa uma linha. Retorna True se algum valor foi atualizado."""
+        updated = {}
+        for pattern in self.rules.values():
+            match = pattern.search(line)
+            if match:
+                updated.update(
+                    (k, _convert(v))
+                    for k, v in match.groupdict().items()
+                    if v is not None
+                )
+        if not updated:
+            return False
+        with self._lock:
+            bounds = {
+                k: updated[k]
+                for k in ("lb", "ub")
+                if k in updated and updated[k] != self.values.get(k)
+            }
+            if bounds:
+                self.events.append(
+                    {"time": time.perf_counter() - self._start, **bounds}
+                )
+            self.values.update(updated)
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.values)
+
+
+class Target:
+    """
+    Critério de parada do modo time-to-target: o alvo é atingido quando uma linha
+    casa com `pattern`, quando o ub chega ao ótimo conhecido `optimum` ou quando
+    o gap relativo |ub - lb| / |ub| fica menor ou igual a `gap`.
+    """
+
+    def __init__(
+        self,
+        pattern: Optional[str] = None,
+        optimum: Optional[float] = None,
+        gap: Optional[float] = None,
+    ):
+        self.pattern = re.compile(pattern) if pattern else None
+        self.optimum = optimum
+        self.gap = gap
+
+    def __bool__(self) -> bool:
+        return bool(self.pattern) or self.optimum is not None or self.gap is not None
+
+    def reached(self, line: str, values: Dict[str, Any]) -> bool:
+        if self.pattern and self.pattern.search(line):
+            return True
+
+        ub, lb = values.get("ub"), values.get("lb")
+        if self.optimum is not None and isinstance(ub, (int, float)):
+            if abs(ub - self.optimum) <= 1e-6 * max(1.0, abs(self.optimum)):
+                return True
+
+        if self.gap is not None and isinstance(ub, (int, float)):
+            if isinstance(lb, (int, float)):
+                gap = 0.0 if ub == lb else abs(ub - lb) / max(abs(ub), 1e-12)
+                if gap <= self.gap:
+                    return True
+
+        return False
+
+
+def tee_process(
+    process: subprocess.Popen,
+    stdout_fd: IO[str],
+    stderr_fd: IO[str],
+    parser: StreamParser,
+    target: Optional[Target] = None,
+    on_target: Optional[Callable[[], None]] = None,
+) -> list[threading.Thread]:
+    """
+    Copia stdout/stderr do processo para os arquivos de log, passando cada linha
+    pelo parser no caminho. Se `target` for atingido, chama `on_target` (uma única vez).
+    Retorna as threads de leitura (que terminam com o processo).
+    """
+    fired = threading.Event()
+
+    def pump(source: IO[str], sink: IO[str]) -> None:
+        for line in source:
+            sink.write(line)
+            parser.feed(line)
+            if (
+                target
+                and on_target
+                and not fired.is_set()
+                and target.reached(line, parser.snapshot())
+            ):
+                fired.set()
+                on_target()
+        source.close()
+
+    threads = [
+        threading.Thread(target=pump, args=(process.stdout, stdout_fd), daemon=True),
+        threading.Thread(target=pump, args=(process.stderr, stderr_fd), daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
@@ -1,11 +1,18 @@
 import os
-from contextlib import contextmanager
+import threading
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Union
 
 from src.config import BuildConfig, InstanceConfig, ProjectConfig
 from src.console import out
 
+if TYPE_CHECKING:
+    from rich.progress import Progress
+
+    from src.jobserver import JobServer
+
 
 @contextmanager
 def cd(path: Union[Path, str]):
@@ -64,50 +71,159 @@ def get_project_root(conf: ProjectConfig) -> None:
     out.print(f"Projeto disponível em: {conf.location}")
 
 
-def build_target(build: BuildConfig, project_config: ProjectConfig) -> None:
+# `git worktree add/prune` (e os checkouts) alteram o .git do projeto, que é
+# compartilhado por todas as worktrees: são feitos um de cada vez, e só os builds
+# rodam em paralelo
+_worktree_lock = threading.Lock()
+
+
+def get_build_root(build: BuildConfig, project_config: ProjectConfig) -> Path:
+    """
+    Diretório onde o build é construído.
+    Sem git_ref, é a própria raiz do projeto. Com git_ref, é uma `git worktree`
+    exclusiva do build (em ./worktrees/<build.name>), de forma que builds de refs
+    diferentes possam ser construídos ao mesmo tempo sem trocar o código-fonte
+    sob executáveis já construídos.
+    """
+    import subprocess
+
+    project_root = Path(project_config.location).resolve()
+    if not build.git_ref:
+        return project_root
+
+    worktree = (Path("worktrees") / build.name).resolve()
+
+    def git(*args: str, cwd: Path = project_root) -> None:
+        subprocess.run(
+            ["git", *args],
+            cwd=cwd,
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+    try:
+        with _worktree_lock:
+            if (worktree / ".git").exists():
+                git("checkout", "--detach", build.git_ref, cwd=worktree)
+            else:
+                git("worktree", "prune")
+                worktree.parent.mkdir(parents=True, exist_ok=True)
+                git("worktree", "add", "--force", "--detach", str(worktree), build.git_ref)
+    except subprocess.CalledProcessError as e:
+        out.error(f"Erro ao preparar a worktree de {build.git_ref}:\n{e.stderr.decode()}")
+        exit(1)
+
+    return worktree
+
+
+BUILD_CACHE_DIR = Path("~/.cache/xp/builds").expanduser()
+
+
+def get_build_cache_key(build: BuildConfig, build_root: Path) -> Optional[str]:
+    """
+    Chave do cache de builds: hash de (commit resolvido, hash do diff da árvore suja
+    e do conteúdo dos arquivos não rastreados, build_command, caminho do executável).
+    Arquivos ignorados pelo git (ex: o diretório de build) e o próprio executável não
+    entram, para que a chave não mude depois do build. Retorna None se build_root não
+    for um repositório git (nesse caso o build não é cacheado).
+    """
+    import hashlib
+    import json
+    import subprocess
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=build_root,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        diff = subprocess.run(
+            ["git", "diff", "HEAD", "--binary"],
+            cwd=build_root,
+            check=True,
+            capture_output=True,
+        ).stdout
+        untracked = subprocess.run(
+            ["git", "ls-files", "--others", "--exclude-standard", "-z"],
+            cwd=build_root,
+            check=True,
+            capture_output=True,
+        ).stdout
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+    # O diff não inclui os arquivos novos (ainda não adicionados): entram pelo conteúdo,
+    # exceto o próprio executável, que é saída do build e mudaria a chave a cada build
+    executable = (build_root / build.executable).resolve()
+    digest = hashlib.sha256(diff)
+    for entry in sorted(untracked.split(b"\0")):
+        if not entry:
+            continue
+        path = build_root / os.fsdecode(entry)
+        if path.resolve() == executable:
+            continue
+        digest.update(entry + b"\0")
+        try:
+            digest.update(path.read_bytes())
+        except OSError:
+            pass
+
+    key = [
+        commit,
+        digest.hexdigest(),
+        build.build_command,
+        Path(build.executable).as_posix(),
+    ]
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+
+def store_in_build_cache(executable: Path, key: str) -> Path:
+    """Copia o executável para o cache (de forma atômica) e retorna o caminho cacheado."""
+    import shutil
+    import tempfile
+
+    cached = BUILD_CACHE_DIR / key / executable.name
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=cached.parent, delete=False) as tmp:
+        tmp_path = Path(tmp.name)
+    shutil.copy2(executable, tmp_path)
+    tmp_path.replace(cached)
+    return cached
+
+
+# Builds que compartilham o mesmo diretório são construídos um de cada vez
+_build_root_locks: Dict[Path, threading.Lock] = defaultdict(threading.Lock)
+
+
+def build_target(
+    build: BuildConfig,
+    project_config: ProjectConfig,
+    progress: Optional["Progress"] = None,
+    jobserver: Optional["JobServer"] = None,
+) -> None:
     """
     Executa o comando de build para um único alvo.
     Se terminar com sucesso, build.executable será do tipo Path com o caminho para o executável (ou script python)
+    Com um jobserver, o build ocupa um dos seus tokens e o make herda os demais via MAKEFLAGS.
     """
 
+    import re
     import subprocess
 
-    with cd(project_config.location):
-        if build.git_ref:
-            out.print(f"Checking out {build.git_ref}...")
-            try:
-                subprocess.run(
-                    f"git checkout {build.git_ref}",
-                    shell=True,
-                    check=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                )
-            except subprocess.CalledProcessError as e:
-                out.error(f"Erro ao fazer checkout de {build.git_ref}:\n{e.stderr.decode()}")
-                exit(1)
-
-        from rich.progress import (
-            BarColumn,
-            Progress,
-            SpinnerColumn,
-            TextColumn,
-            TimeElapsedColumn,
-        )
-        import re
+    from rich.progress import (
+        BarColumn,
+        Progress,
+        SpinnerColumn,
+        TextColumn,
+        TimeElapsedColumn,
+    )
 
-        out.print(f"> {build.build_command}")
-        
-        process = subprocess.Popen(
-            build.build_command,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT, # merge stderr for complete logs
-            text=True,
-            bufsize=1,
-            universal_newlines=True,
-        )
+    build_root = get_build_root(build, project_config)
 
+    if progress is None:
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
@@ -116,75 +232,208 @@ def build_target(build: BuildConfig, project_config: ProjectConfig) -> None:
             TimeElapsedColumn(),
             console=out,
         ) as progress:
-            task = progress.add_task("Building...", total=100)
+            return build_target(build, project_config, progress, jobserver)
+
+    with _build_root_locks[build_root]:
+        # Mesmo commit, mesmo diff e mesmo comando: reaproveita o executável já construído
+        cache_key = get_build_cache_key(build, build_root) if build.cache else None
+        if cache_key:
+            cached = BUILD_CACHE_DIR / cache_key / Path(build.executable).name
+            if cached.exists():
+                out.print(f"({build.name}) executável em cache: {cached}")
+                build.executable = cached
+                return
+
+        task = progress.add_task(f"{build.name}: waiting...", total=100, live="")
+        output = []
+
+        with jobserver.slot() if jobserver else nullcontext():
+            out.print(f"> ({build.name}) {build.build_command}")
+
+            process = subprocess.Popen(
+                build.build_command,
+                shell=True,
+                cwd=build_root,
+                env={**os.environ, **jobserver.env} if jobserver else None,
+                pass_fds=jobserver.pass_fds if jobserver else (),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,  # merge stderr for complete logs
+                text=True,
+                bufsize=1,
+                universal_newlines=True,
+            )
 
             for line in process.stdout:
                 line = line.strip()
                 if not line:
                     continue
-                
+                output.append(line)
+
                 # Procura por progresso do CMake, por exemplo "[ 15%]" ou "[100%]"
-                match = re.search(r'\[\s*(\d+)%\]', line)
+                match = re.search(r"\[\s*(\d+)%\]", line)
                 if match:
                     percent = int(match.group(1))
                     progress.update(task, completed=percent)
                 else:
                     # Atualiza a descrição com a linha atual truncada
                     short_line = line[:60] + "..." if len(line) > 60 else line
-                    progress.update(task, description=f"Building... {short_line}")
+                    progress.update(task, description=f"{build.name}: {short_line}")
 
             process.wait()
 
-            if process.returncode != 0:
-                out.error(f"\nErro durante o build (código {process.returncode}). Veja a saída acima.")
-                exit(1)
-            else:
-                progress.update(task, completed=100, description="Build concluído com sucesso!")
+        if process.returncode != 0:
+            out.print("\n".join(output[-20:]))
+            out.error(
+                f"Erro durante o build de {build.name} (código {process.returncode}). Veja a saída acima."
+            )
+            exit(1)
+
+        progress.update(task, completed=100, description=f"{build.name}: concluído!")
+
+        build.executable = (build_root / build.executable).resolve()
+
+        # Só executáveis de fato são cacheados (scripts dependem do resto do projeto)
+        is_executable = (
+            build.executable.is_file() and build.executable.stat().st_mode & 0o111 != 0
+        )
+        if cache_key and is_executable:
+            build.executable = store_in_build_cache(build.executable, cache_key)
+
+
+def build_targets(
+    builds: List[BuildConfig],
+    project_config: ProjectConfig,
+    n_jobs: int = 1,
+    progress: Optional["Progress"] = None,
+    on_built: Optional[Callable[[BuildConfig], None]] = None,
+    jobserver: Optional["JobServer"] = None,
+) -> None:
+    """
+    Constrói todos os builds, até n_jobs ao mesmo tempo (cada git_ref na sua worktree).
+    Com um jobserver, todos os builds dividem o mesmo orçamento de CPUs.
+    on_built(build) é chamado (nesta thread) assim que cada build termina, de forma que
+    suas instâncias possam começar enquanto os demais ainda compilam.
+    """
+    from concurrent import futures
+
+    from rich.progress import (
+        BarColumn,
+        Progress,
+        SpinnerColumn,
+        TextColumn,
+        TimeElapsedColumn,
+    )
+
+    if progress is None:
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+            TimeElapsedColumn(),
+            console=out,
+        ) as progress:
+            return build_targets(
+                builds, project_config, n_jobs, progress, on_built, jobserver
+            )
 
-        # BUG isso aqui vai dar merda
-        build.executable = Path(build.executable).resolve()
+    with futures.ThreadPoolExecutor(max_workers=max(n_jobs, 1)) as executor:
+        future_to_build = {
+            executor.submit(
+                build_target, build, project_config, progress, jobserver
+            ): build
+            for build in builds
+        }
+        for future in futures.as_completed(future_to_build):
+            # Propaga o exit(1) de um build que falhou
+            future.result()
+            if on_built is not None:
+                on_built(future_to_build[future])
 
 
 def get_instances(conf: InstanceConfig) -> None:
     """
     Garante que as instâncias existem (possivelmente clonando repositórios)
     e garante que todas as instâncias da(s) classe(s) existem.
+
+    A resolução usa o manifesto em cache (src/manifest.py): `location` e `location/all`
+    são listados uma única vez, sem um stat por instância, e só são relidos quando o
+    mtime do diretório muda (só as instâncias usadas têm o seu stat, para os
+    hashes). Arquivos ocultos são ignorados e os filtros include/exclude de cada
+    classe são aplicados ao nome da instância. Classes podem ser subdiretórios
+    (ex: "a/b").
     """
+    from fnmatch import fnmatch
+
+    from src.config import ClassFilter, InstanceInfo
+    from src.manifest import Manifest
 
     conf.location = get_path_or_clone(conf.location, "inst")
     conf.instances = {} if conf.instances is None else conf.instances
     out.print(f"Instâncias disponíveis em: {conf.location}")
 
+    manifest = Manifest(conf.location)
+    root = manifest.listing("") or {"dirs": [], "files": {}}
+    all_listing = manifest.listing("all") if "all" in root["dirs"] else None
+    all_files = all_listing["files"] if all_listing else {}
+
     for class_name in conf.classes:
         # {conf.location}/class_name tem que ser ou um dirtório ou um arquivo
         class_path = conf.location / class_name
-        if not class_path.exists():
-            out.error(
-                f"A classe de instância '{class_name}' não existe em {conf.location}"
-            )
-            exit(1)
-
-        # se é um diretório, as instâncias da classe são os arquivos dentro dele
-        if class_path.is_dir():
-            conf.instances[class_name] = list(class_path.iterdir())
+        names = []
+
+        # se é um diretório (ex: "a" ou "a/b"), as instâncias da classe são os
+        # arquivos dentro dele
+        listing = manifest.listing(class_name)
+        if listing is not None:
+            names = sorted(listing["files"])
+            paths = {name: class_path / name for name in names}
         # se é um arquivo, cada linha é uma instância, que deve ser um arquivo
         # em {conf.location}/ ou em {conf.location}/all/
-        else:
-            instance_paths = []
+        elif class_name in root["files"] or class_path.is_file():
+            paths = {}
             for line in class_path.read_text().splitlines():
-                inst_path = conf.location / line
-                all_path = conf.location / "all" / line
-                if inst_path.exists():
-                    instance_paths.append(inst_path)
-                elif all_path.exists():
-                    instance_paths.append(all_path)
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if line in root["files"]:
+                    paths[line] = conf.location / line
+                elif line in all_files:
+                    paths[line] = conf.location / "all" / line
+                # caminhos com subdiretórios não estão no manifesto
+                elif "/" in line and (conf.location / line).is_file():
+                    paths[line] = conf.location / line
+                elif "/" in line and (conf.location / "all" / line).is_file():
+                    paths[line] = conf.location / "all" / line
                 else:
                     out.error(
                         f"A instância '{line}' da classe '{class_name}' não existe."
                     )
                     exit(1)
-            conf.instances[class_name] = instance_paths
+                names.append(line)
+        else:
+            out.error(
+                f"A classe de instância '{class_name}' não existe em {conf.location}"
+            )
+            exit(1)
+
+        class_filter = conf.filters.get(class_name, ClassFilter())
+        conf.instances[class_name] = [
+            paths[name]
+            for name in names
+            if not Path(name).name.startswith(".")
+            and any(fnmatch(name, pattern) for pattern in class_filter.include)
+            and not any(fnmatch(name, pattern) for pattern in class_filter.exclude)
+        ]
 
         out.info(
             f"Classe '{class_name}' com {len(conf.instances[class_name])} instâncias"
         )
+
+    # Tamanhos e hashes de conteúdo das instâncias usadas
+    used = {path for paths in conf.instances.values() for path in paths}
+    conf.manifest = {
+        path: InstanceInfo(size=size, hash=digest)
+        for path, (size, digest) in manifest.hash(used).items()
+    }
+    manifest.save()
@@ -10,6 +10,9 @@
 #   "pandas",
 # ]
 # ///
+import os
+import sys
+from contextlib import ExitStack, nullcontext
 from datetime import datetime
 from pathlib import Path
 
@@ -18,11 +21,42 @@ from rich.traceback import install
 from typer import Argument as Arg
 from typer import Option as Opt
 
-from src.config import load_config
+from src.backends import (
+    Backend,
+    FakeSlurmBackend,
+    LocalBackend,
+    SlurmBackend,
+    run_array_task,
+)
+from src.bounds import load_known_bounds
+from src.capping import Capping
+from src.config import BuildConfig, load_config
 from src.console import out
-from src.parse import get_parser_command, parse_and_gather
-from src.run import RunInstance, Runner
-from src.utils import build_target, get_instances, get_project_root
+from src.cores import CoreLeases, physical_cores_by_node
+from src.distributed import Coordinator, run_worker
+from src.forkserver import ForkServer
+from src.history import load_wall_times, predict_costs
+from src.jobserver import JobServer
+from src.parse import gather_results, get_parser_command, parse_and_gather
+from src.plan import (
+    DeadlineMonitor,
+    format_duration,
+    parse_duration,
+    plan_experiment,
+)
+from src.prepare import prepare_instances
+from src.race import Race
+from src.run import RunInstance, Runner, Scheduler
+from src.shard import (
+    frozen_costs,
+    merge_shards,
+    parse_shard,
+    shard_jobs,
+    shard_tag,
+)
+from src.stage import Stager
+from src.stream import load_stream_rules
+from src.utils import build_targets, get_instances, get_project_root
 
 app = typer.Typer(help="XP CLI Application")
 
@@ -32,7 +66,51 @@ def run(
     config_toml: str = Arg(..., help="Caminho para o arquivo de configuração TOML."),
     tag: str = Opt("", "--tag", help="Tag para identificar esta execução."),
     jobs: int = Opt(1, "--jobs", help="Número de trabalhos paralelos."),
+    build_jobs: int = Opt(
+        1, "--build-jobs", help="Número de builds construídos ao mesmo tempo."
+    ),
+    stream: bool = Opt(
+        False,
+        "--stream",
+        help="Extrai os resultados durante a execução, com as STREAM_RULES do parser.",
+    ),
+    distributed: str = Opt(
+        "",
+        "--distributed",
+        help="Endereço (host:porta ou unix:/caminho) onde os `xp worker` buscam os jobs.",
+    ),
+    shard: str = Opt(
+        "",
+        "--shard",
+        help="Executa só o shard i/N dos jobs (ex: 2/8), balanceado pelo custo previsto.",
+    ),
+    backend: str = Opt(
+        "local",
+        "--backend",
+        help="Onde os jobs rodam: local, slurm ou fake-slurm (Slurm simulado localmente).",
+    ),
+    deadline: str = Opt(
+        "",
+        "--deadline",
+        help="Prazo para o experimento (ex: 48h, 90m); ajusta o que roda para caber nele.",
+    ),
 ):
+    if backend not in ("local", "slurm", "fake-slurm"):
+        out.error("--backend deve ser local, slurm ou fake-slurm.")
+        raise typer.Exit(1)
+    if backend != "local" and distributed:
+        out.error("--distributed e --backend não podem ser usados juntos.")
+        raise typer.Exit(1)
+    if shard and not tag:
+        out.error("--shard requer --tag (a mesma em todos os shards).")
+        raise typer.Exit(1)
+    try:
+        shard_index, shard_count = parse_shard(shard) if shard else (1, 1)
+        deadline_seconds = parse_duration(deadline) if deadline else None
+    except ValueError as e:
+        out.error(str(e))
+        raise typer.Exit(1)
+
     out.rule("Preliminares")
     # 1. Lê o arquivo .toml
     config = load_config(config_toml)
@@ -45,8 +123,14 @@ def run(
     # 4. Garante que as instâncias existem (possivelmente clonando repositórios)
     # e garante que todas as instâncias da(s) classe(s) existem
     get_instances(config.instances)
+    # (opcional) Prepara as instâncias, uma vez por conteúdo (em cache entre experimentos)
+    prepare_instances(config.instances, jobs)
     # 5. (opcional) Garante que o script de parser.py existe
     # get_parser_script(config.project)
+    # 6. (opcional) Carrega, uma única vez, os limitantes conhecidos das instâncias
+    known_bounds = load_known_bounds(
+        config.instances.metadata, config.instances.location
+    )
     # 7. Cria, se não existir, o diretório de resultados
     out.rule()
 
@@ -54,46 +138,393 @@ def run(
     tag = tag or datetime.now().strftime("%y%m%d_%H%M%S")
 
     raw_logs_dir = Path("logs") / "raw"
+
+    # (opcional) Com --shard i/N, só uma parte dos jobs (build, classe, instância),
+    # escolhida de forma determinística e balanceando o custo previsto dos shards.
+    # A previsão é congelada em logs/raw/<tag>.shards.json pelo primeiro shard, e
+    # os outros partem dela
+    selected = None
+    if shard:
+        costs = predict_costs(
+            [
+                (build.name, inst_class, instance_path)
+                for build in config.build
+                for inst_class in config.instances.classes
+                for instance_path in (config.instances.instances or {})[inst_class]
+            ],
+            load_wall_times(raw_logs_dir, exclude_tag=tag),
+            {path: info.size for path, info in (config.instances.manifest or {}).items()},
+            {build.name: build.time_limit or 3600 for build in config.build},
+        )
+        try:
+            costs = frozen_costs(raw_logs_dir / f"{tag}.shards.json", costs)
+        except ValueError as e:
+            out.error(str(e))
+            raise typer.Exit(1)
+        selected = set(shard_jobs(costs, shard_index, shard_count))
+        share = sum(costs[job] for job in selected) / (sum(costs.values()) or 1)
+        out.info(
+            f"Shard {shard_index}/{shard_count}: {len(selected)} de {len(costs)} jobs"
+            f" ({share:.0%} do custo previsto)."
+        )
+        tag = shard_tag(tag, shard_index, shard_count)
+
+    # (opcional) Com --deadline, o que não cabe no prazo (pelos tempos previstos e
+    # os --jobs workers) é ajustado segundo [deadline]: builds de menor prioridade
+    # saem, as classes são amostradas ou os tempos limite diminuem
+    plan = None
+    plan_costs: dict = {}
+    if deadline_seconds is not None:
+        all_jobs = [
+            (build.name, inst_class, instance_path)
+            for build in config.build
+            for inst_class in config.instances.classes
+            for instance_path in (config.instances.instances or {})[inst_class]
+            if selected is None or (build.name, inst_class, instance_path) in selected
+        ]
+        limits = {build.name: float(build.time_limit or 3600) for build in config.build}
+        wall_times = load_wall_times(raw_logs_dir)
+        if wall_times:
+            plan_costs = predict_costs(
+                all_jobs,
+                wall_times,
+                {path: info.size for path, info in (config.instances.manifest or {}).items()},
+                limits,
+                # Jobs sem previsão pelo histórico: o pior caso, o tempo limite
+                fallback=limits,
+            )
+        else:
+            out.warning("Sem histórico de tempos: a previsão usa o tempo limite dos jobs.")
+            plan_costs = {job: limits[job[0]] for job in all_jobs}
+
+        # Ao retomar a tag, os jobs que já rodaram não contam
+        executables = {build.name: Path(build.executable).name for build in config.build}
+
+        def finished(job: tuple) -> bool:
+            build_dir = raw_logs_dir / tag / job[0]
+            name = f"{executables[job[0]]}_{job[2].name}"
+            return (build_dir / name).exists() or (build_dir / f"{name}_seed_0").exists()
+
+        done = {job for job in all_jobs if finished(job)}
+        plan = plan_experiment(
+            [job for job in all_jobs if job not in done],
+            plan_costs,
+            {
+                build.name: (
+                    build.priority,
+                    build.threads * max(build.replicates, 1),
+                    limits[build.name],
+                )
+                for build in config.build
+            },
+            jobs,
+            deadline_seconds,
+            config.deadline,
+        )
+        out.info(
+            f"Prazo de {format_duration(deadline_seconds)}: previstos"
+            f" {format_duration(plan.work / jobs)} de {format_duration(plan.budget / jobs)}"
+            f" com {jobs} workers ({len(plan.selected)} jobs, {len(done)} já feitos)."
+        )
+        for action in plan.actions:
+            out.info(f"Prazo: {action}.")
+        if not plan.fits:
+            out.warning(
+                "O experimento não cabe no prazo mesmo com os ajustes: o que não"
+                " couber sai da fila durante a execução."
+            )
+        selected = set(plan.selected) | done
+
     parser_script = Path(config.project.parser) if config.project.parser else None
     parser_cmd = get_parser_command(parser_script) if parser_script else None
+    # Alvos baseados em lb/ub (time-to-target) precisam das STREAM_RULES do parser
+    if any(b.target and b.target.needs_bounds for b in config.build) and not stream:
+        out.info("Há builds com [build.target] baseado em lb/ub: ativando --stream.")
+        stream = True
+    if any(b.target and b.target.optimum for b in config.build) and not known_bounds:
+        out.warning("[build.target] optimum = true requer instances.metadata.")
+    stream_rules, stream_post_parse = (
+        load_stream_rules(parser_script) if stream and parser_script else (None, False)
+    )
+    if stream and not parser_script:
+        out.warning("--stream requer um parser em [project]; ignorando.")
+
+    runners: list[Runner] = []
+
+    # Onde os jobs rodam: nesta máquina (--backend local), pelos `xp worker`
+    # conectados (--distributed) ou como job arrays do Slurm (--backend slurm). Em
+    # todos os casos, --jobs é o número de jobs em andamento ao mesmo tempo.
+    job_backend: Backend = LocalBackend()
+    if distributed:
+        job_backend = Coordinator(distributed)
+    elif backend in ("slurm", "fake-slurm"):
+        exec_command = [
+            config.slurm.python or sys.executable,
+            str(Path(__file__).resolve()),
+            "exec-job",
+        ]
+        if backend == "slurm":
+            job_backend = SlurmBackend(
+                exec_command,
+                config.slurm.sbatch_args,
+                config.slurm.poll_interval,
+                config.slurm.submit_delay,
+            )
+        else:
+            job_backend = FakeSlurmBackend(
+                exec_command, submit_delay=config.slurm.submit_delay
+            )
 
-    for build in config.build:
-        build_target(build, config.project)
-
-        if config.instances.instances is None:
-            continue
+    # (opcional) Cópia local e descomprimida das instâncias, compartilhada pelos builds
+    stager = (
+        Stager(
+            config.instances.stage,
+            config.instances.stage_budget * 2**20,
+            config.instances.manifest,
+        )
+        if config.instances.stage and job_backend.local
+        else None
+    )
 
-        for inst_class in config.instances.classes:
-            build_raw_logs_dir = raw_logs_dir / tag / build.name
-            build_raw_logs_dir.mkdir(parents=True, exist_ok=True)
+    # Os forkservers (um por build) só terminam depois de todas as instâncias
+    forkservers = ExitStack()
+    # Um único pool de --jobs workers (e dos [resources]) para todos os builds
+    scheduler = Scheduler(
+        jobs, config.resources, pin=job_backend.local, label=f"xp run {tag}"
+    )
 
-            run_instances = [
-                RunInstance(
-                    executable=Path(build.executable),
-                    instance_path=instance_path,
-                    # TODO especificar params adicionais do RunInstance
+    # O backend fecha antes do Scheduler: num erro (ou Ctrl-C), os jobs que ainda
+    # esperam por ele falham e o Scheduler não fica esperando por eles
+    with stager or nullcontext(), forkservers, scheduler, job_backend:
+        # Os builds rodam em uma pequena fatia reservada dos workers; o resto já
+        # executa as instâncias dos builds que terminaram.
+        pending_builds = len(config.build)
+        reserved = scheduler.reserve(min(build_jobs, pending_builds))
+        # O orçamento de CPUs do jobserver compartilhado pelos builds é essa fatia
+        # mais as CPUs da máquina que os --jobs workers deixam livres (todas, se os
+        # jobs rodam em outras máquinas)
+        if hasattr(os, "sched_getaffinity"):
+            cpus = len(os.sched_getaffinity(0))
+        else:
+            cpus = os.cpu_count() or 1
+        idle_cpus = max(cpus - jobs, 0) if job_backend.local else cpus
+        jobserver = JobServer(max(reserved + idle_cpus, 1))
+
+        # (opcional) Acompanha o prazo com os tempos reais e tira da fila o que não cabe
+        monitor = (
+            DeadlineMonitor(
+                scheduler,
+                deadline_seconds,
+                plan_costs,
+                {build.name: build.priority for build in config.build},
+            )
+            if deadline_seconds is not None
+            else None
+        )
+
+        # (opcional) Limite reduzido nas instâncias que algum build já resolveu
+        capping = (
+            Capping(config.capping, raw_logs_dir / tag)
+            if config.capping is not None
+            else None
+        )
+
+        # (opcional) Uma corrida por classe: os builds recebem as instâncias em blocos
+        # e os estatisticamente piores deixam de recebê-las (ver src/race.py)
+        races = (
+            {
+                inst_class: Race(
+                    inst_class,
+                    [build.name for build in config.build],
+                    config.race,
+                    scheduler,
+                    raw_logs_dir / tag / f"race_{inst_class}.json",
+                )
+                for inst_class in config.instances.classes
+            }
+            if config.race is not None
+            else {}
+        )
+
+        def on_built(build: BuildConfig) -> None:
+            nonlocal pending_builds, reserved
+            pending_builds -= 1
+            if reserved > pending_builds:
+                scheduler.release(reserved - pending_builds)
+                reserved = pending_builds
+                jobserver.resize(max(reserved + idle_cpus, 1))
+
+            if config.instances.instances is None:
+                return
+
+            forkserver = None
+            if build.forkserver is not None and job_backend.local:
+                forkserver = forkservers.enter_context(
+                    ForkServer(build.forkserver, [str(config.project.location)])
                 )
-                for instance_path in config.instances.instances[inst_class]
-            ]
 
-            Runner(
-                name=build.name,
-                raw_logs_dir=build_raw_logs_dir,
-                # TODO especificar o TL, talvez dentro da config do build
-                time_limit=build.time_limit or 3600,
-                list_of_instances=run_instances,
-                n_workers=jobs,
-                run_template=build.run_template,
-                class_name=inst_class,
-                parser_cmd=parser_cmd,
+            # Repetições: uma execução por semente ({seed}); sem repetições nem
+            # {seed} no template, os nomes dos logs continuam sem a semente
+            templates = build.run_template + (build.batch_template or "")
+            if build.replicates > 1 or "{seed}" in templates:
+                seeds: list = list(range(max(build.replicates, 1)))
+            else:
+                seeds = [None]
+
+            for inst_class in config.instances.classes:
+                build_raw_logs_dir = raw_logs_dir / tag / build.name
+                build_raw_logs_dir.mkdir(parents=True, exist_ok=True)
+
+                run_instances = [
+                    RunInstance(
+                        executable=Path(build.executable),
+                        instance_path=instance_path,
+                        prepared_path=(config.instances.prepared or {}).get(
+                            instance_path
+                        ),
+                        params={"seed": seed} if seed is not None else {},
+                        # TODO especificar params adicionais do RunInstance
+                    )
+                    for instance_path in config.instances.instances[inst_class]
+                    if selected is None
+                    or (build.name, inst_class, instance_path) in selected
+                    for seed in seeds
+                ]
+                if not run_instances:
+                    continue
+
+                runner = Runner(
+                    name=build.name,
+                    raw_logs_dir=build_raw_logs_dir,
+                    # TODO especificar o TL, talvez dentro da config do build
+                    time_limit=(
+                        max(int(plan.time_limits[build.name]), 1)
+                        if plan is not None
+                        else build.time_limit or 3600
+                    ),
+                    list_of_instances=run_instances,
+                    run_template=build.run_template,
+                    class_name=inst_class,
+                    parser_cmd=parser_cmd,
+                    known_bounds=known_bounds,
+                    stream_rules=stream_rules,
+                    stream_post_parse=stream_post_parse,
+                    target=build.target,
+                    scheduler=scheduler,
+                    stager=stager,
+                    batch_template=build.batch_template or "",
+                    batch_size=build.batch_size,
+                    forkserver=forkserver,
+                    resources=build.resources,
+                    threads=build.threads,
+                    backend=job_backend,
+                    adaptive=build.adaptive,
+                    race=races.get(inst_class),
+                    capping=capping,
+                    ladder=build.ladder,
+                    deadline=monitor,
+                )
+                runners.append(runner)
+
+        # Cada git_ref é construído na sua própria worktree, até --build-jobs ao
+        # mesmo tempo, e suas instâncias entram na fila assim que ele fica pronto
+        with jobserver:
+            build_targets(
+                config.build,
+                config.project,
+                build_jobs,
+                scheduler.progress,
+                on_built,
+                jobserver,
             )
+        # Um build que falha encerra o xp (exit(1) em build_targets). Aqui só faltam
+        # as corridas em que algum build não se registrou por não ter instâncias
+        # selecionadas naquela classe: elas seguem com os builds registrados
+        for race in races.values():
+            race.start()
+        scheduler.wait()
+
+    # Uma agregação por diretório de build (as classes compartilham o diretório)
+    for runner in {r.raw_logs_dir: r for r in runners}.values():
+        runner.gather()
+    for race in races.values():
+        race.report()
+
+
+@app.command()
+def worker(
+    address: str = Arg(
+        ..., help="Endereço do coordenador (host:porta ou unix:/caminho)."
+    ),
+    jobs: int = Opt(1, "--jobs", help="Número de jobs executados ao mesmo tempo."),
+    workdir: str = Opt("", "--workdir", help="Diretório temporário dos logs."),
+    logs: str = Opt(
+        "gzip",
+        "--logs",
+        help="Como devolver stdout.log/stderr.log: gzip, plain ou none.",
+    ),
+):
+    if logs not in ("gzip", "plain", "none"):
+        out.error("--logs deve ser gzip, plain ou none.")
+        raise typer.Exit(1)
+    run_worker(address, jobs, Path(workdir) if workdir else None, logs)
+
+
+@app.command("exec-job", hidden=True)
+def exec_job(
+    jobs_file: str = Arg(..., help="jobs.jsonl de um job array."),
+    index: int = Arg(..., help="Índice do elemento (SLURM_ARRAY_TASK_ID)."),
+):
+    """Executa um elemento de um job array submetido por --backend slurm."""
+    run_array_task(Path(jobs_file), index)
+
+
+@app.command()
+def merge(
+    tag: str = Arg(..., help="A --tag usada com --shard."),
+    logs_dir: str = Opt("logs/raw", help="Caminho para a pasta raw de logs."),
+    bounds: str = Opt(
+        "", "--bounds", help="Arquivo .csv com os limitantes conhecidos das instâncias."
+    ),
+):
+    """Junta os logs dos shards de uma tag em uma única árvore e agrega os resultados."""
+    raw_logs_dir = Path(logs_dir)
+    try:
+        build_dirs = merge_shards(raw_logs_dir, tag)
+    except (OSError, ValueError) as e:
+        out.error(f"Não foi possível juntar os shards: {e}")
+        raise typer.Exit(1)
+
+    known_bounds = load_known_bounds(bounds)
+    for build_dir in build_dirs:
+        gather_results(
+            raw_logs_dir=build_dir,
+            parsed_logs_csv=build_dir.parent / f"{build_dir.name}_results.csv",
+            known_bounds=known_bounds,
+        )
 
 
 @app.command()
 def parse(
     input_dir: str = Arg(..., help="Caminho para o diretório de entrada."),
     parser_script: str = Arg(..., help="Caminho para o script do parser."),
+    bounds: str = Opt(
+        "", "--bounds", help="Arquivo .csv com os limitantes conhecidos das instâncias."
+    ),
+    time_limits: str = Opt(
+        "",
+        "--time-limits",
+        help="Tempos limite (ex: 60,600) em que a execução também é avaliada.",
+    ),
 ):
+    try:
+        limits = [float(t) for t in time_limits.split(",") if t.strip()]
+    except ValueError:
+        out.error(
+            f"--time-limits deve ser uma lista de segundos (ex: 60,600), não '{time_limits}'."
+        )
+        raise typer.Exit(1)
+
     raw_logs_dir = Path(input_dir)
     parser_path = Path(parser_script)
     parsed_logs_csv = raw_logs_dir / "parsed_results.csv"
@@ -101,6 +532,8 @@ def parse(
         raw_logs_dir=raw_logs_dir,
         parser_path=parser_path,
         parsed_logs_csv=parsed_logs_csv,
+        known_bounds=load_known_bounds(bounds),
+        time_limits=limits,
     )
 
 
@@ -119,6 +552,46 @@ def plot(
 ): ...
 
 
+@app.command()
+def status():
+    """Mostra quais processos do xp reservaram os cores desta máquina."""
+    from rich import box
+    from rich.table import Table
+
+    leases = CoreLeases.status()
+    node_of = {
+        cpu: node for node, cpus in physical_cores_by_node().items() for cpu in cpus
+    }
+    now = datetime.now().timestamp()
+
+    table = Table(title="Cores reservados pelo xp", box=box.SIMPLE)
+    table.add_column("Core", justify="right", style="cyan")
+    table.add_column("Nó", justify="right", style="dim")
+    table.add_column("PID", justify="right")
+    table.add_column("Usuário", style="magenta")
+    table.add_column("Execução", style="green")
+    table.add_column("Job")
+    table.add_column("Há", justify="right", style="yellow")
+
+    held = {cpu: info for cpu, info in leases.items() if info is not None}
+    for cpu, info in sorted(held.items()):
+        since = info.get("since")
+        table.add_row(
+            str(cpu),
+            str(node_of.get(cpu, "?")),
+            str(info.get("pid", "?")),
+            info.get("user", "?"),
+            info.get("label", ""),
+            info.get("job", ""),
+            f"{int(now - since)}s" if since else "?",
+        )
+
+    if held:
+        out.print(table)
+    total = len(node_of) or len(leases)
+    out.print(f"{len(held)} de {total} cores físicos reservados.")
+
+
 @app.command()
 def summary(
     logs_dir: str = Opt("logs/raw", help="Caminho para a pasta raw de logs."),